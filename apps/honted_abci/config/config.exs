@@ -1,4 +1,6 @@
 use Mix.Config
 
 config :honted_abci,
-  abci_port: 46_658
+  abci_port: 46_658,
+  ethash_cache_dir: "~/.honted/ethash",
+  state_dir: nil
@@ -24,9 +24,11 @@ defmodule HonteD.ABCI do
   import HonteD.ABCI.Records
 
   alias HonteD.Staking
-  alias HonteD.ABCI.{State, ValidatorSet}
+  alias HonteD.ABCI.{Matching, Metrics, OrderBook, State, TxVerifier, ValidatorSet}
   alias HonteD.Transaction
 
+  @max_issued_tokens_page 100
+
   @doc """
   Tracks state which is controlled by consensus and also tracks local (mempool related, transient) state.
   Local state is being overwritten by consensus state on every commit.
@@ -36,6 +38,8 @@ defmodule HonteD.ABCI do
              staking_state: nil,
              initial_validators: nil,
              byzantine_validators_cache: nil,
+             height: 0, # of the block being processed or the last committed one
+             order_book: nil, # orders of the consensus state, indexed for matching, see `HonteD.ABCI.OrderBook`
             ]
 
   def start_link(opts) do
@@ -43,6 +47,16 @@ defmodule HonteD.ABCI do
     GenServer.start_link(__MODULE__, [staking_state], opts)
   end
 
+  @doc """
+  Called by :abci_server, in the process handling the ABCI connection the request came from.
+  Transactions are decoded and verified here, see `HonteD.ABCI.TxVerifier`
+  """
+  def handle_request(request_check_tx(tx: tx)) do
+    GenServer.call(__MODULE__, {:check_tx, TxVerifier.verify(tx)})
+  end
+  def handle_request(request_deliver_tx(tx: tx)) do
+    GenServer.call(__MODULE__, {:deliver_tx, TxVerifier.verify_delivered(tx)})
+  end
   def handle_request(request) do
     GenServer.call(__MODULE__, request)
   end
@@ -53,6 +67,7 @@ defmodule HonteD.ABCI do
       |> Map.put(:consensus_state, State.initial("consensus_state"))
       |> Map.put(:local_state, State.initial("local_state"))
       |> Map.put(:staking_state, staking_state)
+      |> Map.put(:order_book, OrderBook.new())
     {:ok, abci_app}
   end
 
@@ -61,29 +76,35 @@ defmodule HonteD.ABCI do
     {:reply, reply, abci_app}
   end
 
-  def handle_call(request_end_block(height: _height),
+  def handle_call(request_end_block(height: height),
                   _from,
                    %HonteD.ABCI{consensus_state: consensus_state,
+                                order_book: order_book,
                                 staking_state: staking_state,
                                 initial_validators: initial_validators,
                                 byzantine_validators_cache: byzantine_validators} = abci_app) do
-    # flush the evidence to be used from the abci app state
-    abci_app = %HonteD.ABCI{abci_app | byzantine_validators_cache: nil}
-
-    diffs = case epoch_changes_validators?(consensus_state, staking_state, initial_validators) do
-      {false, []} -> ValidatorSet.diff_from_slash(byzantine_validators)
-      {true, diff_from_epoch_change} -> diff_from_epoch_change # disregard evidence
-    end
-
-    consensus_state = move_to_next_epoch_if_epoch_changed(consensus_state)
-    {:reply, response_end_block(validator_updates: diffs), %{abci_app | consensus_state: consensus_state}}
+    Metrics.timed(:end_block, fn ->
+      # flush the evidence to be used from the abci app state
+      abci_app = %HonteD.ABCI{abci_app | byzantine_validators_cache: nil}
+
+      diffs = case epoch_changes_validators?(consensus_state, staking_state, initial_validators) do
+        {false, []} -> ValidatorSet.diff_from_slash(byzantine_validators)
+        {true, diff_from_epoch_change} -> diff_from_epoch_change # disregard evidence
+      end
+
+      consensus_state = move_to_next_epoch_if_epoch_changed(consensus_state)
+      {consensus_state, order_book} = Matching.end_block(consensus_state, order_book, height)
+      :ok = Metrics.set(%{resting_orders: OrderBook.size(order_book)})
+      {:reply, response_end_block(validator_updates: diffs), %{abci_app | consensus_state: consensus_state,
+                                                                         order_book: order_book}}
+    end)
   end
 
   def handle_call(request_begin_block(header: header(height: height), byzantine_validators: byzantine_validators),
                   _from,
                   %HonteD.ABCI{consensus_state: consensus_state, byzantine_validators_cache: nil} = abci_app) do
     # push the new evidence to cache
-    abci_app = %HonteD.ABCI{abci_app | byzantine_validators_cache: byzantine_validators}
+    abci_app = %HonteD.ABCI{abci_app | byzantine_validators_cache: byzantine_validators, height: height}
 
     HonteD.ABCI.Events.notify(consensus_state, %HonteD.API.Events.NewBlock{height: height})
     {:reply, response_begin_block(), abci_app}
@@ -91,32 +112,57 @@ defmodule HonteD.ABCI do
 
   def handle_call(request_commit(), _from,
                   %HonteD.ABCI{consensus_state: consensus_state, local_state: local_state} = abci_app) do
-    hash = State.hash(consensus_state)
-    reply = response_commit(code: code(:ok), data: hash, log: 'commit log: yo!')
-    {:reply, reply, %{abci_app | local_state: State.copy_state(consensus_state, local_state)}}
+    Metrics.timed(:commit, fn ->
+      :ok = Metrics.set(commit_gauges(consensus_state, local_state))
+      # writes of the whole block are applied to the trie here, at once
+      {consensus_state, hash} = Metrics.timed(:state_hash, fn ->
+        consensus_state = State.flush(consensus_state)
+        {consensus_state, State.hash(consensus_state)}
+      end)
+      :ok = Metrics.set(%{trie_nodes_written: State.size(consensus_state).nodes_written})
+      :ok = State.persist(consensus_state)
+      reply = response_commit(code: code(:ok), data: hash, log: 'commit log: yo!')
+      {:reply, reply, %{abci_app | consensus_state: consensus_state,
+                                   local_state: State.copy_state(consensus_state, local_state)}}
+    end)
   end
 
-  def handle_call(request_check_tx(tx: tx), _from, %HonteD.ABCI{} = abci_app) do
-    with {:ok, decoded} <- HonteD.TxCodec.decode(tx),
-         {:ok, new_local_state} <- handle_tx(abci_app, decoded, &(&1.local_state))
-    do
-      {:reply, response_check_tx(code: code(:ok)), %{abci_app | local_state: new_local_state}}
-    else
-      {:error, error} ->
-        {:reply, response_check_tx(code: code(error), log: to_charlist(error)), abci_app}
-    end
+  def handle_call(request_check_tx(tx: tx), from, %HonteD.ABCI{} = abci_app) do
+    handle_call({:check_tx, TxVerifier.decode_verify(tx)}, from, abci_app)
   end
 
-  def handle_call(request_deliver_tx(tx: tx), _from, %HonteD.ABCI{} = abci_app) do
-    with {:ok, decoded} <- HonteD.TxCodec.decode(tx),
-         {:ok, new_consensus_state} <- handle_tx(abci_app, decoded, &(&1.consensus_state))
-    do
-      HonteD.ABCI.Events.notify(new_consensus_state, decoded)
-      {:reply, response_deliver_tx(code: code(:ok)), %{abci_app | consensus_state: new_consensus_state}}
-    else
-      {:error, error} ->
-        {:reply, response_deliver_tx(code: code(error), log: to_charlist(error)), abci_app}
-    end
+  def handle_call({:check_tx, verified_tx}, _from, %HonteD.ABCI{} = abci_app) do
+    Metrics.timed(:check_tx, fn ->
+      with {:ok, decoded} <- verified_tx,
+           # the transaction will be included in the next block at the earliest
+           {:ok, new_local_state} <- handle_tx(abci_app, decoded, abci_app.local_state, abci_app.height + 1)
+      do
+        {:reply, response_check_tx(code: code(:ok)), %{abci_app | local_state: new_local_state}}
+      else
+        {:error, error} ->
+          {:reply, response_check_tx(code: code(error), log: to_charlist(error)), abci_app}
+      end
+    end)
+  end
+
+  def handle_call(request_deliver_tx(tx: tx), from, %HonteD.ABCI{} = abci_app) do
+    handle_call({:deliver_tx, TxVerifier.decode_verify(tx)}, from, abci_app)
+  end
+
+  def handle_call({:deliver_tx, verified_tx}, _from, %HonteD.ABCI{} = abci_app) do
+    Metrics.timed(:deliver_tx, fn ->
+      with {:ok, decoded} <- verified_tx,
+           {:ok, new_consensus_state} <- handle_tx(abci_app, decoded, abci_app.consensus_state, abci_app.height)
+      do
+        HonteD.ABCI.Events.notify(new_consensus_state, decoded)
+        order_book = track_order(abci_app.order_book, new_consensus_state, decoded)
+        {:reply, response_deliver_tx(code: code(:ok)), %{abci_app | consensus_state: new_consensus_state,
+                                                                     order_book: order_book}}
+      else
+        {:error, error} ->
+          {:reply, response_deliver_tx(code: code(error), log: to_charlist(error)), abci_app}
+      end
+    end)
   end
 
   @doc """
@@ -149,14 +195,32 @@ defmodule HonteD.ABCI do
   end
 
   @doc """
-  Specialized query for issued tokens for an issuer
+  Specialized query for issued tokens for an issuer, paginated, newest first.
+  `/issuers/<address>` gives the first page, `/issuers/<address>/<offset>/<limit>` any page of at most
+  #{@max_issued_tokens_page} tokens
   """
-  def handle_call(request_query(path: '/issuers/' ++ address), _from,
+  def handle_call(request_query(path: '/issuers/' ++ query), _from,
   %HonteD.ABCI{consensus_state: consensus_state} = abci_app) do
-    key = "issuers/" <> to_string(address)
-    {code, value, log} = handle_get(State.issued_tokens(consensus_state, address))
-    reply = response_query(code: code, key: to_charlist(key),
-      value: encode_query_response(value), proof: 'no proof', log: log)
+    key = "issuers/" <> to_string(query)
+    reply =
+      case parse_issuers_query(to_string(query)) do
+        {:ok, address, offset, limit} ->
+          {code, value, log} = handle_get(State.issued_tokens(consensus_state, address, offset, limit))
+          response_query(code: code, key: to_charlist(key),
+            value: encode_query_response(value), proof: 'no proof', log: log)
+        :error ->
+          response_query(code: code(:bad_page), key: to_charlist(key), value: encode_query_response(""),
+            proof: 'no proof', log: 'bad_page')
+      end
+    {:reply, reply, abci_app}
+  end
+
+  @doc """
+  Metrics of this node's ABCI app, see `HonteD.ABCI.Metrics`
+  """
+  def handle_call(request_query(path: '/metrics'), _from, %HonteD.ABCI{} = abci_app) do
+    reply = response_query(code: code(:ok), key: 'metrics', value: encode_query_response(Metrics.report()),
+      proof: 'no proof')
     {:reply, reply, abci_app}
   end
 
@@ -215,26 +279,55 @@ defmodule HonteD.ABCI do
     end
   end
 
+  # sizes of the states about to be committed: keys written in the block and the mempool (CheckTx) state's writes,
+  # which are discarded with it
+  defp commit_gauges(consensus_state, local_state) do
+    %{writes: block_writes} = State.size(consensus_state)
+    %{writes: mempool_writes, nodes_written: mempool_nodes} = State.size(local_state)
+    %{block_state_writes: block_writes, mempool_state_writes: mempool_writes, mempool_state_nodes: mempool_nodes}
+  end
+
   defp encode_query_response(object) do
     object
     |> Poison.encode!
     |> to_charlist
   end
 
-  defp handle_tx(abci_app, %Transaction.SignedTx{raw_tx: %Transaction.EpochChange{}} = tx, extract_state) do
-    with :ok <- HonteD.Transaction.Validation.valid_signed?(tx),
-         do: State.exec(extract_state.(abci_app), tx, abci_app.staking_state)
+  # NOTE: tx has already been verified by `TxVerifier`
+  defp handle_tx(abci_app, %Transaction.SignedTx{raw_tx: %Transaction.EpochChange{}} = tx, state, _height) do
+    State.exec(state, tx, abci_app.staking_state)
   end
 
-  defp handle_tx(abci_app, tx, extract_state) do
-    with :ok <- HonteD.Transaction.Validation.valid_signed?(tx),
-         do: State.exec(extract_state.(abci_app), tx)
+  defp handle_tx(_abci_app, %Transaction.SignedTx{raw_tx: %Transaction.Order{}} = tx, state, height) do
+    State.exec(state, tx, height)
   end
 
+  defp handle_tx(_abci_app, tx, state, _height) do
+    State.exec(state, tx)
+  end
+
+  defp track_order(order_book, state, %Transaction.SignedTx{raw_tx: %Transaction.Order{}}) do
+    {id, order} = State.last_order(state)
+    OrderBook.place(order_book, id, order)
+  end
+  defp track_order(order_book, _state, _tx), do: order_book
+
   defp lookup(state, key) do
     state |> State.lookup(key) |> handle_get
   end
 
+  defp parse_issuers_query(query) do
+    case String.split(query, "/") do
+      [address] -> {:ok, address, 0, @max_issued_tokens_page}
+      [address, offset, limit] -> parse_page(address, Integer.parse(offset), Integer.parse(limit))
+      _ -> :error
+    end
+  end
+
+  defp parse_page(address, {offset, ""}, {limit, ""})
+  when offset >= 0 and limit > 0 and limit <= @max_issued_tokens_page, do: {:ok, address, offset, limit}
+  defp parse_page(_address, _offset, _limit), do: :error
+
   defp handle_get({:ok, value}), do: {code(:ok), value, ''}
   defp handle_get(nil), do: {code(:not_found), "", 'not_found'}
 
@@ -20,6 +20,7 @@ defmodule HonteD.ABCI.Application do
   def start(_type, _args) do
     abci_port = Application.get_env(:honted_abci, :abci_port)
     children = [
+      {HonteD.ABCI.TxVerifier, name: HonteD.ABCI.TxVerifier},
       {HonteD.ABCI, name: HonteD.ABCI},
       :abci_server.child_spec(HonteD.ABCI, abci_port),
     ]
@@ -16,6 +16,9 @@ defmodule HonteD.ABCI.Ethereum.Ethash do
   @moduledoc """
   Implements Ethash.
   Based on pyethereum and Ethash wiki(https://github.com/ethereum/wiki/wiki/Ethash)
+
+  NOTE: proof of work is verified using the much faster `HonteD.ABCI.Ethereum.EthashCache.hashimoto_light/4`,
+        this is kept as the reference implementation
   """
   use Bitwise
 
@@ -30,8 +33,7 @@ defmodule HonteD.ABCI.Ethereum.Ethash do
   @words 32 # @mix_bytes / @word_bytes
   @accesses 64
 
-  @type cache_line_t :: list(non_neg_integer())
-  @type cache_t :: %{non_neg_integer() => cache_line_t}
+  @type cache_t :: binary() # see HonteD.ABCI.Ethereum.EthashCacheServer
   @type hashimoto_result_t :: [{:mix_digest, binary()}, {:result, binary()}]
 
   @doc """
@@ -86,20 +88,26 @@ defmodule HonteD.ABCI.Ethereum.Ethash do
   end
 
   defp calc_dataset_item(cache, i) do
-    n = map_size(cache)
-    [head | tail] = cache[rem(i, n)]
+    n = div(byte_size(cache), @hash_bytes)
+    [head | tail] = cache_line(cache, rem(i, n))
     initial = EthashUtils.keccak_512([head ^^^ i | tail])
-    mixed = mix(cache, i, initial, 0)
+    mixed = mix(cache, n, i, initial, 0)
 
     EthashUtils.keccak_512(mixed)
   end
 
-  defp mix(_cache, _i, current_mix, @dataset_parents), do: current_mix
-  defp mix(cache, i, current_mix, j) do
+  defp mix(_cache, _n, _i, current_mix, @dataset_parents), do: current_mix
+  defp mix(cache, n, i, current_mix, j) do
     cache_index = fnv(i ^^^ j, Enum.at(current_mix, rem(j, @dataset_mix_range)))
-    mixed_with_cache = Enum.zip(current_mix, cache[rem(cache_index, map_size(cache))])
+    mixed_with_cache = Enum.zip(current_mix, cache_line(cache, rem(cache_index, n)))
     current_mix = Enum.map(mixed_with_cache, fn {a, b} -> fnv(a, b) end)
-    mix(cache, i, current_mix, j + 1)
+    mix(cache, n, i, current_mix, j + 1)
+  end
+
+  defp cache_line(cache, index) do
+    cache
+    |> binary_part(index * @hash_bytes, @hash_bytes)
+    |> EthashUtils.decode_ints()
   end
 
   defp fnv(v1, v2) do
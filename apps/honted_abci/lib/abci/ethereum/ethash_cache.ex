@@ -14,7 +14,8 @@
 
 defmodule HonteD.ABCI.Ethereum.EthashCache do
   @moduledoc """
-  Creates cache for Ethash
+  Native (Rust) parts of Ethash: creates cache and verifies proof of work using it.
+  Both functions run on dirty CPU schedulers
   """
   use Rustler, otp_app: :honted_abci, crate: "ethashcache"
 
@@ -25,4 +26,11 @@ defmodule HonteD.ABCI.Ethereum.EthashCache do
   """
   def make_cache(_a), do: :erlang.nif_error(:nif_not_loaded)
 
+  @doc """
+  Native version of `HonteD.ABCI.Ethereum.Ethash.hashimoto_light/4`, returns mix digest and hash result.
+  Cache is read in place, as a binary stored by `HonteD.ABCI.Ethereum.EthashCacheServer`
+  """
+  @spec hashimoto_light(non_neg_integer(), binary(), binary(), binary()) :: {binary(), binary()}
+  def hashimoto_light(_full_size, _cache, _header, _nonce), do: :erlang.nif_error(:nif_not_loaded)
+
 end
@@ -14,28 +14,49 @@
 
 defmodule HonteD.ABCI.Ethereum.EthashCacheServer do
   @moduledoc """
-  Stores cache for ethash. Stores cache for a single epoch.
+  Stores cache for ethash. Stores caches for a few most recently used epochs.
   Cache is used for generating DAG used in Ethereum proof of work (section J.3.2 in yellowpaper)
-  TODO: Store cache for a few LRU epochs
+
+  Caches are stored on disk (in `:ethash_cache_dir`), so they are generated once and survive restarts.
+  Cache for the next epoch is prepared in the background, when a block close to the end of an epoch is requested.
+  Requests for a cache which isn't ready wait until it's loaded or generated.
+
+  Cache is a binary of little-endian 4-byte words, 64 bytes per cache line. Being a large binary,
+  it's shared with the requesting processes without copying
   """
   use GenServer
 
   @epoch_length 30_000 # Epoch length in number of blocks. Cache is the same for each block in an epoch.
   @timeout 600_000
+  @epochs_in_memory 3
+  @epochs_on_disk 3
+  @prefetch_distance 5_000 # How many blocks before the end of an epoch the cache for the next one is prepared
 
   alias HonteD.ABCI.Ethereum.EthashCache
 
-  def init(args) do
-     {:ok, args}
-   end
+  defstruct [:dir,
+             caches: %{}, # epoch => cache
+             recent_epochs: [], # epochs of caches in memory, most recently used first
+             preparing: %{}, # epoch => {task ref, callers waiting for the cache}
+            ]
+
+  def init(block_number) do
+    dir = Path.expand(Application.get_env(:honted_abci, :ethash_cache_dir))
+    :ok = File.mkdir_p(dir)
+    epoch = epoch(block_number)
+
+    state =
+      %__MODULE__{dir: dir}
+      |> put_cache(epoch, load_or_make_cache(dir, epoch))
+      |> prefetch(block_number)
+    {:ok, state}
+  end
 
   @doc """
   Starts cache store
   """
   def start(block_number) do
-    epoch = epoch(block_number)
-    cache = EthashCache.make_cache(block_number)
-    GenServer.start_link(__MODULE__, %{epoch => cache}, [name: __MODULE__])
+    GenServer.start_link(__MODULE__, block_number, [name: __MODULE__])
   end
 
   @doc """
@@ -45,13 +66,95 @@ defmodule HonteD.ABCI.Ethereum.EthashCacheServer do
     GenServer.call(__MODULE__, {:get, block_number}, @timeout)
   end
 
-  def handle_call({:get, block_number}, _from, state) do
+  def handle_call({:get, block_number}, from, state) do
     epoch = epoch(block_number)
-    case Map.fetch(state, epoch) do
-      {:ok, cache} -> {:reply, {:ok, cache}, state}
-      :error -> {:reply, :missing_cache, state}
+    state = prefetch(state, block_number)
+    case Map.fetch(state.caches, epoch) do
+      {:ok, cache} -> {:reply, {:ok, cache}, use_cache(state, epoch)}
+      :error -> {:noreply, state |> prepare_cache(epoch) |> wait_for_cache(epoch, from)}
+    end
+  end
+
+  def handle_info({ref, cache}, state) when is_reference(ref) do
+    Process.demonitor(ref, [:flush])
+    {epoch, {^ref, waiting}} = Enum.find(state.preparing, fn {_epoch, {task_ref, _}} -> task_ref == ref end)
+    Enum.each(waiting, &GenServer.reply(&1, {:ok, cache}))
+
+    state = %{state | preparing: Map.delete(state.preparing, epoch)}
+    {:noreply, put_cache(state, epoch, cache)}
+  end
+
+  defp prefetch(state, block_number) do
+    if rem(block_number, @epoch_length) >= @epoch_length - @prefetch_distance do
+      prepare_cache(state, epoch(block_number) + 1)
+    else
+      state
+    end
+  end
+
+  defp prepare_cache(state, epoch) do
+    if Map.has_key?(state.caches, epoch) or Map.has_key?(state.preparing, epoch) do
+      state
+    else
+      dir = state.dir
+      %Task{ref: ref} = Task.async(fn -> load_or_make_cache(dir, epoch) end)
+      %{state | preparing: Map.put(state.preparing, epoch, {ref, []})}
+    end
+  end
+
+  defp wait_for_cache(state, epoch, from) do
+    %{state | preparing: Map.update!(state.preparing, epoch, fn {ref, waiting} -> {ref, [from | waiting]} end)}
+  end
+
+  defp put_cache(state, epoch, cache) do
+    {recent_epochs, evicted_epochs} = Enum.split([epoch | state.recent_epochs], @epochs_in_memory)
+    %{state | caches: state.caches |> Map.put(epoch, cache) |> Map.drop(evicted_epochs),
+              recent_epochs: recent_epochs}
+  end
+
+  defp use_cache(state, epoch) do
+    %{state | recent_epochs: [epoch | List.delete(state.recent_epochs, epoch)]}
+  end
+
+  defp load_or_make_cache(dir, epoch) do
+    path = cache_path(dir, epoch)
+    case File.read(path) do
+      {:ok, cache} ->
+        cache
+      {:error, :enoent} ->
+        cache = make_cache(epoch)
+        store_cache(dir, epoch, cache)
+        cache
+    end
+  end
+
+  defp make_cache(epoch) do
+    lines = EthashCache.make_cache(epoch * @epoch_length)
+    for line <- lines, word <- line, into: <<>>, do: <<word :: little-32>>
+  end
+
+  defp store_cache(dir, epoch, cache) do
+    # written under a temporary name first, so that a partially written cache is never loaded
+    path = cache_path(dir, epoch)
+    :ok = File.write(path <> ".tmp", cache)
+    :ok = File.rename(path <> ".tmp", path)
+
+    dir
+    |> File.ls!()
+    |> Enum.flat_map(&stored_epoch/1)
+    |> Enum.filter(fn stored_epoch -> stored_epoch <= epoch - @epochs_on_disk end)
+    |> Enum.each(&File.rm(cache_path(dir, &1)))
+  end
+
+  defp cache_path(dir, epoch), do: Path.join(dir, "cache-#{epoch}")
+
+  defp stored_epoch("cache-" <> epoch) do
+    case Integer.parse(epoch) do
+      {epoch, ""} -> [epoch]
+      _ -> []
     end
   end
+  defp stored_epoch(_), do: []
 
   defp epoch(block_number), do: div(block_number, @epoch_length)
 
@@ -16,8 +16,9 @@ defmodule HonteD.ABCI.Ethereum.ProofOfWork do
   @moduledoc """
   Validates proof of work for Ethereum block
   """
-  alias HonteD.ABCI.Ethereum.EthashUtils
+  alias HonteD.ABCI.Ethereum.EthashCache
   alias HonteD.ABCI.Ethereum.EthashCacheServer
+  alias HonteD.ABCI.Ethereum.EthashUtils
 
   @hash_length 32
   @nonce_length 8
@@ -37,11 +38,9 @@ defmodule HonteD.ABCI.Ethereum.ProofOfWork do
     if byte_size(mix_hash) == @hash_length and byte_size(header_hash) == @hash_length and
        byte_size(nonce) == @nonce_length do
       {:ok, cache} = EthashCacheServer.get_cache(block_number)
-      cache = list_to_map(cache, 0, %{})
       full_size = full_dataset_size(block_number)
 
-      [mix_digest: digest, result: pow_hash] =
-        HonteD.ABCI.Ethereum.Ethash.hashimoto_light(full_size, cache, header_hash, nonce)
+      {digest, pow_hash} = EthashCache.hashimoto_light(full_size, cache, header_hash, nonce)
       if digest == mix_hash do
         EthashUtils.big_endian_to_int(pow_hash) <= div(@max_hash, difficulty)
       else
@@ -57,9 +56,4 @@ defmodule HonteD.ABCI.Ethereum.ProofOfWork do
     EthashUtils.e_prime(initial, @mix_bytes)
   end
 
-  defp list_to_map([], _idx, map), do: map
-  defp list_to_map([head | tail], idx, map) do
-    list_to_map(tail, idx + 1, Map.put(map, idx, head))
-  end
-
 end
@@ -0,0 +1,80 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.ABCI.Matching do
+  @moduledoc """
+  Discrete-interval batch matching of orders, run at the end of every block, see docs/batch_matching.md.
+
+  Orders are matched in `HonteD.ABCI.OrderBook` and the matches are executed on the state, all of a pair's
+  at the same price: the mid-point between the prices of the last matched buy and sell orders.
+  Only the pairs which got new orders in the block are matched, other books can't cross
+  """
+
+  alias HonteD.ABCI.{MPTState, OrderBook, State}
+
+  @doc """
+  Matches orders for the block at `height`: orders with time-out at `height` are cancelled, then the ones with
+  time-in at `height` enter the books and their pairs are matched
+  """
+  @spec end_block(MPTState.t, OrderBook.t, HonteD.block_height) :: {MPTState.t, OrderBook.t}
+  def end_block(state, order_book, height) do
+    {order_book, expired} = OrderBook.expire(order_book, height)
+    state = Enum.reduce(expired, state, fn {id, _order}, state -> State.cancel_order(state, id) end)
+
+    {order_book, pairs} = OrderBook.activate(order_book, height)
+    Enum.reduce(pairs, {state, order_book}, fn pair, {state, order_book} ->
+      {order_book, fills, last_matched} = OrderBook.match(order_book, pair)
+      {settle(state, fills, last_matched), order_book}
+    end)
+  end
+
+  defp settle(state, [], nil), do: state
+  defp settle(state, fills, {last_buy, last_sell}) do
+    # the mid-point price, (buy.limit / buy.amount + sell.limit / sell.amount) / 2, as a fraction
+    price = {last_buy.limit * last_sell.amount + last_sell.limit * last_buy.amount,
+             2 * last_buy.amount * last_sell.amount}
+    fills
+    |> Enum.group_by(fn {buy_id, _, _} -> buy_id end, fn {_, sell_id, volume} -> {sell_id, volume} end)
+    |> Enum.reduce(state, fn {buy_id, sells}, state -> settle_buy(state, buy_id, sells, price) end)
+  end
+
+  # A buyer pays for the whole volume it bought in the block at the price, rounded up, but never more than it
+  # escrowed, i.e. its limit. The payment is split among the sellers in proportion to their volumes, the units
+  # left after rounding down go to the largest remainders (the first filled of equal ones). So a seller gets at
+  # least its volume at the price rounded down, which is never less than its limit (pro rata for a partial fill,
+  # rounded down). Only rounding up in the buyer's earlier blocks can leave its escrow short of that
+  defp settle_buy(state, buy_id, sells, {numerator, denominator}) do
+    volume = sells |> Enum.map(fn {_, sold} -> sold end) |> Enum.sum()
+    payment = min(ceil_div(volume * numerator, denominator), State.order(state, buy_id).escrow)
+
+    shares = for {sell_id, sold} <- sells, do: {sell_id, sold, div(sold * payment, volume), rem(sold * payment, volume)}
+    left = payment - (shares |> Enum.map(fn {_, _, share, _} -> share end) |> Enum.sum())
+    rounded_up =
+      shares
+      |> Enum.with_index()
+      |> Enum.sort_by(fn {{_, _, _, remainder}, index} -> {-remainder, index} end)
+      |> Enum.take(left)
+      |> MapSet.new(fn {_, index} -> index end)
+
+    shares
+    |> Enum.with_index()
+    |> Enum.reduce(state, fn {{sell_id, sold, share, _}, index}, state ->
+      share = if MapSet.member?(rounded_up, index), do: share + 1, else: share
+      State.settle_fill(state, buy_id, sell_id, sold, share)
+    end)
+  end
+
+  defp ceil_div(dividend, divisor), do: div(dividend + divisor - 1, divisor)
+
+end
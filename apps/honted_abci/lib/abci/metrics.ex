@@ -0,0 +1,101 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.ABCI.Metrics do
+  @moduledoc """
+  Always-on instrumentation of the ABCI app: latency histograms of its callbacks and gauges of the size of its
+  state. Queried with `/metrics`, see `HonteD.API.metrics/0`.
+
+  Like the state's databases, metrics are kept in the process dictionary of the process handling the ABCI calls,
+  so recording costs a few map updates and needs no synchronization.
+
+  Histograms count times in power-of-two buckets of microseconds: bucket `n` holds times below `n` and at least
+  `n / 2`. Percentiles are the upper bounds of the buckets they fall in
+  """
+
+  @histograms {__MODULE__, :histograms}
+  @gauges {__MODULE__, :gauges}
+
+  @doc """
+  Runs `fun`, recording how long it took in the histogram `name`. Returns what `fun` returns
+  """
+  @spec timed(atom, (() -> result)) :: result when result: any
+  def timed(name, fun) do
+    started = System.monotonic_time()
+    result = fun.()
+    record(name, System.convert_time_unit(System.monotonic_time() - started, :native, :microsecond))
+    result
+  end
+
+  @doc """
+  Records a time in the histogram `name`
+  """
+  @spec record(atom, non_neg_integer) :: :ok
+  def record(name, microseconds) do
+    histograms = Process.get(@histograms, %{})
+    bucket = bucket(microseconds)
+    histogram =
+      case Map.fetch(histograms, name) do
+        {:ok, %{count: count, sum: sum, max: max, buckets: buckets}} ->
+          %{count: count + 1, sum: sum + microseconds, max: Kernel.max(max, microseconds),
+            buckets: Map.update(buckets, bucket, 1, &(&1 + 1))}
+        :error ->
+          %{count: 1, sum: microseconds, max: microseconds, buckets: %{bucket => 1}}
+      end
+    Process.put(@histograms, Map.put(histograms, name, histogram))
+    :ok
+  end
+
+  @doc """
+  Sets gauges, given as a map of name => value
+  """
+  @spec set(%{atom => number}) :: :ok
+  def set(gauges) do
+    Process.put(@gauges, Map.merge(Process.get(@gauges, %{}), gauges))
+    :ok
+  end
+
+  @doc """
+  All the metrics recorded so far: a summary of every histogram (count, mean, max, percentiles and the non-empty
+  buckets) and the gauges
+  """
+  @spec report() :: %{histograms: %{atom => map}, gauges: %{atom => number}}
+  def report do
+    histograms = for {name, histogram} <- Process.get(@histograms, %{}), into: %{}, do: {name, summary(histogram)}
+    %{histograms: histograms, gauges: Process.get(@gauges, %{})}
+  end
+
+  defp summary(%{count: count, sum: sum, max: max, buckets: buckets}) do
+    sorted_buckets = Enum.sort(buckets)
+    %{count: count, mean_us: div(sum, count), max_us: max,
+      p50_us: percentile(sorted_buckets, count, 50),
+      p90_us: percentile(sorted_buckets, count, 90),
+      p99_us: percentile(sorted_buckets, count, 99),
+      buckets: for({bucket, bucket_count} <- sorted_buckets, into: %{}, do: {to_string(bucket), bucket_count})}
+  end
+
+  defp percentile(sorted_buckets, count, percent) do
+    rank = Float.ceil(count * percent / 100)
+    Enum.reduce_while(sorted_buckets, 0, fn {bucket, bucket_count}, below ->
+      if below + bucket_count >= rank, do: {:halt, bucket}, else: {:cont, below + bucket_count}
+    end)
+  end
+
+  # the smallest power of two above `microseconds`
+  defp bucket(microseconds), do: Bitwise.bsl(1, bit_length(microseconds))
+
+  defp bit_length(0), do: 0
+  defp bit_length(n), do: 1 + bit_length(Bitwise.bsr(n, 1))
+
+end
@@ -15,56 +15,106 @@
 defmodule HonteD.ABCI.MPTState do
   @moduledoc """
   Utility functions for state stored in Merkle Patricia Tree
+
+  Writes are buffered and only applied to the trie by `flush/1`, in one batch, see `HonteD.ABCI.TrieBatch`.
+  This way a key written many times in a block (e.g. a nonce or a balance) is written to the trie once, every
+  node changed in the block is hashed once and states that are never hashed (like the CheckTx state) are never
+  written to the trie at all
+
+  Hashed keys and values read from the trie are cached in the process dictionary, so hot keys (e.g. nonces and
+  balances of frequent senders) aren't rehashed and decoded over and over. Values are cached by the root hash of
+  the trie they're read from, which makes them valid for any state with the same root.
+  Both caches are bounded, they're emptied when full
   """
   # TODO: this wrapper as well as the underlying Merkle Patricia Tree library needs some optimizations
   #       according to profiler output takeaways
 
+  alias HonteD.ABCI.TrieBatch
   alias MerklePatriciaTree.Trie
 
+  defstruct [:trie,
+             writes: %{}, # hashed key => value not yet written to the trie
+            ]
+
+  @type t :: %__MODULE__{trie: Trie.t, writes: %{binary => any}}
+
   # TODO: do not encode value types, remove when ABCI is ready for that.
   #       That would be after the changes switching to use of real signatures were merged
-  @encoded_bool "b"
-  @encoded_int "i"
-  @encoded_sign_off "s"
-  @encoded_default "d"
+  @encoded_false 0
+  @encoded_true 1
+  @encoded_int 2
+  @encoded_sign_off 3
+  @encoded_default 4
+  @encoded_order 5
+
+  # fields of an order record (see `HonteD.ABCI.State`), in their encoded order; the first 4 are binaries
+  @order_fields [:sender, :side, :asset, :base_asset, :amount, :limit, :time_in, :time_out, :remaining, :escrow]
 
-  defp hash_key(key), do: HonteD.Crypto.hash(key)
+  @cache_size 10_000
 
-  defp decode_integer(bytes) when is_binary(bytes), do: :binary.decode_unsigned(bytes)
+  defp hash_key(key) do
+    cached(:hashed_keys, key, fn -> HonteD.Crypto.hash(key) end)
+  end
 
-  defp encode_boolean(boolean) when is_boolean(boolean), do: Atom.to_string(boolean)
+  defp cached(cache_name, key, compute) do
+    cache = Process.get({__MODULE__, cache_name}, %{})
+    case Map.fetch(cache, key) do
+      {:ok, value} ->
+        value
+      :error ->
+        value = compute.()
+        cache = if map_size(cache) >= @cache_size, do: %{}, else: cache
+        Process.put({__MODULE__, cache_name}, Map.put(cache, key, value))
+        value
+    end
+  end
 
-  defp decode_boolean(value), do: String.to_existing_atom(value)
+  @doc """
+  Empties the caches of hashed keys and values of the calling process
+  """
+  @spec clear_caches() :: :ok
+  def clear_caches do
+    Process.delete({__MODULE__, :hashed_keys})
+    Process.delete({__MODULE__, :values})
+    :ok
+  end
 
-  def get(state, key) do
+  @spec new(Trie.t) :: t
+  def new(trie), do: %__MODULE__{trie: trie}
+
+  def get(%__MODULE__{trie: trie, writes: writes}, key) do
     hashed_key = hash_key(key)
-    case MerklePatriciaTree.Trie.get(state, hashed_key) do
-      [@encoded_bool, val] -> decode_boolean(val)
-      [@encoded_int, val] -> decode_integer(val)
-      [@encoded_sign_off, [height, hash]] -> %{height: decode_integer(height), hash: hash}
-      [@encoded_default, val] -> val
-      _ -> nil
+    case Map.fetch(writes, hashed_key) do
+      {:ok, value} -> value
+      :error -> cached(:values, {trie.root_hash, hashed_key}, fn -> trie |> Trie.get(hashed_key) |> decode_value() end)
     end
   end
 
-  def put(state, key, %{height: height, hash: hash}) do
-    do_put(state, key, [height, hash], fn v -> [@encoded_sign_off, v] end)
-  end
-  def put(state, key, value) when is_boolean(value),
-    do: do_put(state, key, value, fn v -> [@encoded_bool, encode_boolean(v)] end)
-  def put(state, key, value) when is_integer(value) do
-     do_put(state, key, value, fn v -> [@encoded_int, v] end)
+  defp decode_value(<<@encoded_false>>), do: false
+  defp decode_value(<<@encoded_true>>), do: true
+  defp decode_value(<<@encoded_int, bytes :: binary>>), do: :binary.decode_unsigned(bytes)
+  defp decode_value(<<@encoded_sign_off, height :: 64, hash :: binary>>), do: %{height: height, hash: hash}
+  defp decode_value(<<@encoded_default, rlp :: binary>>), do: ExRLP.decode(rlp)
+  defp decode_value(<<@encoded_order, rlp :: binary>>) do
+    [sender, side, asset, base_asset | integers] = ExRLP.decode(rlp)
+    values = [sender, side, asset, base_asset | Enum.map(integers, &:binary.decode_unsigned/1)]
+    @order_fields |> Enum.zip(values) |> Map.new()
   end
-  def put(state, key, value), do: do_put(state, key, value, fn v -> [@encoded_default, v] end)
+  defp decode_value(_), do: nil
 
-  defp do_put(state, key, value, encode_value) do
-    hashed_key = hash_key(key)
-    Trie.update(state, hashed_key, encode_value.(value))
+  def put(%__MODULE__{writes: writes} = state, key, value) do
+    %{state | writes: Map.put(writes, hash_key(key), value)}
   end
 
+  defp encode_value(%{height: height, hash: hash}), do: <<@encoded_sign_off, height :: 64, hash :: binary>>
+  defp encode_value(%{side: _, remaining: _} = order),
+    do: <<@encoded_order, ExRLP.encode(for field <- @order_fields, do: Map.fetch!(order, field)) :: binary>>
+  defp encode_value(false), do: <<@encoded_false>>
+  defp encode_value(true), do: <<@encoded_true>>
+  defp encode_value(value) when is_integer(value), do: <<@encoded_int, :binary.encode_unsigned(value) :: binary>>
+  defp encode_value(value), do: <<@encoded_default, ExRLP.encode(value) :: binary>>
+
   def update!(state, key, update) do
-    old_value = get(state, key)
-    put(state, key, update.(old_value))
     case get(state, key) do
       nil -> raise KeyError
       old_value -> put(state, key, update.(old_value))
@@ -78,4 +128,19 @@ defmodule HonteD.ABCI.MPTState do
     end
   end
 
+  @doc """
+  Applies the buffered writes to the trie
+  """
+  @spec flush(t) :: t
+  def flush(%__MODULE__{writes: writes} = state) when writes == %{}, do: state
+  def flush(%__MODULE__{trie: trie, writes: writes}) do
+    %__MODULE__{trie: TrieBatch.update(trie, for({hashed_key, value} <- writes, do: {hashed_key, encode_value(value)}))}
+  end
+
+  @doc """
+  Root hash of the trie with the buffered writes applied
+  """
+  @spec root_hash(t) :: binary
+  def root_hash(state), do: flush(state).trie.root_hash
+
 end
@@ -0,0 +1,162 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.ABCI.OrderBook do
+  @moduledoc """
+  In-memory order books of the batch matching engine, see docs/batch_matching.md and `HonteD.ABCI.Matching`.
+
+  Every pair of assets (asset, base asset) has its own books of buy and sell orders, in `:gb_trees` sorted best
+  offer first: by price, then by time-in and, as the last resort, by the order of placing (the order's id).
+  Orders wait in `pending` till their time-in and are indexed by their time-out, so every block only touches
+  the orders that enter, leave or are matched in it.
+
+  The order records in the state are what consensus is about, this is only an index of them. Orders here carry
+  their `remaining` amount, the rest of what's needed to match them doesn't change
+  """
+
+  # prices (limit / amount, amounts < 2^256) are compared exactly as integers scaled by 2^512:
+  # different prices differ by more than 2^-512
+  @price_scale_bits 512
+
+  defstruct pending: %{},  # time-in => orders entering then, `[{id, order}]`
+            expiring: %{}, # time-out => orders leaving then, `[{pair, side, key}]`
+            books: %{}     # pair => side => :gb_trees of key => `{id, order}`
+
+  @type id :: non_neg_integer
+  @type pair :: {HonteD.token, HonteD.token}
+  @type side :: HonteD.side
+  @type order :: %{required(:side) => side, required(:remaining) => non_neg_integer, optional(atom) => any}
+  @type fill :: {buy :: id, sell :: id, volume :: pos_integer}
+  @type t :: %__MODULE__{
+    pending: %{HonteD.block_height => [{id, order}]},
+    expiring: %{HonteD.block_height => [{pair, side, tuple}]},
+    books: %{pair => %{side => :gb_trees.tree}},
+  }
+
+  @spec new() :: t
+  def new, do: %__MODULE__{}
+
+  @doc """
+  Adds an order, to enter the books at its time-in
+  """
+  @spec place(t, id, order) :: t
+  def place(%__MODULE__{pending: pending} = order_book, id, %{time_in: time_in} = order) do
+    %{order_book | pending: Map.update(pending, time_in, [{id, order}], &[{id, order} | &1])}
+  end
+
+  @doc """
+  Puts the orders with time-in at `height` into the books. Returns the pairs they're for, sorted
+  """
+  @spec activate(t, HonteD.block_height) :: {t, [pair]}
+  def activate(%__MODULE__{pending: pending} = order_book, height) do
+    {entering, pending} = Map.pop(pending, height, [])
+    order_book =
+      entering
+      |> Enum.reverse()
+      |> Enum.reduce(%{order_book | pending: pending}, fn {id, order}, order_book -> insert(order_book, id, order) end)
+    pairs = entering |> Enum.map(fn {_id, order} -> pair(order) end) |> Enum.uniq() |> Enum.sort()
+    {order_book, pairs}
+  end
+
+  @doc """
+  Takes the orders with time-out at `height` out of the books. Returns the ones which weren't filled, by id
+  """
+  @spec expire(t, HonteD.block_height) :: {t, [{id, order}]}
+  def expire(%__MODULE__{expiring: expiring} = order_book, height) do
+    {leaving, expiring} = Map.pop(expiring, height, [])
+    {order_book, expired} =
+      leaving
+      |> Enum.reverse()
+      |> Enum.reduce({%{order_book | expiring: expiring}, []}, &take_out/2)
+    {order_book, Enum.reverse(expired)}
+  end
+
+  @doc """
+  Matches the books of `pair`, best offers first, till the best buy and sell orders don't cross.
+  Every match is for the smaller remaining amount of the two, the other order stays in the book with the rest.
+
+  Returns the matches, in order, and the last matched buy and sell orders - these decide the price
+  """
+  @spec match(t, pair) :: {t, [fill], {order, order} | nil}
+  def match(order_book, pair), do: do_match(order_book, pair, [], nil)
+
+  defp do_match(order_book, pair, fills, last) do
+    with {buy_key, {buy_id, buy}} <- best(order_book, pair, "buy"),
+         {sell_key, {sell_id, sell}} <- best(order_book, pair, "sell"),
+         true <- crosses?(buy, sell) do
+      volume = min(buy.remaining, sell.remaining)
+      order_book =
+        order_book
+        |> fill(pair, "buy", buy_key, buy_id, buy, volume)
+        |> fill(pair, "sell", sell_key, sell_id, sell, volume)
+      do_match(order_book, pair, [{buy_id, sell_id, volume} | fills], {buy, sell})
+    else
+      _ -> {order_book, Enum.reverse(fills), last}
+    end
+  end
+
+  @doc """
+  Number of orders in the books, i.e. active ones, which might still be matched
+  """
+  @spec size(t) :: non_neg_integer
+  def size(%__MODULE__{books: books}) do
+    Enum.sum(for {_pair, sides} <- books, {_side, book} <- sides, do: :gb_trees.size(book))
+  end
+
+  defp crosses?(buy, sell), do: buy.limit * sell.amount >= sell.limit * buy.amount
+
+  defp best(order_book, pair, side) do
+    book = book(order_book, pair, side)
+    if :gb_trees.is_empty(book), do: nil, else: :gb_trees.smallest(book)
+  end
+
+  defp fill(order_book, pair, side, key, _id, %{remaining: volume}, volume),
+    do: put_book(order_book, pair, side, :gb_trees.delete(key, book(order_book, pair, side)))
+  defp fill(order_book, pair, side, key, id, order, volume) do
+    filled = {id, %{order | remaining: order.remaining - volume}}
+    put_book(order_book, pair, side, :gb_trees.update(key, filled, book(order_book, pair, side)))
+  end
+
+  defp insert(%__MODULE__{expiring: expiring} = order_book, id, %{side: side, time_out: time_out} = order) do
+    pair = pair(order)
+    key = key(id, order)
+    order_book = put_book(order_book, pair, side, :gb_trees.insert(key, {id, order}, book(order_book, pair, side)))
+    %{order_book | expiring: Map.update(expiring, time_out, [{pair, side, key}], &[{pair, side, key} | &1])}
+  end
+
+  defp take_out({pair, side, key}, {order_book, expired} = acc) do
+    book = book(order_book, pair, side)
+    case :gb_trees.lookup(key, book) do
+      {:value, id_order} -> {put_book(order_book, pair, side, :gb_trees.delete(key, book)), [id_order | expired]}
+      :none -> acc
+    end
+  end
+
+  # best offer is the smallest key: highest price of a buy, lowest price of a sell
+  defp key(id, %{side: "buy", time_in: time_in} = order), do: {-price(order), time_in, id}
+  defp key(id, %{side: "sell", time_in: time_in} = order), do: {price(order), time_in, id}
+
+  defp price(%{limit: limit, amount: amount}), do: div(Bitwise.bsl(limit, @price_scale_bits), amount)
+
+  defp pair(%{asset: asset, base_asset: base_asset}), do: {asset, base_asset}
+
+  defp book(%__MODULE__{books: books}, pair, side) do
+    books |> Map.get(pair, %{}) |> Map.get(side, :gb_trees.empty())
+  end
+
+  defp put_book(%__MODULE__{books: books} = order_book, pair, side, book) do
+    %{order_book | books: Map.update(books, pair, %{side => book}, &Map.put(&1, side, book))}
+  end
+
+end
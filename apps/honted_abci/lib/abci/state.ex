@@ -27,14 +27,19 @@ defmodule HonteD.ABCI.State do
   # indicates that epoch change is in progress, is set to true in epoch change transaction
   # and set to false when state is processed in EndBlock
   @epoch_change_key "contract/epoch_change"
+  # number of orders placed so far, the next order's id
+  @order_count_key "orders/count"
+  # consensus rule: an order must be placed at least `lead-in` blocks before its time-in, see docs/batch_matching.md
+  @order_lead_in 2
 
   def initial(db_name) do
-    # TODO: this DB isn't persistent, see TODOs in README.md
     trie = MerklePatriciaTree.Trie.new(ProcessRegistryDB.init(db_name))
 
     trie
+    |> MPTState.new()
     |> MPTState.put(@epoch_number_key, 0)
     |> MPTState.put(@epoch_change_key, false)
+    |> MPTState.flush()
   end
 
   def lookup(state, key) do
@@ -51,14 +56,27 @@ defmodule HonteD.ABCI.State do
     end
   end
 
-  def issued_tokens(state, address) do
-    key = "issuers/" <> to_string(address)
-    case MPTState.get(state, key) do
+  @doc """
+  Tokens issued by `address`, most recently created first: `limit` of them (all by default), after skipping `offset`.
+
+  Reads the issuer's index of tokens, kept by `CreateToken`, so it costs O(limit), not O(all tokens issued).
+  `nil` if `address` has issued no tokens
+  """
+  def issued_tokens(state, address, offset \\ 0, limit \\ :all) do
+    issuer = to_string(address)
+    case MPTState.get(state, "issuers/#{issuer}/count") do
       nil -> nil
-      value -> {:ok, value |> scan_potential_issued(state, to_string(address))}
+      count -> {:ok, read_issued_tokens(state, issuer, count, offset, limit)}
     end
   end
 
+  defp read_issued_tokens(_state, _issuer, count, offset, _limit) when offset >= count, do: []
+  defp read_issued_tokens(state, issuer, count, offset, limit) do
+    newest = count - 1 - offset
+    oldest = if limit == :all, do: 0, else: max(newest - limit + 1, 0)
+    for index <- newest..oldest, do: MPTState.get(state, "issuers/#{issuer}/#{index}")
+  end
+
   def exec(state, %Transaction.SignedTx{raw_tx: %Transaction.CreateToken{} = tx}) do
 
     with :ok <- nonce_valid?(state, tx.issuer, tx.nonce),
@@ -127,6 +145,17 @@ defmodule HonteD.ABCI.State do
                    |> bump_nonce_after(tx, tx.nonce)}
   end
 
+  def exec(state, %Transaction.SignedTx{raw_tx: %Transaction.Order{} = tx}, height) when is_integer(height) do
+    {escrow_asset, escrow} = escrow(tx)
+
+    with :ok <- nonce_valid?(state, tx.sender, tx.nonce),
+         :ok <- before_lead_in?(height, tx.time_in),
+         :ok <- account_has_at_least?(state, "accounts/#{escrow_asset}/#{tx.sender}", escrow),
+         do: {:ok, state
+                   |> apply_place_order(tx, escrow_asset, escrow)
+                   |> bump_nonce_after(tx, tx.nonce)}
+  end
+
   def validator_block_passed?(staking, epoch) do
     # We enumerate epochs starting from 0
     # Calculating validator block height is based on HonteStaking Ethereum contract
@@ -145,6 +174,10 @@ defmodule HonteD.ABCI.State do
     if is_next_epoch and not epoch_change?(state), do: :ok, else: {:error, :invalid_epoch_change}
   end
 
+  defp before_lead_in?(height, time_in) do
+    if height <= time_in - @order_lead_in, do: :ok, else: {:error, :order_too_late}
+  end
+
   defp account_has_at_least?(state, key_src, amount) do
     {:ok, stored_amount} = lookup(state, key_src, 0)
     if stored_amount >= amount, do: :ok, else: {:error, :insufficient_funds}
@@ -194,13 +227,31 @@ defmodule HonteD.ABCI.State do
 
   defp apply_create_token(state, issuer, nonce) do
     token_addr = HonteD.Token.create_address(issuer, nonce)
+    # issuer's tokens are indexed by order of creation, `count` being the next index
+    count = MPTState.get(state, "issuers/#{issuer}/count") || 0
     state
     |> MPTState.put("tokens/#{token_addr}/issuer", issuer)
     |> MPTState.put("tokens/#{token_addr}/total_supply", 0)
-    # NOTE: check for duplicate entries or don't care?
-    |> MPTState.update("issuers/#{issuer}", [token_addr], fn previous -> [token_addr | previous] end)
+    |> MPTState.put("issuers/#{issuer}/#{count}", token_addr)
+    |> MPTState.put("issuers/#{issuer}/count", count + 1)
+  end
+
+  defp apply_place_order(state, tx, escrow_asset, escrow) do
+    id = MPTState.get(state, @order_count_key) || 0
+    order =
+      tx
+      |> Map.take([:sender, :side, :asset, :base_asset, :amount, :limit, :time_in, :time_out])
+      |> Map.merge(%{remaining: tx.amount, escrow: escrow})
+    state
+    |> MPTState.update!("accounts/#{escrow_asset}/#{tx.sender}", &(&1 - escrow))
+    |> MPTState.put("orders/#{id}", order)
+    |> MPTState.put(@order_count_key, id + 1)
   end
 
+  # buy orders escrow the most they can pay, sell orders the whole amount sold
+  defp escrow(%{side: "buy", base_asset: base_asset, limit: limit}), do: {base_asset, limit}
+  defp escrow(%{side: "sell", asset: asset, amount: amount}), do: {asset, amount}
+
   defp apply_change_asset(state, asset, amount, dest) do
     key_dest = "accounts/#{asset}/#{dest}"
     state
@@ -236,13 +287,62 @@ defmodule HonteD.ABCI.State do
     MPTState.put(state, key, current_nonce + 1)
   end
 
-  def hash(state), do: state.root_hash
+  def hash(state), do: MPTState.root_hash(state)
 
-  defp scan_potential_issued(unfiltered_tokens, state, issuer) do
-    unfiltered_tokens
-    |> Enum.filter(fn token_addr -> MPTState.get(state, "tokens/#{token_addr}/issuer") == issuer end)
+  @doc """
+  Order record stored under `id`. Besides the fields of the placing transaction it holds the `remaining` amount
+  to be matched and the `escrow` left (of the base asset for buy orders, of the asset for sell orders)
+  """
+  def order(state, id), do: MPTState.get(state, "orders/#{id}")
+
+  @doc """
+  The most recently placed order, as `{id, order}`
+  """
+  def last_order(state) do
+    id = MPTState.get(state, @order_count_key) - 1
+    {id, order(state, id)}
   end
 
+  @doc """
+  Executes a match of a buy and a sell order: `volume` of the asset goes from the seller's escrow to the buyer,
+  `payment` of the base asset goes from the buyer's escrow to the seller.
+  What's left in the escrow of a completely filled order is returned to its sender
+  """
+  def settle_fill(state, buy_id, sell_id, volume, payment) do
+    buy = order(state, buy_id)
+    sell = order(state, sell_id)
+    state
+    |> credit(buy.asset, buy.sender, volume)
+    |> credit(buy.base_asset, sell.sender, payment)
+    |> put_order(buy_id, %{buy | remaining: buy.remaining - volume, escrow: buy.escrow - payment})
+    |> put_order(sell_id, %{sell | remaining: sell.remaining - volume, escrow: sell.escrow - volume})
+  end
+
+  @doc """
+  Closes an order which timed out, returning its escrow to the sender
+  """
+  def cancel_order(state, id) do
+    order = order(state, id)
+    put_order(state, id, %{order | remaining: 0})
+  end
+
+  defp put_order(state, id, %{remaining: 0, escrow: escrow} = order) when escrow > 0 do
+    {escrow_asset, _} = escrow(order)
+    state
+    |> credit(escrow_asset, order.sender, escrow)
+    |> put_order(id, %{order | escrow: 0})
+  end
+  defp put_order(state, id, order), do: MPTState.put(state, "orders/#{id}", order)
+
+  defp credit(state, _asset, _address, 0), do: state
+  defp credit(state, asset, address, amount),
+    do: MPTState.update(state, "accounts/#{asset}/#{address}", amount, &(&1 + amount))
+
+  @doc """
+  Applies the writes buffered in the state to its trie, see `MPTState.flush/1`
+  """
+  def flush(state), do: MPTState.flush(state)
+
   def epoch_change?(state) do
     {:ok, value} = lookup(state, @epoch_change_key, false)
     value
@@ -252,14 +352,29 @@ defmodule HonteD.ABCI.State do
 
   def epoch_number(state), do: MPTState.get(state, @epoch_number_key)
 
+  @doc """
+  Size of the state, for metrics: number of keys written and not yet applied to the trie and of the trie's nodes
+  written and not yet persisted, see `ProcessRegistryDB.size/1`
+  """
+  def size(%MPTState{trie: %Trie{db: {ProcessRegistryDB, db_name}}, writes: writes}),
+    do: %{writes: map_size(writes), nodes_written: ProcessRegistryDB.size(db_name)}
+
+  @doc """
+  Persists the nodes of the state written since it was last persisted, see `ProcessRegistryDB.flush/1`
+  """
+  def persist(%MPTState{trie: %Trie{db: {ProcessRegistryDB, db_name}}, writes: writes}) when writes == %{},
+    do: ProcessRegistryDB.flush(db_name)
+
   @doc """
   Returns copy of the first argument.
-  Copied database is stored in process dictionary under copy_name key.
+  The copy's database becomes an overlay of the first argument's database, under copy_name key in process
+  dictionary. Anything written to the copy before is discarded.
   """
-  def copy_state(%Trie{db: {ProcessRegistryDB, db_name}, root_hash: root_hash},
-                 %Trie{db: {ProcessRegistryDB, copy_name}} = copy) do
-    :ok = ProcessRegistryDB.copy_db(db_name, copy_name)
-    %{copy | root_hash: root_hash}
+  def copy_state(%MPTState{trie: %Trie{db: {ProcessRegistryDB, db_name}, root_hash: root_hash}, writes: writes},
+                 %MPTState{trie: %Trie{db: {ProcessRegistryDB, copy_name}} = copy})
+                 when writes == %{} do
+    :ok = ProcessRegistryDB.overlay(db_name, copy_name)
+    MPTState.new(%{copy | root_hash: root_hash})
   end
 
 end
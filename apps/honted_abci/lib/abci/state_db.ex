@@ -17,44 +17,131 @@ defmodule HonteD.ABCI.State.ProcessRegistryDB do
   Implementation of MerklePatriciaTree.DB which
   is backed by a map stored in process registry.
   This implementation allows efficient copying of MerklePatriciaTree.Trie
+
+  The map only holds nodes written since the last `flush/1`. If `:state_dir` is configured, flushed nodes are
+  persisted in LevelDB there and the most recently used ones are kept in a bounded in-memory cache.
+  Otherwise nothing is ever flushed and the whole trie stays in the map.
+  This only bounds the memory used, the state isn't recovered from LevelDB on restart.
+
+  Nodes are keyed by their hashes, so all databases in the process share the LevelDB and the cache.
+  For the same reason, a database can be an overlay of another (see `overlay/2`): it only holds its own writes
+  and reads through to the underlying database
   """
   alias MerklePatriciaTree.Trie
   alias MerklePatriciaTree.DB
 
   @behaviour MerklePatriciaTree.DB
 
+  @cache_size 100_000 # number of nodes in each of two generations of the cache
+
   @spec init(DB.db_name) :: DB.db
   def init(db_name) do
+    if Process.get(__MODULE__) == nil, do: Process.put(__MODULE__, open_store())
     Process.put(db_name, %{})
     {__MODULE__, db_name}
   end
 
   @spec get(DB.db_ref, Trie.key) :: {:ok, DB.value} | :not_found
   def get(db_name, key) do
-    state = Process.get(db_name)
-    case Map.fetch(state, key) do
-      {:ok, v} -> {:ok, v}
-      :error -> :not_found
+    case Process.get(db_name) do
+      {:overlay, base_name, writes} ->
+        case Map.fetch(writes, key) do
+          {:ok, v} -> {:ok, v}
+          :error -> get(base_name, key)
+        end
+      state ->
+        case Map.fetch(state, key) do
+          {:ok, v} -> {:ok, v}
+          :error -> get_stored(key)
+        end
     end
   end
 
   @spec put!(DB.db_ref, Trie.key, DB.value) :: :ok
   def put!(db_name, key, value) do
-    state = Process.get(db_name)
-    updated_state = Map.put(state, key, value)
+    updated_state =
+      case Process.get(db_name) do
+        {:overlay, base_name, writes} -> {:overlay, base_name, Map.put(writes, key, value)}
+        state -> Map.put(state, key, value)
+      end
     Process.put(db_name, updated_state)
     :ok
   end
 
   @doc """
-  Copies a database by overriding process dictionary entry
+  Turns `overlay_name` into an empty overlay of `base_name`, discarding anything written to it before.
+  Costs the same, regardless of the size of the underlying database
   """
-  @spec copy_db(DB.db_name, DB.db_name) :: :ok
-  def copy_db(db_name, copy_name) do
-    Process.delete(copy_name)
-    copy = Process.get(db_name)
-    Process.put(copy_name, copy)
+  @spec overlay(DB.db_name, DB.db_name) :: :ok
+  def overlay(base_name, overlay_name) do
+    Process.put(overlay_name, {:overlay, base_name, %{}})
     :ok
   end
 
+  @doc """
+  Number of nodes held in memory by a database: written since the last `flush/1` (all of them without
+  a `:state_dir`) or, for an overlay, written to the overlay
+  """
+  @spec size(DB.db_name) :: non_neg_integer
+  def size(db_name) do
+    case Process.get(db_name) do
+      {:overlay, _base_name, writes} -> map_size(writes)
+      state -> map_size(state)
+    end
+  end
+
+  @doc """
+  Persists nodes written to a database (not an overlay), in a single LevelDB write.
+  Does nothing if there's no `:state_dir`
+  """
+  @spec flush(DB.db_name) :: :ok
+  def flush(db_name) do
+    case Process.get(__MODULE__) do
+      %{leveldb: nil} ->
+        :ok
+      %{leveldb: leveldb} = store ->
+        state = Process.get(db_name)
+        :ok = Exleveldb.write(leveldb, Enum.map(state, fn {key, value} -> {:put, key, value} end))
+        Process.put(__MODULE__, Enum.reduce(state, store, fn {key, value}, store -> cache(store, key, value) end))
+        Process.put(db_name, %{})
+        :ok
+    end
+  end
+
+  defp open_store do
+    case Application.get_env(:honted_abci, :state_dir) do
+      nil ->
+        %{leveldb: nil}
+      dir ->
+        dir = Path.expand(dir)
+        :ok = File.mkdir_p(dir)
+        {:ok, leveldb} = Exleveldb.open(dir, create_if_missing: true)
+        %{leveldb: leveldb, hot: %{}, warm: %{}}
+    end
+  end
+
+  defp get_stored(key) do
+    case Process.get(__MODULE__) do
+      %{leveldb: nil} -> :not_found
+      %{leveldb: leveldb, hot: hot, warm: warm} = store ->
+        with :error <- Map.fetch(hot, key),
+             {:ok, value} <- fetch_cold(leveldb, warm, key) do
+          Process.put(__MODULE__, cache(store, key, value))
+          {:ok, value}
+        end
+    end
+  end
+
+  defp fetch_cold(leveldb, warm, key) do
+    case Map.fetch(warm, key) do
+      {:ok, value} -> {:ok, value}
+      :error -> Exleveldb.get(leveldb, key)
+    end
+  end
+
+  # used nodes are put in the hot generation, which becomes the warm one when it's full, dropping the old warm one
+  defp cache(%{hot: hot} = store, key, value) when map_size(hot) >= @cache_size,
+    do: %{store | hot: %{key => value}, warm: hot}
+  defp cache(%{hot: hot} = store, key, value), do: %{store | hot: Map.put(hot, key, value)}
+
 end
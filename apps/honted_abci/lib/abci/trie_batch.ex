@@ -0,0 +1,148 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.ABCI.TrieBatch do
+  @moduledoc """
+  Applies many writes to a Merkle Patricia Tree at once, see `HonteD.ABCI.MPTState.flush/1`.
+
+  `Trie.update` walks from the root to the key, then re-encodes and rehashes every node on the way back, so
+  `n` writes rehash the nodes near the root `n` times. Here the writes are split among the children of every
+  node walked, so each node which changes is encoded, hashed and stored once per batch.
+
+  Gives the same trie as the writes done one by one with `Trie.update`. Keys must all be of the same length
+  (they're hashed keys of the state), so that no value sits in a branch node
+  """
+
+  alias MerklePatriciaTree.Trie
+  alias MerklePatriciaTree.Trie.Node
+
+  @empty_branch List.duplicate("", 17)
+
+  @doc """
+  Writes `{key, value}` pairs to the trie, a `nil` value removes the key. Later writes of a key override the
+  earlier ones
+  """
+  @spec update(Trie.t, [{binary, binary | nil}]) :: Trie.t
+  def update(trie, []), do: trie
+  def update(trie, writes) do
+    writes =
+      writes
+      |> Map.new()
+      |> Enum.map(fn {key, value} -> {nibbles(key), value} end)
+      |> Enum.sort()
+
+    case trie |> Node.decode_trie() |> put(writes, trie) do
+      :empty -> Trie.new(trie.db)
+      node -> node |> Node.encode_node(trie) |> Trie.into(trie) |> Trie.store()
+    end
+  end
+
+  # writes (nibbles relative to the node, sorted) into a decoded node, returns the node, not encoded
+  defp put(node, [], _trie), do: node
+  defp put(:empty, writes, trie), do: build(writes, trie)
+  defp put({:leaf, key, value}, writes, trie) do
+    # the leaf becomes one of the writes, unless it's overwritten
+    writes = if List.keymember?(writes, key, 0), do: writes, else: Enum.sort([{key, value} | writes])
+    build(writes, trie)
+  end
+  defp put({:ext, prefix, child}, writes, trie) do
+    common = common_prefix_length([prefix | Enum.map(writes, &elem(&1, 0))])
+    writes = drop_prefix(writes, common)
+    case Enum.drop(prefix, common) do
+      [] ->
+        extend(prefix, child |> decode(trie) |> put(writes, trie), trie)
+      [nibble | rest] ->
+        # the extension splits into a branch, where its remaining part is one of the children
+        split = if rest == [], do: decode(child, trie), else: {:ext, rest, child}
+        {split_writes, writes} = writes |> group_by_nibble() |> Map.pop(nibble, [])
+        children = writes |> build_children(trie) |> Map.put(nibble, put(split, split_writes, trie))
+        prefix |> Enum.take(common) |> extend(branch(children, trie), trie)
+    end
+  end
+  defp put({:branch, branches}, writes, trie) do
+    writes = group_by_nibble(writes)
+    branches
+    |> Enum.with_index()
+    |> Enum.map(fn {branch, nibble} ->
+      case Map.fetch(writes, nibble) do
+        {:ok, child_writes} -> branch |> decode(trie) |> put(child_writes, trie) |> encode(trie)
+        :error -> branch
+      end
+    end)
+    |> collapse(trie)
+  end
+
+  # a new subtree holding the writes, removals of keys which aren't there are dropped
+  defp build(writes, trie) do
+    case Enum.reject(writes, fn {_, value} -> value == nil end) do
+      [] ->
+        :empty
+      [{key, value}] ->
+        {:leaf, key, value}
+      [{first, _} | _] = writes ->
+        common = common_prefix_length(Enum.map(writes, &elem(&1, 0)))
+        children = writes |> drop_prefix(common) |> group_by_nibble() |> build_children(trie)
+        first |> Enum.take(common) |> extend(branch(children, trie), trie)
+    end
+  end
+
+  defp build_children(writes_by_nibble, trie) do
+    for {nibble, writes} <- writes_by_nibble, into: %{}, do: {nibble, build(writes, trie)}
+  end
+
+  defp branch(children, trie) do
+    children
+    |> Enum.reduce(@empty_branch, fn {nibble, child}, branches ->
+      List.replace_at(branches, nibble, encode(child, trie))
+    end)
+    |> collapse(trie)
+  end
+
+  # after removals a branch can be left with one child, then it's merged with it
+  defp collapse(branches, trie) do
+    case for {branch, nibble} <- Enum.with_index(branches), branch not in ["", []], do: nibble do
+      [] -> :empty
+      [nibble] -> extend([nibble], branches |> Enum.at(nibble) |> decode(trie), trie)
+      _ -> {:branch, branches}
+    end
+  end
+
+  # prepends a prefix to a node, merging it into a leaf or an extension
+  defp extend([], node, _trie), do: node
+  defp extend(_prefix, :empty, _trie), do: :empty
+  defp extend(prefix, {:leaf, key, value}, _trie), do: {:leaf, prefix ++ key, value}
+  defp extend(prefix, {:ext, rest, child}, _trie), do: {:ext, prefix ++ rest, child}
+  defp extend(prefix, node, trie), do: {:ext, prefix, encode(node, trie)}
+
+  defp encode(:empty, _trie), do: ""
+  defp encode(node, trie), do: Node.encode_node(node, trie)
+
+  defp decode(branch, _trie) when branch in ["", []], do: :empty
+  defp decode(branch, trie), do: branch |> Trie.into(trie) |> Node.decode_trie()
+
+  defp group_by_nibble(writes) do
+    Enum.group_by(writes, fn {[nibble | _], _} -> nibble end, fn {[_ | rest], value} -> {rest, value} end)
+  end
+
+  defp drop_prefix(writes, 0), do: writes
+  defp drop_prefix(writes, length), do: for {key, value} <- writes, do: {Enum.drop(key, length), value}
+
+  defp common_prefix_length([first | rest]) do
+    Enum.reduce(rest, length(first), fn key, common ->
+      first |> Enum.zip(key) |> Enum.take(common) |> Enum.take_while(fn {a, b} -> a == b end) |> length()
+    end)
+  end
+
+  defp nibbles(key), do: for <<nibble :: 4 <- key>>, do: nibble
+end
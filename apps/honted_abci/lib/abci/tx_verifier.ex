@@ -0,0 +1,76 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.ABCI.TxVerifier do
+  @moduledoc """
+  Decodes transactions and verifies their signatures, which doesn't depend on the state of the ABCI app.
+
+  This is done in the processes handling Tendermint's ABCI connections, before calling `HonteD.ABCI`, so the
+  mempool and consensus connections verify in parallel and the ABCI process only does the state-dependent checks.
+
+  Transactions verified in CheckTx are remembered (in an ETS table owned by this process), so that they are not
+  verified again in DeliverTx
+  """
+  use GenServer
+
+  @max_verified 100_000 # the table is emptied when it reaches this many transactions
+
+  def start_link(opts) do
+    GenServer.start_link(__MODULE__, :ok, opts)
+  end
+
+  def init(:ok) do
+    __MODULE__ = :ets.new(__MODULE__, [:named_table, :public, :set, read_concurrency: true, write_concurrency: true])
+    {:ok, nil}
+  end
+
+  @doc """
+  Decodes and verifies a transaction being checked, remembering it for DeliverTx
+  """
+  @spec verify(binary) :: {:ok, HonteD.Transaction.SignedTx.t} | {:error, atom}
+  def verify(tx) do
+    case :ets.lookup(__MODULE__, tx) do
+      [{^tx, decoded}] ->
+        {:ok, decoded}
+      [] ->
+        with {:ok, decoded} <- decode_verify(tx) do
+          if :ets.info(__MODULE__, :size) >= @max_verified, do: :ets.delete_all_objects(__MODULE__)
+          :ets.insert(__MODULE__, {tx, decoded})
+          {:ok, decoded}
+        end
+    end
+  end
+
+  @doc """
+  Decodes and verifies a transaction being delivered, unless it was verified before.
+  A transaction is only delivered once, so it's forgotten
+  """
+  @spec verify_delivered(binary) :: {:ok, HonteD.Transaction.SignedTx.t} | {:error, atom}
+  def verify_delivered(tx) do
+    case :ets.take(__MODULE__, tx) do
+      [{^tx, decoded}] -> {:ok, decoded}
+      [] -> decode_verify(tx)
+    end
+  end
+
+  @doc """
+  Decodes and verifies a transaction, without remembering it
+  """
+  @spec decode_verify(binary) :: {:ok, HonteD.Transaction.SignedTx.t} | {:error, atom}
+  def decode_verify(tx) do
+    with {:ok, decoded} <- HonteD.TxCodec.decode(tx),
+         :ok <- HonteD.Transaction.Validation.valid_signed?(decoded),
+         do: {:ok, decoded}
+  end
+end
@@ -44,6 +44,10 @@ defmodule HonteD.ABCI.Mixfile do
     [
       env: [
         abci_port: 46_658, # our own abci port tendermint connects to
+        ethash_cache_dir: "~/.honted/ethash", # where caches for Ethereum proof of work checking are stored
+        # where the state's Merkle Patricia Trie is kept on disk, to bound memory; nil keeps it in memory.
+        # NOTE: the state isn't recovered from there, on restart Tendermint replays the chain anyway
+        state_dir: nil,
       ],
       extra_applications: [:logger],
       mod: {HonteD.ABCI.Application, []}
@@ -62,6 +66,7 @@ defmodule HonteD.ABCI.Mixfile do
       {:ex_rlp, "~> 0.2.1"},
       {:keccakf1600, "~> 2.0.0", hex: :keccakf1600_orig},
       {:rustler, "~> 0.10.1"},
+      {:exleveldb, "~> 0.11.1"},
       {:merkle_patricia_tree, github: "omisego/merkle_patricia_tree", branch: "pgebal/fixed_trie_get_spec"},
       {:ex_unit_fixtures, "~> 0.3.1", only: [:test]},
       #
@@ -15,7 +15,9 @@
 extern crate tiny_keccak;
 #[macro_use] extern crate rustler;
 
-use rustler::{NifEnv, NifTerm, NifResult, NifEncoder};
+use rustler::{NifEnv, NifTerm, NifResult, NifEncoder, NifError};
+use rustler::schedule::SchedulerFlags;
+use rustler::types::binary::{NifBinary, OwnedNifBinary};
 use tiny_keccak::Keccak;
 
 const HASH_SIZE_BYTES: usize = 64;
@@ -25,6 +27,13 @@ const CACHE_ROUNDS: u8 = 3;
 const CACHE_BYTES_INIT: u64 = 16777216;
 const CACHE_BYTES_GROWTH: u64 = 131072;
 const EPOCH_LENGTH: u64 = 30000;
+const MIX_BYTES: usize = 128;
+const MIX_WORDS: usize = 32; // MIX_BYTES / word bytes
+const MIX_HASHES: usize = 2; // MIX_BYTES / HASH_SIZE_BYTES
+const NONCE_BYTES: usize = 8;
+const DATASET_PARENTS: u32 = 256;
+const ACCESSES: u32 = 64;
+const FNV_PRIME: u32 = 16777619;
 
 fn xor(v1: &[u32; HASH_SIZE_WORDS], v2: &[u32; HASH_SIZE_WORDS]) -> [u32; HASH_SIZE_WORDS] {
     let mut v3: [u32; HASH_SIZE_WORDS] = [0; HASH_SIZE_WORDS];
@@ -138,12 +147,108 @@ fn create_cache_seed(block_number: u64) -> [u8; KEC_256_HASH_SIZE_BYTES] {
     seed
 }
 
+fn fnv(v1: u32, v2: u32) -> u32 {
+    v1.wrapping_mul(FNV_PRIME) ^ v2
+}
+
+// reads a line of cache serialized as by `EthashCacheServer`, i.e. as little-endian words
+fn cache_line(cache: &[u8], index: usize) -> [u32; HASH_SIZE_WORDS] {
+    let mut line: [u8; HASH_SIZE_BYTES] = [0; HASH_SIZE_BYTES];
+    line.copy_from_slice(&cache[(index * HASH_SIZE_BYTES)..((index + 1) * HASH_SIZE_BYTES)]);
+    deserialize_hash(&line)
+}
+
+fn calc_dataset_item(cache: &[u8], i: u32) -> [u32; HASH_SIZE_WORDS] {
+    let n = cache.len() / HASH_SIZE_BYTES;
+    let mut mix = cache_line(cache, (i as usize) % n);
+    mix[0] ^= i;
+    mix = hash_array(&mix);
+    for j in 0..DATASET_PARENTS {
+        let cache_index = fnv(i ^ j, mix[(j as usize) % HASH_SIZE_WORDS]) as usize;
+        let parent = cache_line(cache, cache_index % n);
+        for k in 0..HASH_SIZE_WORDS {
+            mix[k] = fnv(mix[k], parent[k]);
+        }
+    }
+    hash_array(&mix)
+}
+
+fn hashimoto_light_inner(full_size: u64, cache: &[u8], header: &[u8], nonce: &[u8])
+    -> ([u8; KEC_256_HASH_SIZE_BYTES], [u8; KEC_256_HASH_SIZE_BYTES]) {
+    let n = (full_size / (HASH_SIZE_BYTES as u64)) as u32;
+
+    let mut seed_hasher = Keccak::new_keccak512();
+    seed_hasher.update(header);
+    let nonce_little_endian: Vec<u8> = nonce.iter().rev().cloned().collect();
+    seed_hasher.update(&nonce_little_endian);
+    let mut seed_bytes: [u8; HASH_SIZE_BYTES] = [0; HASH_SIZE_BYTES];
+    seed_hasher.finalize(&mut seed_bytes);
+    let seed = deserialize_hash(&seed_bytes);
+
+    let mut mix: [u32; MIX_WORDS] = [0; MIX_WORDS];
+    for k in 0..MIX_WORDS {
+        mix[k] = seed[k % HASH_SIZE_WORDS];
+    }
+
+    let mix_index = n / (MIX_HASHES as u32);
+    for i in 0..ACCESSES {
+        let p = (fnv(i ^ seed[0], mix[(i as usize) % MIX_WORDS]) % mix_index) * (MIX_HASHES as u32);
+        for j in 0..MIX_HASHES {
+            let item = calc_dataset_item(cache, p + (j as u32));
+            for k in 0..HASH_SIZE_WORDS {
+                let idx = j * HASH_SIZE_WORDS + k;
+                mix[idx] = fnv(mix[idx], item[k]);
+            }
+        }
+    }
+
+    let mut mix_digest: [u8; KEC_256_HASH_SIZE_BYTES] = [0; KEC_256_HASH_SIZE_BYTES];
+    for k in 0..(MIX_WORDS / 4) {
+        let compressed = fnv(fnv(fnv(mix[4 * k], mix[4 * k + 1]), mix[4 * k + 2]), mix[4 * k + 3]);
+        mix_digest[(4 * k)..(4 * k + 4)].copy_from_slice(&int_to_little_endian(compressed));
+    }
+
+    let mut result_hasher = Keccak::new_keccak256();
+    result_hasher.update(&seed_bytes);
+    result_hasher.update(&mix_digest);
+    let mut result: [u8; KEC_256_HASH_SIZE_BYTES] = [0; KEC_256_HASH_SIZE_BYTES];
+    result_hasher.finalize(&mut result);
+
+    (mix_digest, result)
+}
+
+fn to_binary<'a>(env: NifEnv<'a>, bytes: &[u8]) -> NifBinary<'a> {
+    let mut binary = OwnedNifBinary::new(bytes.len()).unwrap();
+    binary.as_mut_slice().copy_from_slice(bytes);
+    binary.release(env)
+}
+
+// both run for milliseconds (hashimoto_light) to seconds (make_cache), so they're run on dirty CPU schedulers,
+// not to block the normal ones
 rustler_export_nifs!(
     "Elixir.HonteD.ABCI.Ethereum.EthashCache",
-    [("make_cache", 1, make_cache)],
+    [("make_cache", 1, make_cache, SchedulerFlags::DirtyCpu),
+     ("hashimoto_light", 4, hashimoto_light, SchedulerFlags::DirtyCpu)],
     None
 );
 
+fn hashimoto_light<'a>(env: NifEnv<'a>, args: &[NifTerm<'a>]) -> NifResult<NifTerm<'a>> {
+    let full_size: u64 = try!(args[0].decode());
+    // NOTE: binaries are read in place, the cache isn't copied
+    let cache: NifBinary = try!(args[1].decode());
+    let header: NifBinary = try!(args[2].decode());
+    let nonce: NifBinary = try!(args[3].decode());
+
+    let (cache, header, nonce) = (cache.as_slice(), header.as_slice(), nonce.as_slice());
+    if cache.len() == 0 || cache.len() % HASH_SIZE_BYTES != 0 || header.len() != KEC_256_HASH_SIZE_BYTES ||
+        nonce.len() != NONCE_BYTES || full_size < (MIX_BYTES as u64) {
+        return Err(NifError::BadArg);
+    }
+
+    let (mix_digest, result) = hashimoto_light_inner(full_size, cache, header, nonce);
+    Ok((to_binary(env, &mix_digest), to_binary(env, &result)).encode(env))
+}
+
 fn make_cache<'a>(env: NifEnv<'a>, args: &[NifTerm<'a>]) -> NifResult<NifTerm<'a>> {
     let block_number: u64 = try!(args[0].decode());
     Ok(make_cache_inner(block_number).encode(env))
@@ -234,6 +339,43 @@ mod tests {
         assert!(is_compose(173) == false);
     }
 
+    #[test]
+    fn fnv_should_overflow_like_ethash_fnv() {
+        assert_eq!(fnv(1, 2), 16777619 ^ 2);
+        assert_eq!(fnv(4294967295, 0), ((4294967295u64 * 16777619) % 4294967296) as u32);
+    }
+
+    #[test]
+    fn cache_line_should_read_little_endian_words() {
+        let mut cache = vec![0 as u8; 2 * HASH_SIZE_BYTES];
+        cache[HASH_SIZE_BYTES] = 1;
+        cache[HASH_SIZE_BYTES + 5] = 4;
+        let mut expected = [0 as u32; HASH_SIZE_WORDS];
+        expected[0] = 1;
+        expected[1] = 1024;
+        assert_eq!(&cache_line(&cache, 1)[..], &expected[..]);
+    }
+
+    #[test]
+    fn hashimoto_light_should_verify_mined_block() {
+        // Ethereum block number 4693065, see pow_test.exs
+        let block_number = 4693065;
+        let full_size = 2382363008;
+        let cache: Vec<u8> = make_cache_inner(block_number).iter()
+            .flat_map(|line| line.iter().flat_map(|&word| int_to_little_endian(word).to_vec()).collect::<Vec<u8>>())
+            .collect();
+        let header = [109, 139, 200, 231, 34, 139, 212, 173, 82, 206, 238, 66, 48, 117, 140, 115, 74, 133, 193, 190,
+            79, 56, 78, 162, 228, 252, 93, 117, 81, 189, 187, 239];
+        let nonce = [0x6c, 0xd7, 0xc4, 0xa8, 0x14, 0xcd, 0xde, 0xf9];
+        let (mix_digest, result) = hashimoto_light_inner(full_size, &cache, &header, &nonce);
+        let expected_mix_digest = [0x1e, 0xef, 0xe3, 0x93, 0x2c, 0xc6, 0x28, 0x13, 0x23, 0xcb, 0xa7, 0x7e, 0x2f, 0x28,
+            0x66, 0xce, 0xbd, 0x2b, 0x13, 0x40, 0x83, 0xe8, 0x6c, 0x23, 0x5b, 0x88, 0xf9, 0x00, 0xbf, 0x04, 0xcc, 0xf1];
+        let expected_result = [0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x1a, 0xae, 0xab, 0x6b, 0x8e, 0xf0, 0x52, 0x22,
+            0x31, 0xb1, 0xc4, 0xd0, 0x55, 0xd9, 0xdb, 0x94, 0xe8, 0x27, 0x56, 0x94, 0x19, 0x1a, 0xe0, 0x91, 0x24, 0x4f];
+        assert_eq!(&mix_digest[..], &expected_mix_digest[..]);
+        assert_eq!(&result[..], &expected_result[..]);
+    }
+
     #[test]
     fn make_cache_should_create_cache() {
         let actual = &make_cache_inner(10000)[100];
@@ -18,30 +18,103 @@ defmodule HonteD.ABCI.Ethereum.EthashCacheServerTest do
   """
   # credo:disable-for-this-file Credo.Check.Readability.LargeNumbers
   use ExUnitFixtures
-  use ExUnit.Case
-
-  @moduletag :slow
+  use ExUnit.Case, async: false
 
   @epoch_length 30000
 
   alias HonteD.ABCI.Ethereum.EthashCacheServer
+  alias HonteD.ABCI.Ethereum.EthashUtils
+
+  deffixture cache_dir() do
+    dir = Path.join(System.tmp_dir!(), "honted_ethash_test_#{:erlang.unique_integer([:positive])}")
+    original_dir = Application.get_env(:honted_abci, :ethash_cache_dir)
+    Application.put_env(:honted_abci, :ethash_cache_dir, dir)
+    on_exit fn ->
+      Application.put_env(:honted_abci, :ethash_cache_dir, original_dir)
+      File.rm_rf(dir)
+    end
+    dir
+  end
+
+  defp cache_line(cache, index), do: EthashUtils.decode_ints(binary_part(cache, index * 64, 64))
+
+  # stores a fake cache, so that it's not generated
+  defp store_cache(dir, epoch, cache) do
+    :ok = File.mkdir_p(dir)
+    :ok = File.write(Path.join(dir, "cache-#{epoch}"), cache)
+  end
+
+  defp epochs_in_memory(server), do: server |> :sys.get_state() |> Map.get(:caches) |> Map.keys() |> Enum.sort()
+
+  defp wait_for_epochs_in_memory(server, epochs, tries \\ 100) do
+    cond do
+      epochs_in_memory(server) == epochs -> :ok
+      tries > 0 ->
+        Process.sleep(10)
+        wait_for_epochs_in_memory(server, epochs, tries - 1)
+      true -> assert epochs_in_memory(server) == epochs
+    end
+  end
 
   describe "get_cache" do
+    @tag :slow
     @tag timeout: 600000
-    test "returns a cache", %{} do
+    @tag fixtures: [:cache_dir]
+    test "returns a cache", %{cache_dir: cache_dir} do
       block_number = 10000
       expected_cache_line =
         [868643959, 3179556070, 1871292480, 2635187316, 2658670881, 3651954940, 864296532, 4161655205,
          1170742362, 1613380156, 3420562092, 2441378987, 2714353747, 536405404, 2918860778, 540860293]
-      EthashCacheServer.start(block_number)
+      {:ok, server} = EthashCacheServer.start(block_number)
 
       {:ok, cache} = EthashCacheServer.get_cache(block_number)
-      assert Enum.at(cache, 100) == expected_cache_line
+      assert cache_line(cache, 100) == expected_cache_line
 
       {:ok, cache} = EthashCacheServer.get_cache(block_number + 1000) # block in the same epoch
-      assert Enum.at(cache, 100) == expected_cache_line
+      assert cache_line(cache, 100) == expected_cache_line
+
+      # cache for another epoch is generated when needed
+      {:ok, next_cache} = EthashCacheServer.get_cache(block_number + @epoch_length)
+      assert cache_line(next_cache, 100) != expected_cache_line
+
+      assert Enum.sort(File.ls!(cache_dir)) == ["cache-0", "cache-1"]
+
+      GenServer.stop(server)
+    end
+
+    @tag fixtures: [:cache_dir]
+    test "loads caches stored on disk", %{cache_dir: cache_dir} do
+      store_cache(cache_dir, 0, "cache of epoch 0")
+      store_cache(cache_dir, 2, "cache of epoch 2")
+      {:ok, server} = EthashCacheServer.start(10000)
+
+      assert {:ok, "cache of epoch 0"} == EthashCacheServer.get_cache(10000)
+      assert {:ok, "cache of epoch 2"} == EthashCacheServer.get_cache(2 * @epoch_length)
+
+      GenServer.stop(server)
+    end
+
+    @tag fixtures: [:cache_dir]
+    test "prepares cache for the next epoch before it starts", %{cache_dir: cache_dir} do
+      store_cache(cache_dir, 0, "cache of epoch 0")
+      store_cache(cache_dir, 1, "cache of epoch 1")
+      {:ok, server} = EthashCacheServer.start(@epoch_length - 1)
+
+      wait_for_epochs_in_memory(server, [0, 1])
+      assert {:ok, "cache of epoch 1"} == EthashCacheServer.get_cache(@epoch_length)
+
+      GenServer.stop(server)
+    end
+
+    @tag fixtures: [:cache_dir]
+    test "keeps caches of the most recently used epochs in memory", %{cache_dir: cache_dir} do
+      for epoch <- 0..3, do: store_cache(cache_dir, epoch, "cache of epoch #{epoch}")
+      {:ok, server} = EthashCacheServer.start(0)
+      for epoch <- [1, 2, 0, 3], do: {:ok, _} = EthashCacheServer.get_cache(epoch * @epoch_length)
+
+      assert epochs_in_memory(server) == [0, 2, 3]
 
-      :missing_cache = EthashCacheServer.get_cache(block_number + @epoch_length)
+      GenServer.stop(server)
     end
   end
 
@@ -0,0 +1,80 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.ABCI.Ethereum.EthashTest do
+  @moduledoc """
+  Tests that native hashimoto agrees with the Elixir implementation and compares their speed
+  """
+  use ExUnitFixtures
+  use ExUnit.Case, async: false
+
+  @moduletag :slow
+
+  alias HonteD.ABCI.Ethereum.Ethash
+  alias HonteD.ABCI.Ethereum.EthashCache
+  alias HonteD.ABCI.Ethereum.EthashCacheServer
+  alias HonteD.ABCI.Ethereum.EthashUtils
+
+  # Ethereum block number 4693065
+  @block_number 4_693_065
+  @full_size 2_382_363_008
+  @hash_no_nonce <<109, 139, 200, 231, 34, 139, 212, 173, 82, 206, 238, 66, 48, 117,
+                   140, 115, 74, 133, 193, 190, 79, 56, 78, 162, 228, 252, 93, 117,
+                   81, 189, 187, 239>>
+  @benchmark_headers 20
+
+  deffixture cache(), scope: :module do
+    EthashCacheServer.start(@block_number)
+    {:ok, cache} = EthashCacheServer.get_cache(@block_number)
+    cache
+  end
+
+  defp headers_per_second(hashimoto, nonces) do
+    {time, _} = :timer.tc(fn -> Enum.each(nonces, hashimoto) end)
+    length(nonces) * 1_000_000 / time
+  end
+
+  @tag fixtures: [:cache]
+  @tag timeout: 600_000
+  test "native hashimoto verifies mined block", %{cache: cache} do
+    nonce = EthashUtils.hex_to_bytes("6cd7c4a814cddef9")
+    mix_hash = EthashUtils.hex_to_bytes("1eefe3932cc6281323cba77e2f2866cebd2b134083e86c235b88f900bf04ccf1")
+
+    assert {^mix_hash, result} = EthashCache.hashimoto_light(@full_size, cache, @hash_no_nonce, nonce)
+    assert Ethash.hashimoto_light(@full_size, cache, @hash_no_nonce, nonce) ==
+      [mix_digest: mix_hash, result: result]
+  end
+
+  @tag fixtures: [:cache]
+  @tag timeout: 600_000
+  test "native hashimoto agrees with Elixir implementation and is faster", %{cache: cache} do
+    nonces = for nonce <- 1..@benchmark_headers, do: <<nonce :: big-64>>
+
+    for nonce <- nonces do
+      {mix_digest, result} = EthashCache.hashimoto_light(@full_size, cache, @hash_no_nonce, nonce)
+      assert Ethash.hashimoto_light(@full_size, cache, @hash_no_nonce, nonce) ==
+        [mix_digest: mix_digest, result: result]
+    end
+
+    native = headers_per_second(&EthashCache.hashimoto_light(@full_size, cache, @hash_no_nonce, &1), nonces)
+    elixir = headers_per_second(&Ethash.hashimoto_light(@full_size, cache, @hash_no_nonce, &1), nonces)
+    assert native > elixir
+  end
+
+  test "native hashimoto rejects malformed arguments" do
+    nonce = <<0 :: 64>>
+    assert_raise ArgumentError, fn -> EthashCache.hashimoto_light(@full_size, <<0 :: 8>>, @hash_no_nonce, nonce) end
+    assert_raise ArgumentError, fn -> EthashCache.hashimoto_light(@full_size, <<0 :: 512>>, <<0>>, nonce) end
+  end
+end
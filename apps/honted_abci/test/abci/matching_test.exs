@@ -0,0 +1,282 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.ABCI.MatchingTest do
+  @moduledoc """
+  Placing orders and batch matching them at the end of blocks, see docs/batch_matching.md.
+
+  Alice sells `asset` for `asset2`, Bob buys `asset` with `asset2`
+  """
+  # NOTE: we can't enforce this here, because of the keyword-list-y form of create_x calls
+  # credo:disable-for-this-file Credo.Check.Refactor.PipeChainStart
+
+  use ExUnitFixtures
+  use ExUnit.Case, async: true
+
+  import HonteD.ABCI.TestHelpers
+  import HonteD.ABCI.Records
+
+  import HonteD.ABCI
+  import HonteD.Transaction
+
+  alias HonteD.ABCI.OrderBook
+
+  defp order(trader, nonce, side, amount, limit, assets, time_in \\ 3, time_out \\ 10) do
+    {asset, base_asset} = assets
+    create_order(nonce: nonce, sender: trader.addr, side: side, asset: asset, amount: amount,
+                 base_asset: base_asset, limit: limit, time_in: time_in, time_out: time_out)
+  end
+
+  defp place(state, trader, nonce, side, amount, limit, assets) do
+    %{state: state} =
+      order(trader, nonce, side, amount, limit, assets) |> encode_sign(trader.priv) |> deliver_tx(state) |> success?
+    state
+  end
+
+  defp end_block(state, height) do
+    assert {:reply, response_end_block(), state} = handle_call(request_end_block(height: height), nil, state)
+    state
+  end
+
+  describe "placing orders" do
+    @tag fixtures: [:alice, :asset, :asset2, :state_bob_has_tokens2]
+    test "escrows what's offered", %{state_bob_has_tokens2: state, alice: alice, asset: asset, asset2: asset2} do
+      state = place(state, alice, 0, "sell", 4, 2, {asset, asset2})
+
+      query(state, '/accounts/#{asset}/#{alice.addr}') |> found?(1)
+      assert %{code: 0, value: %{"side" => "sell", "amount" => 4, "limit" => 2, "remaining" => 4, "escrow" => 4}} =
+        query(state, '/orders/0')
+    end
+
+    @tag fixtures: [:alice, :asset, :asset2, :state_bob_has_tokens2]
+    test "checking order transactions", %{state_bob_has_tokens2: state, alice: alice, asset: asset, asset2: asset2} do
+      assets = {asset, asset2}
+      order(alice, 0, "sell", 6, 2, assets) |> encode_sign(alice.priv) |> deliver_tx(state)
+      |> fail?(1, 'insufficient_funds') |> same?(state)
+      order(alice, 1, "sell", 1, 2, assets) |> encode_sign(alice.priv) |> deliver_tx(state)
+      |> fail?(1, 'invalid_nonce') |> same?(state)
+      order(alice, 0, "sell", 1, 2, assets, 1, 10) |> encode_sign(alice.priv) |> deliver_tx(state)
+      |> fail?(1, 'order_too_late') |> same?(state)
+
+      assert {:error, :unknown_side} == order(alice, 0, "hold", 1, 2, assets)
+      assert {:error, :positive_amount_required} == order(alice, 0, "sell", 0, 2, assets)
+      assert {:error, :positive_amount_required} == order(alice, 0, "sell", 1, 0, assets)
+      assert {:error, :time_out_not_after_time_in} == order(alice, 0, "sell", 1, 2, assets, 3, 3)
+      assert {:error, :same_assets} == order(alice, 0, "sell", 1, 2, {asset, asset})
+      assert {:error, :amount_way_too_large} == order(alice, 0, "sell", round(:math.pow(2, 256)), 2, assets)
+    end
+
+    @tag fixtures: [:alice, :asset, :asset2]
+    test "orders are encoded and decoded", %{alice: alice, asset: asset, asset2: asset2} do
+      {:ok, tx} = order(alice, 0, "buy", 1, 2, {asset, asset2})
+      assert {:ok, tx} == tx |> HonteD.TxCodec.encode() |> HonteD.TxCodec.decode()
+    end
+  end
+
+  describe "matching" do
+    @tag fixtures: [:alice, :bob, :asset, :asset2, :state_bob_has_tokens2]
+    test "orders match from time-in, at the mid-point price",
+    %{state_bob_has_tokens2: state, alice: alice, bob: bob, asset: asset, asset2: asset2} do
+      state =
+        state
+        |> place(alice, 0, "sell", 2, 2, {asset, asset2})
+        |> place(bob, 0, "buy", 2, 4, {asset, asset2})
+        |> end_block(2)
+      assert %{"remaining" => 2} = query(state, '/orders/0').value
+
+      state = end_block(state, 3)
+
+      # price is (1 + 2) / 2, so Bob pays 3 for 2 and gets back the 1 he escrowed too much
+      query(state, '/accounts/#{asset}/#{bob.addr}') |> found?(2)
+      query(state, '/accounts/#{asset2}/#{bob.addr}') |> found?(2)
+      query(state, '/accounts/#{asset}/#{alice.addr}') |> found?(3)
+      query(state, '/accounts/#{asset2}/#{alice.addr}') |> found?(3)
+      assert %{"remaining" => 0, "escrow" => 0} = query(state, '/orders/0').value
+      assert %{"remaining" => 0, "escrow" => 0} = query(state, '/orders/1').value
+      assert OrderBook.size(state.order_book) == 0
+    end
+
+    @tag fixtures: [:alice, :bob, :asset, :asset2, :state_bob_has_tokens2]
+    test "orders which don't cross rest in the books",
+    %{state_bob_has_tokens2: state, alice: alice, bob: bob, asset: asset, asset2: asset2} do
+      state =
+        state
+        |> place(alice, 0, "sell", 2, 4, {asset, asset2})
+        |> place(bob, 0, "buy", 2, 2, {asset, asset2})
+        |> end_block(3)
+
+      query(state, '/accounts/#{asset2}/#{alice.addr}') |> not_found?
+      assert OrderBook.size(state.order_book) == 2
+    end
+
+    @tag fixtures: [:alice, :bob, :asset, :asset2, :state_bob_has_tokens2]
+    test "partially filled orders are cancelled at time-out, returning escrow",
+    %{state_bob_has_tokens2: state, alice: alice, bob: bob, asset: asset, asset2: asset2} do
+      state =
+        state
+        |> place(alice, 0, "sell", 4, 4, {asset, asset2})
+        |> place(bob, 0, "buy", 2, 4, {asset, asset2})
+        |> end_block(3)
+
+      assert %{"remaining" => 2, "escrow" => 2} = query(state, '/orders/0').value
+      query(state, '/accounts/#{asset}/#{alice.addr}') |> found?(1)
+
+      state = end_block(state, 10)
+      assert %{"remaining" => 0, "escrow" => 0} = query(state, '/orders/0').value
+      query(state, '/accounts/#{asset}/#{alice.addr}') |> found?(3)
+      query(state, '/accounts/#{asset2}/#{alice.addr}') |> found?(3)
+      assert OrderBook.size(state.order_book) == 0
+    end
+
+    @tag fixtures: [:alice, :bob, :asset, :asset2, :state_bob_has_tokens2]
+    test "best price matches first, then the order placed first",
+    %{state_bob_has_tokens2: state, alice: alice, bob: bob, asset: asset, asset2: asset2} do
+      state =
+        state
+        |> place(alice, 0, "sell", 1, 3, {asset, asset2})
+        |> place(alice, 1, "sell", 1, 2, {asset, asset2})
+        |> place(alice, 2, "sell", 1, 2, {asset, asset2})
+        |> place(bob, 0, "buy", 1, 4, {asset, asset2})
+        |> end_block(3)
+
+      assert [1, 0, 1] == for id <- 0..2, do: query(state, '/orders/#{id}').value["remaining"]
+      # mid-point between 4 and 2
+      query(state, '/accounts/#{asset2}/#{alice.addr}') |> found?(3)
+    end
+
+    @tag fixtures: [:alice, :bob, :asset, :asset2, :state_bob_has_tokens2]
+    test "partial fills don't take a seller below its limit, nor a buyer above",
+    %{state_bob_has_tokens2: state, alice: alice, bob: bob, asset: asset, asset2: asset2} do
+      state =
+        state
+        |> place(alice, 0, "sell", 3, 2, {asset, asset2})
+        |> place(bob, 0, "buy", 1, 1, {asset, asset2})
+        |> place(bob, 1, "buy", 1, 1, {asset, asset2})
+        |> place(bob, 2, "buy", 1, 1, {asset, asset2})
+        |> end_block(3)
+
+      # price is (2/3 + 1) / 2 = 5/6 for each of the fills of 1: every buyer pays 1 (5/6 rounded up), at most its
+      # limit of 1, and the seller gets 3 for all of them, at least its limit of 2
+      query(state, '/accounts/#{asset2}/#{alice.addr}') |> found?(3)
+      query(state, '/accounts/#{asset}/#{bob.addr}') |> found?(3)
+      query(state, '/accounts/#{asset2}/#{bob.addr}') |> found?(2)
+      for id <- 0..3, do: assert %{"remaining" => 0, "escrow" => 0} = query(state, '/orders/#{id}').value
+    end
+
+    @tag fixtures: [:alice, :bob, :carol, :issuer, :issuer2, :asset, :asset2, :state_bob_has_tokens2]
+    test "a buyer's payment is split so that no seller gets less than its limit",
+    %{state_bob_has_tokens2: state, alice: alice, bob: bob, carol: carol, issuer: issuer, issuer2: issuer2,
+      asset: asset, asset2: asset2} do
+      %{state: state} =
+        create_issue(nonce: 2, asset: asset, amount: 3, dest: carol.addr, issuer: issuer.addr)
+        |> encode_sign(issuer.priv) |> deliver_tx(state) |> success?
+      %{state: state} =
+        create_issue(nonce: 3, asset: asset, amount: 3, dest: issuer.addr, issuer: issuer.addr)
+        |> encode_sign(issuer.priv) |> deliver_tx(state) |> success?
+      %{state: state} =
+        create_issue(nonce: 2, asset: asset2, amount: 3, dest: bob.addr, issuer: issuer2.addr)
+        |> encode_sign(issuer2.priv) |> deliver_tx(state) |> success?
+      sellers = [alice, carol, issuer]
+      state =
+        state
+        |> place(alice, 0, "sell", 3, 2, {asset, asset2})
+        |> place(carol, 0, "sell", 3, 2, {asset, asset2})
+        |> place(issuer, 4, "sell", 3, 2, {asset, asset2})
+        |> place(bob, 0, "buy", 8, 7, {asset, asset2})
+        |> end_block(3)
+
+      # price is (7/8 + 2/3) / 2 = 37/48, Bob pays 7 (8 * 37/48 rounded up), which is split in proportion to the
+      # volumes sold: 3, 3 and 2 are 21/8, 21/8 and 14/8. Rounded down that's 5, the 2 left go to the largest
+      # remainders: the last seller's, then the first's of the two equal ones
+      query(state, '/accounts/#{asset}/#{bob.addr}') |> found?(8)
+      query(state, '/accounts/#{asset2}/#{bob.addr}') |> found?(1)
+      assert [0, 0, 1] == for id <- 0..2, do: query(state, '/orders/#{id}').value["remaining"]
+      proceeds = for seller <- sellers, do: query(state, '/accounts/#{asset2}/#{seller.addr}').value
+      assert proceeds == [3, 2, 2]
+      # every seller gets at least its limit of 2 for 3, pro rata for the partial fill
+      for {received, sold} <- Enum.zip(proceeds, [3, 3, 2]), do: assert received * 3 >= sold * 2
+      assert %{"remaining" => 0, "escrow" => 0} = query(state, '/orders/3').value
+    end
+  end
+
+  describe "Many resting orders are handled." do
+    @tag :benchmark
+    @tag fixtures: [:issuer, :alice, :bob, :empty_state]
+    test "Matching against 100k resting orders", %{empty_state: state, issuer: issuer, alice: alice, bob: bob} do
+      resting = 100_000
+      blocks = 20
+      per_block = 1000
+      supply = 1_000_000_000_000
+
+      %{state: state} = create_create_token(nonce: 0, issuer: issuer.addr) |> encode_sign(issuer.priv)
+        |> deliver_tx(state) |> success?
+      %{state: state} = create_create_token(nonce: 1, issuer: issuer.addr) |> encode_sign(issuer.priv)
+        |> deliver_tx(state) |> success?
+      asset = HonteD.Token.create_address(issuer.addr, 0)
+      asset2 = HonteD.Token.create_address(issuer.addr, 1)
+      assets = {asset, asset2}
+      %{state: state} = create_issue(nonce: 2, asset: asset, amount: supply, dest: alice.addr, issuer: issuer.addr)
+        |> encode_sign(issuer.priv) |> deliver_tx(state) |> success?
+      %{state: state} = create_issue(nonce: 3, asset: asset2, amount: supply, dest: bob.addr, issuer: issuer.addr)
+        |> encode_sign(issuer.priv) |> deliver_tx(state) |> success?
+
+      # sells priced 1000 to 1999, buys 1 to 999: nothing crosses
+      half = div(resting, 2)
+      sells = for i <- 0..(half - 1), do: unsigned_order(alice, i, "sell", 1_000 + rem(i, 1_000), assets, 3)
+      buys = for i <- 0..(half - 1), do: unsigned_order(bob, i, "buy", 1 + rem(i, 999), assets, 3)
+      {state, _} = block(state, 1, sells ++ buys)
+      {state, _} = block(state, 2, [])
+      {state, activation_time} = block(state, 3, [])
+      assert OrderBook.size(state.order_book) == resting
+
+      # every block gets buys which take the cheapest sells, they're matched 2 blocks later
+      {state, times} =
+        Enum.map_reduce(4..(blocks + 5), state, fn height, state ->
+          first_nonce = half + (height - 4) * per_block
+          crossing =
+            if height < blocks + 4,
+              do: for(i <- first_nonce..(first_nonce + per_block - 1),
+                      do: unsigned_order(bob, i, "buy", 5_000, assets, height + 2)),
+              else: []
+          {state, time} = block(state, height, crossing)
+          {time, state}
+        end)
+      matching_times = Enum.drop(times, 2)
+      assert OrderBook.size(state.order_book) == resting - blocks * per_block
+
+      IO.puts "\nMatching, #{resting} resting orders: activating them in #{div(activation_time, 1000)} ms, " <>
+        "#{div(Enum.sum(matching_times), length(matching_times))} us per block of #{per_block} crossing orders"
+    end
+  end
+
+  # signatures are checked outside of the ABCI process, so already verified transactions can skip them
+  defp unsigned_order(trader, nonce, side, limit, {asset, base_asset}, time_in) do
+    {:ok, tx} = create_order(nonce: nonce, sender: trader.addr, side: side, asset: asset, amount: 1,
+                             base_asset: base_asset, limit: limit, time_in: time_in, time_out: 1_000_000)
+    with_signature(tx, "")
+  end
+
+  # returns the state after the block and the time of its end block (the matching)
+  defp block(state, height, txs) do
+    {:reply, response_begin_block(), state} =
+      handle_call(request_begin_block(header: header(height: height)), nil, state)
+    state = Enum.reduce(txs, state, fn tx, state ->
+      {:reply, response_deliver_tx(code: 0), state} = handle_call({:deliver_tx, {:ok, tx}}, nil, state)
+      state
+    end)
+    {time, state} = :timer.tc(fn -> end_block(state, height) end)
+    %{state: state} = commit(state)
+    {state, time}
+  end
+end
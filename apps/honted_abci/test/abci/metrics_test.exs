@@ -0,0 +1,64 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.ABCI.MetricsTest do
+  @moduledoc """
+  Metrics of the ABCI app, recorded in the process handling the ABCI calls (here: the test's process)
+  """
+  # NOTE: we can't enforce this here, because of the keyword-list-y form of create_x calls
+  # credo:disable-for-this-file Credo.Check.Refactor.PipeChainStart
+
+  use ExUnitFixtures
+  use ExUnit.Case, async: true
+
+  import HonteD.ABCI.TestHelpers
+  import HonteD.ABCI.Records
+
+  import HonteD.ABCI
+  import HonteD.Transaction
+
+  alias HonteD.ABCI.Metrics
+
+  test "histograms count times in power-of-two buckets" do
+    for time <- [0, 1, 3, 3, 100, 100, 100, 100, 100, 5000], do: :ok = Metrics.record(:callback, time)
+
+    assert %{histograms: %{callback: summary}} = Metrics.report()
+    assert %{count: 10, mean_us: 550, max_us: 5000, p50_us: 128, p90_us: 128, p99_us: 8192,
+             buckets: %{"1" => 1, "2" => 1, "4" => 2, "128" => 5, "8192" => 1}} == summary
+  end
+
+  test "gauges keep the last value set" do
+    :ok = Metrics.set(%{nodes: 1, writes: 1})
+    :ok = Metrics.set(%{nodes: 2})
+
+    assert %{gauges: %{nodes: 2, writes: 1}} = Metrics.report()
+  end
+
+  @tag fixtures: [:issuer, :state_with_token]
+  test "callbacks and the state are measured and queried", %{issuer: issuer, state_with_token: state} do
+    %{state: state} =
+      create_create_token(nonce: 1, issuer: issuer.addr) |> encode_sign(issuer.priv) |> deliver_tx(state) |> success?
+    {:reply, response_end_block(), state} = handle_call(request_end_block(height: 1), nil, state)
+    %{state: state} = commit(state)
+
+    assert %{code: 0, value: %{"histograms" => histograms, "gauges" => gauges}} = query(state, '/metrics')
+    for callback <- ["check_tx", "deliver_tx", "end_block", "commit", "state_hash"] do
+      assert %{"count" => count, "p99_us" => _, "buckets" => %{}} = histograms[callback]
+      assert count > 0
+    end
+    assert %{"block_state_writes" => _, "mempool_state_writes" => _, "mempool_state_nodes" => _,
+             "trie_nodes_written" => trie_nodes_written, "resting_orders" => 0} = gauges
+    assert trie_nodes_written > 0
+  end
+end
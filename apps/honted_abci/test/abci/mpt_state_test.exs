@@ -0,0 +1,113 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.ABCI.MPTStateTest do
+  @moduledoc """
+  Tests buffering writes to the state's trie
+  """
+  use ExUnit.Case, async: true
+
+  alias HonteD.ABCI.MPTState
+  alias HonteD.ABCI.State.ProcessRegistryDB
+  alias MerklePatriciaTree.Trie
+
+  defp empty_state(db_name), do: db_name |> ProcessRegistryDB.init() |> Trie.new() |> MPTState.new()
+
+  test "writes are read back before they're flushed" do
+    state =
+      empty_state("state")
+      |> MPTState.put("int", 5)
+      |> MPTState.put("bool", false)
+      |> MPTState.put("sign_off", %{height: 1, hash: "hash"})
+      |> MPTState.put("list", ["a", "b"])
+      |> MPTState.update!("int", &(&1 + 1))
+    assert state.trie == empty_state("state").trie
+
+    flushed = MPTState.flush(state)
+    for {key, value} <- [{"int", 6}, {"bool", false}, {"sign_off", %{height: 1, hash: "hash"}}, {"list", ["a", "b"]}] do
+      assert MPTState.get(state, key) == value
+      assert MPTState.get(flushed, key) == value
+    end
+  end
+
+  test "buffered writes read the same as the values read from the trie" do
+    # every kind of value the state holds
+    values = [
+      {"zero", 0},
+      {"int", round(:math.pow(2, 255))},
+      {"true", true},
+      {"false", false},
+      {"sign_off", %{height: 10, hash: "hash"}},
+      {"address", "address"},
+      {"list", ["a", "b"]},
+      {"order", %{sender: "sender", side: "buy", asset: "asset", base_asset: "base asset", amount: 3, limit: 5,
+                  time_in: 1, time_out: 10, remaining: 3, escrow: 0}},
+    ]
+    state = Enum.reduce(values, empty_state("state"), fn {key, value}, state -> MPTState.put(state, key, value) end)
+    # a new state of the flushed trie, so that nothing's read from the buffer
+    from_trie = MPTState.new(MPTState.flush(state).trie)
+
+    for {key, value} <- values do
+      assert MPTState.get(state, key) == value
+      assert MPTState.get(from_trie, key) == MPTState.get(state, key)
+    end
+  end
+
+  test "flushing once gives the same root hash as flushing every write" do
+    writes = for index <- 1..20, do: {"key/#{rem(index, 7)}", index}
+    state = Enum.reduce(writes, empty_state("state"), fn {key, value}, state -> MPTState.put(state, key, value) end)
+    flushed_every_write = Enum.reduce(writes, empty_state("other state"), fn {key, value}, state ->
+      state |> MPTState.put(key, value) |> MPTState.flush()
+    end)
+
+    assert MPTState.root_hash(state) == flushed_every_write.trie.root_hash
+    assert MPTState.flush(state).writes == %{}
+  end
+
+  @tag :benchmark
+  test "reads and updates of hot keys are faster cached" do
+    # a block's worth of sends between few accounts
+    keys = List.to_tuple(for index <- 1..100, do: "accounts/asset/#{index}")
+    state =
+      keys
+      |> Tuple.to_list()
+      |> Enum.reduce(empty_state("state"), fn key, state -> MPTState.put(state, key, 1_000_000) end)
+      |> MPTState.flush()
+    operations = 100_000
+
+    # the same reads and updates, with caches as they are or emptied before every operation
+    run = fn clear_caches? ->
+      MPTState.clear_caches()
+      :timer.tc(fn ->
+        Enum.reduce(1..operations, state, fn index, updated ->
+          if clear_caches?, do: MPTState.clear_caches()
+          key = elem(keys, rem(index, 100))
+          MPTState.get(state, key)
+          MPTState.update!(updated, key, &(&1 - 1))
+        end)
+      end)
+    end
+    {uncached_time, uncached} = run.(true)
+    {cached_time, cached} = run.(false)
+
+    assert MPTState.root_hash(cached) == MPTState.root_hash(uncached)
+    assert cached_time < uncached_time
+    IO.puts "\nMPTState: #{div(operations * 1_000_000, cached_time)} reads and updates/s cached, " <>
+      "#{div(operations * 1_000_000, uncached_time)} uncached"
+  end
+
+  test "update! of a missing key raises" do
+    assert_raise KeyError, fn -> MPTState.update!(empty_state("state"), "missing", &(&1 + 1)) end
+  end
+end
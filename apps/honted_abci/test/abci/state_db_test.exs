@@ -0,0 +1,98 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.ABCI.State.ProcessRegistryDBTest do
+  @moduledoc """
+  Tests storing the nodes of the state's trie
+  """
+  use ExUnitFixtures
+  use ExUnit.Case, async: false
+
+  alias HonteD.ABCI.MPTState
+  alias HonteD.ABCI.State.ProcessRegistryDB
+  alias MerklePatriciaTree.Trie
+
+  deffixture state_dir() do
+    dir = Path.join(System.tmp_dir!(), "honted_state_test_#{:erlang.unique_integer([:positive])}")
+    Application.put_env(:honted_abci, :state_dir, dir)
+    on_exit fn ->
+      Application.put_env(:honted_abci, :state_dir, nil)
+      File.rm_rf(dir)
+    end
+    dir
+  end
+
+  defp state(db_name, values) do
+    empty_state = db_name |> ProcessRegistryDB.init() |> Trie.new() |> MPTState.new()
+    values
+    |> Enum.reduce(empty_state, fn {key, value}, state -> MPTState.put(state, key, value) end)
+    |> MPTState.flush()
+  end
+
+  defp copy(%MPTState{trie: %Trie{db: {ProcessRegistryDB, db_name}, root_hash: root_hash}}, copy_name) do
+    copy = Trie.new(ProcessRegistryDB.init(copy_name))
+    :ok = ProcessRegistryDB.overlay(db_name, copy_name)
+    MPTState.new(%{copy | root_hash: root_hash})
+  end
+
+  test "writes to a copy don't change the original" do
+    state = state("state", [{"key", 1}])
+    copy = state |> copy("copy") |> MPTState.put("key", 2) |> MPTState.put("other key", 3) |> MPTState.flush()
+
+    assert MPTState.get(state, "key") == 1
+    assert MPTState.get(state, "other key") == nil
+    assert MPTState.get(copy, "key") == 2
+  end
+
+  test "overlay only holds its own writes, which are discarded when it's made again" do
+    state = state("state", [{"key", 1}])
+    state_nodes = Process.get("state")
+
+    state |> copy("copy") |> MPTState.put("other key", 2) |> MPTState.flush()
+    assert {:overlay, "state", writes} = Process.get("copy")
+    assert writes != %{}
+    assert Process.get("state") == state_nodes
+
+    copy = copy(state, "copy")
+    assert Process.get("copy") == {:overlay, "state", %{}}
+    assert MPTState.get(copy, "key") == 1
+  end
+
+  test "without state dir, flushing keeps the nodes in memory" do
+    state = state("state", [{"key", 1}])
+    :ok = ProcessRegistryDB.flush("state")
+
+    assert MPTState.get(state, "key") == 1
+    assert Process.get("state") != %{}
+  end
+
+  @tag fixtures: [:state_dir]
+  test "flushed nodes are persisted and shared by copies", %{state_dir: state_dir} do
+    state = state("state", [{"key", 1}])
+    :ok = ProcessRegistryDB.flush("state")
+    assert Process.get("state") == %{}
+    assert File.ls!(state_dir) != []
+
+    copy = state |> copy("copy") |> MPTState.put("other key", 2) |> MPTState.flush()
+
+    assert MPTState.get(state, "key") == 1
+    assert MPTState.get(copy, "key") == 1
+    assert MPTState.get(state, "other key") == nil
+
+    # with the cache emptied, flushed nodes are read from LevelDB
+    Process.put(ProcessRegistryDB, %{Process.get(ProcessRegistryDB) | hot: %{}, warm: %{}})
+    assert MPTState.get(state, "key") == 1
+    assert MPTState.get(copy, "other key") == 2
+  end
+end
@@ -240,6 +240,31 @@ defmodule HonteD.ABCI.StateTest do
       query(state, '/issuers/#{alice.addr}') |> found?([asset2])
     end
 
+    @tag fixtures: [:issuer, :state_with_token, :asset]
+    test "can page through issued tokens", %{issuer: issuer, state_with_token: state, asset: asset} do
+      state =
+        Enum.reduce(1..4, state, fn nonce, state ->
+          %{state: state} =
+            create_create_token(nonce: nonce, issuer: issuer.addr) |> encode_sign(issuer.priv) |> deliver_tx(state)
+            |> success?
+          state
+        end)
+      [asset1, asset2, asset3, asset4] = for nonce <- 1..4, do: HonteD.Token.create_address(issuer.addr, nonce)
+
+      query(state, '/issuers/#{issuer.addr}/0/2') |> found?([asset4, asset3])
+      query(state, '/issuers/#{issuer.addr}/2/2') |> found?([asset2, asset1])
+      query(state, '/issuers/#{issuer.addr}/4/2') |> found?([asset])
+      query(state, '/issuers/#{issuer.addr}/5/2') |> found?([])
+      query(state, '/issuers/#{issuer.addr}/1/100') |> found?([asset3, asset2, asset1, asset])
+    end
+
+    @tag fixtures: [:issuer, :state_with_token]
+    test "bad pages of issued tokens are rejected", %{issuer: issuer, state_with_token: state} do
+      for page <- ['0/0', '-1/2', '0/101', 'a/2', '0'] do
+        assert %{code: 1, log: 'bad_page'} = query(state, '/issuers/#{issuer.addr}/' ++ page)
+      end
+    end
+
     @tag fixtures: [:issuer, :alice, :state_with_token, :asset]
     test "total supply and balance on issue", %{issuer: issuer, alice: alice, state_with_token: state, asset: asset} do
       %{state: state} =
@@ -0,0 +1,134 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.ABCI.TrieBatchTest do
+  @moduledoc """
+  Tests that writing to the trie in batches gives the same trie as writing key by key
+  """
+  use ExUnit.Case, async: true
+
+  alias HonteD.ABCI.State.ProcessRegistryDB
+  alias HonteD.ABCI.TrieBatch
+  alias MerklePatriciaTree.Trie
+
+  defp empty_trie(db_name), do: db_name |> ProcessRegistryDB.init() |> Trie.new()
+
+  defp update_one_by_one(trie, writes) do
+    Enum.reduce(writes, trie, fn {key, value}, trie -> Trie.update(trie, key, value) end)
+  end
+
+  defp hashed_writes(range), do: for index <- range, do: {HonteD.Crypto.hash("#{index}"), "value #{index}"}
+
+  # keys sharing most of their nibbles, so the trie has long extensions to split.
+  # Like the hashed keys (hex encoded hashes) these are 64 bytes long
+  defp prefixed_writes(prefix, range), do: for index <- range, do: {<<prefix :: 496, index :: 16>>, "value #{index}"}
+
+  defp random_bytes(0), do: ""
+  defp random_bytes(length), do: for _ <- 1..length, into: <<>>, do: <<:rand.uniform(256) - 1>>
+
+  # most keys share one of few prefixes, so that extensions are split and merged at many places
+  defp random_key(prefixes) do
+    prefix = if :rand.uniform() < 0.7, do: Enum.random(prefixes), else: ""
+    prefix <> random_bytes(64 - byte_size(prefix))
+  end
+
+  # writes of new keys, overwrites and removals of the keys there are, and removals of keys which aren't there.
+  # Values of random lengths, so that some nodes are embedded in their parents instead of stored
+  defp random_writes(keys, prefixes) do
+    for _ <- 1..:rand.uniform(40) do
+      case :rand.uniform(10) do
+        choice when choice <= 3 and keys != [] -> {Enum.random(keys), Enum.random([nil, nil, "updated"])}
+        choice when choice <= 4 -> {random_key(prefixes), nil}
+        _ -> {random_key(prefixes), String.duplicate("v", :rand.uniform(40))}
+      end
+    end
+  end
+
+  test "gives the same trie as writing key by key" do
+    batches = [
+      prefixed_writes(0, 1..5),
+      # splits the extension of the previous batch: at its start, in the middle and right before the branch
+      [{<<1 :: 4, 0 :: 508>>, "split"}, {<<0 :: 200, 1 :: 4, 0 :: 308>>, "split"},
+       {<<0 :: 504, 1 :: 4, 0 :: 4>>, "split"}],
+      hashed_writes(1..100),
+      # overwrites and a single write
+      hashed_writes(50..150) ++ prefixed_writes(0, 3..3),
+      [{HonteD.Crypto.hash("lonely"), "value"}],
+    ]
+
+    {batched, one_by_one} =
+      Enum.reduce(batches, {empty_trie("batched"), empty_trie("one by one")}, fn writes, {batched, one_by_one} ->
+        batched = TrieBatch.update(batched, writes)
+        one_by_one = update_one_by_one(one_by_one, writes)
+        assert batched.root_hash == one_by_one.root_hash
+        {batched, one_by_one}
+      end)
+
+    for {key, _} <- List.flatten(batches), do: assert Trie.get(batched, key) == Trie.get(one_by_one, key)
+  end
+
+  test "gives the same trie as the remaining keys written anew, for random writes and removals" do
+    for seed <- 1..300 do
+      :rand.seed(:exsplus, {seed, seed, seed})
+      prefixes = for _ <- 1..4, do: random_bytes(:rand.uniform(64) - 1)
+
+      Enum.reduce(1..:rand.uniform(8), {empty_trie("batched"), %{}}, fn _, {trie, contents} ->
+        writes = random_writes(Map.keys(contents), prefixes)
+        trie = TrieBatch.update(trie, writes)
+        contents = Enum.reduce(writes, contents, fn
+          {key, nil}, contents -> Map.delete(contents, key)
+          {key, value}, contents -> Map.put(contents, key, value)
+        end)
+
+        # a trie is determined by its contents, whatever the order of writes and removals
+        assert trie.root_hash == update_one_by_one(empty_trie("anew"), contents).root_hash, "seed #{seed}"
+        for {key, _} <- writes, do: assert Trie.get(trie, key) == Map.get(contents, key), "seed #{seed}"
+        {trie, contents}
+      end)
+    end
+  end
+
+  test "removing every key gives the empty trie" do
+    writes = hashed_writes(1..20)
+    trie = empty_trie("trie") |> TrieBatch.update(writes) |> TrieBatch.update(for {key, _} <- writes, do: {key, nil})
+    assert trie.root_hash == empty_trie("empty").root_hash
+  end
+
+  test "later writes of a key override the earlier ones" do
+    key = HonteD.Crypto.hash("key")
+    trie = TrieBatch.update(empty_trie("trie"), [{key, "first"}, {key, "second"}])
+    assert Trie.get(trie, key) == "second"
+  end
+
+  test "empty batch doesn't change the trie" do
+    trie = TrieBatch.update(empty_trie("trie"), hashed_writes(1..10))
+    assert TrieBatch.update(trie, []) == trie
+  end
+
+  @tag :benchmark
+  test "writing a block's worth of state" do
+    # a block of sends between many accounts, on top of a bigger state
+    state_writes = hashed_writes(1..20_000)
+    block_writes = hashed_writes(10_000..15_000)
+    trie = TrieBatch.update(empty_trie("state"), state_writes)
+
+    {one_by_one_time, one_by_one} = :timer.tc(fn -> update_one_by_one(trie, block_writes) end)
+    {batched_time, batched} = :timer.tc(fn -> TrieBatch.update(trie, block_writes) end)
+
+    assert batched.root_hash == one_by_one.root_hash
+    assert batched_time < one_by_one_time
+    IO.puts "\nWriting #{length(block_writes)} keys to the trie: one by one #{div(one_by_one_time, 1000)} ms, " <>
+      "in a batch #{div(batched_time, 1000)} ms"
+  end
+end
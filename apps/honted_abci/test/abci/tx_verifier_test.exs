@@ -0,0 +1,60 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.ABCI.TxVerifierTest do
+  @moduledoc """
+  Tests remembering verified transactions between CheckTx and DeliverTx
+  """
+  # credo:disable-for-this-file Credo.Check.Refactor.PipeChainStart
+
+  use ExUnitFixtures
+  use ExUnit.Case, async: false
+
+  import HonteD.ABCI.TestHelpers
+  import HonteD.Transaction
+
+  alias HonteD.ABCI.TxVerifier
+
+  setup do
+    {:ok, _} = start_supervised({TxVerifier, []})
+    :ok
+  end
+
+  defp signed_create_token(issuer, nonce) do
+    create_create_token(nonce: nonce, issuer: issuer.addr) |> encode_sign(issuer.priv) |> Base.decode16!()
+  end
+
+  @tag fixtures: [:issuer]
+  test "transactions verified in CheckTx are remembered until delivered", %{issuer: issuer} do
+    tx = signed_create_token(issuer, 0)
+
+    assert {:ok, decoded} = TxVerifier.verify(tx)
+    assert [{^tx, ^decoded}] = :ets.lookup(TxVerifier, tx)
+    assert {:ok, ^decoded} = TxVerifier.verify(tx)
+
+    assert {:ok, ^decoded} = TxVerifier.verify_delivered(tx)
+    assert [] == :ets.lookup(TxVerifier, tx)
+    # not checked before, so verified on delivery
+    assert {:ok, ^decoded} = TxVerifier.verify_delivered(tx)
+  end
+
+  @tag fixtures: [:issuer, :alice]
+  test "invalid transactions aren't remembered", %{issuer: issuer, alice: alice} do
+    tx = create_create_token(nonce: 0, issuer: issuer.addr) |> encode_sign(alice.priv) |> Base.decode16!()
+
+    assert {:error, :invalid_signature} = TxVerifier.verify(tx)
+    assert [] == :ets.lookup(TxVerifier, tx)
+    assert {:error, :invalid_signature} = TxVerifier.verify_delivered(tx)
+  end
+end
@@ -100,4 +100,42 @@ defmodule HonteD.ABCITest do
     end
   end
 
+  describe "Hot keys of the state are cached." do
+    @tag :benchmark
+    @tag fixtures: [:issuer, :alice, :bob, :asset, :state_alice_has_tokens]
+    test "delivering sends between few accounts",
+    %{state_alice_has_tokens: state, issuer: issuer, alice: alice, bob: bob, asset: asset} do
+      transactions = 10_000
+      %{state: state} =
+        create_issue(nonce: 2, asset: asset, amount: transactions, dest: alice.addr, issuer: issuer.addr)
+        |> encode_sign(issuer.priv) |> deliver_tx(state) |> success?
+      %{state: state} = commit(state)
+
+      # signatures are checked outside of the ABCI process, so already verified transactions can skip them
+      sends = for nonce <- 0..(transactions - 1) do
+        {:ok, tx} = create_send(nonce: nonce, asset: asset, amount: 1, from: alice.addr, to: bob.addr)
+        with_signature(tx, "")
+      end
+
+      # the same block, with caches as they are or emptied before every transaction
+      deliver = fn clear_caches? ->
+        HonteD.ABCI.MPTState.clear_caches()
+        :timer.tc(fn ->
+          Enum.reduce(sends, state, fn tx, state ->
+            if clear_caches?, do: HonteD.ABCI.MPTState.clear_caches()
+            {:reply, response_deliver_tx(code: 0), state} = handle_call({:deliver_tx, {:ok, tx}}, nil, state)
+            state
+          end)
+        end)
+      end
+      {uncached_time, uncached} = deliver.(true)
+      {cached_time, cached} = deliver.(false)
+
+      assert commit(cached).data == commit(uncached).data
+      assert cached_time < uncached_time
+      IO.puts "\nDelivering #{transactions} sends: #{div(transactions * 1_000_000, cached_time)} tx/s cached, " <>
+        "#{div(transactions * 1_000_000, uncached_time)} tx/s uncached"
+    end
+  end
+
 end
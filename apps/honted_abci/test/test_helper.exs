@@ -14,6 +14,10 @@
 
 Code.load_file("test/testlib/abci/test_helpers.ex")
 Code.load_file("../honted_api/test/testlib/api/test_helpers.ex")
+# every test runs its own ABCI app, they can't share the persistent state
+Application.put_env(:honted_abci, :state_dir, nil)
+# Ethash caches take long to generate, so they're kept between runs, but not in the developer's home directory
+Application.put_env(:honted_abci, :ethash_cache_dir, Path.join(System.tmp_dir!(), "honted_ethash_test"))
 ExUnitFixtures.start()
 ExUnitFixtures.load_fixture_files() # need to do this in umbrella apps
-ExUnit.start(exclude: [:slow])
+ExUnit.start(exclude: [:slow, :benchmark])
@@ -120,7 +120,8 @@ defmodule HonteD.ABCI.TestHelpers do
     # NOTE: breaching of the "test via public API" rule, but this is the easiest way of testing behavior:
     #       "checktx and delivertx share the same state-modifying semantics"
     #       Rethink, in case this proves cumbersome
-    assert deliver_result.state.consensus_state.root_hash == check_result.state.local_state.root_hash
+    assert HonteD.ABCI.State.hash(deliver_result.state.consensus_state) ==
+      HonteD.ABCI.State.hash(check_result.state.local_state)
   end
 
   def commit(%{state: state}), do: commit(state)
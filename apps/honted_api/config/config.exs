@@ -15,4 +15,5 @@
 use Mix.Config
 
 config :honted_api,
-  tendermint_rpc_port: 46_657
+  tendermint_rpc_port: 46_657,
+  tendermint_rpc_connections: nil # size of the pool of connections to Tendermint RPC, nil means one per scheduler
@@ -26,6 +26,8 @@ defmodule HonteD.API do
 
   @type tx_status :: :failed | :committed | :finalized | :committed_unknown
 
+  @max_batch_size 1000 # most transactions accepted by `submit_batch/1`
+
   @doc """
   Creates a signable, encoded transaction that creates a new token for an issuer
   """
@@ -128,6 +130,27 @@ defmodule HonteD.API do
     end
   end
 
+  @doc """
+  Creates a signable, encoded transaction that places an order: to buy (`side` "buy") `amount` of `asset` for
+  at most `limit` of `base_asset`, or to sell (`side` "sell") `amount` of `asset` for at least `limit` of
+  `base_asset`. The order is matched in blocks from `time_in` up to, but excluding, `time_out`.
+
+  The order must be included in a block at least 2 blocks before `time_in`.
+  What's offered is escrowed when the order is placed, see docs/batch_matching.md
+  """
+  @spec create_order_transaction(side :: binary, asset :: binary, amount :: pos_integer, base_asset :: binary,
+                                 limit :: pos_integer, time_in :: pos_integer, time_out :: pos_integer,
+                                 sender :: binary)
+        :: {:ok, binary} | {:error, map}
+  def create_order_transaction(side, asset, amount, base_asset, limit, time_in, time_out, sender) do
+    client = Tendermint.RPC.client()
+    with {:ok, nonce} <- Tools.get_nonce(client, sender),
+         {:ok, tx} <- Transaction.create_order(nonce: nonce, sender: sender, side: side, asset: asset,
+           amount: amount, base_asset: base_asset, limit: limit, time_in: time_in, time_out: time_out) do
+      {:ok, tx |> TxCodec.encode() |> Base.encode16()}
+    end
+  end
+
   @doc """
   Submits a signed transaction, blocks until its committed by the validators
   """
@@ -158,8 +181,54 @@ defmodule HonteD.API do
   @spec submit_sync(transaction :: binary) :: {:ok, %{tx_hash: binary}} | {:error, map}
   def submit_sync(transaction) do
     client = Tendermint.RPC.client()
-    transaction = Base.decode16!(transaction)
-    rpc_response = Tendermint.RPC.broadcast_tx_sync(client, transaction)
+    do_submit_sync(client, Base.decode16!(transaction))
+  end
+
+  @doc """
+  Submits many signed transactions, like `submit_sync/1`, blocks until all are validated by local mempool.
+
+  The transactions are sent to Tendermint back to back on one connection, so the whole batch takes a single
+  round trip. Results are in the order of `transactions`: `%{tx_hash: hash}` for an accepted transaction,
+  `%{error: error}` otherwise
+  """
+  @spec submit_batch(transactions :: [binary]) :: {:ok, [map]} | {:error, map}
+  def submit_batch(transactions) when is_list(transactions) and length(transactions) <= @max_batch_size do
+    client = Tendermint.RPC.client()
+    decoded = Enum.map(transactions, &decode16/1)
+    rpc_responses =
+      client
+      |> Tendermint.RPC.broadcast_tx_sync_batch(for {:ok, transaction} <- decoded, do: transaction)
+      |> Enum.map(&decode_submit_sync/1)
+    {:ok, batch_results(decoded, rpc_responses)}
+  end
+  def submit_batch(transactions) when is_list(transactions) do
+    {:error, %{reason: :batch_too_large, max_batch_size: @max_batch_size}}
+  end
+
+  # puts the results of the submitted transactions back between the ones which couldn't be decoded
+  defp batch_results([], []), do: []
+  defp batch_results([{:ok, _} | decoded], [result | results]),
+    do: [batch_result(result) | batch_results(decoded, results)]
+  defp batch_results([error | decoded], results), do: [batch_result(error) | batch_results(decoded, results)]
+
+  defp batch_result({:ok, result}), do: result
+  defp batch_result({:error, error}), do: %{error: error}
+
+  defp decode16(transaction) when is_binary(transaction) do
+    case Base.decode16(transaction) do
+      {:ok, decoded} -> {:ok, decoded}
+      :error -> {:error, %{reason: :malformed_transaction}}
+    end
+  end
+  defp decode16(_), do: {:error, %{reason: :malformed_transaction}}
+
+  defp do_submit_sync(client, transaction) do
+    client
+    |> Tendermint.RPC.broadcast_tx_sync(transaction)
+    |> decode_submit_sync()
+  end
+
+  defp decode_submit_sync(rpc_response) do
     case rpc_response do
       # successes / no-ops
       {:ok, %{"code" => 0, "hash" => hash}} ->
@@ -202,13 +271,27 @@ defmodule HonteD.API do
   end
 
   @doc """
-  Lists tokens issued by a particular address
+  Lists all tokens issued by a particular address, most recent first. Reads them a page of 100 at a time,
+  use `tokens_issued_by_page/3` to get a single page
   """
   @spec tokens_issued_by(issuer :: binary) :: {:ok, [binary]} | {:error, map}
   def tokens_issued_by(issuer)
   when is_binary(issuer) do
     client = Tendermint.RPC.client()
-    Tools.get_and_decode(client, "/issuers/#{issuer}")
+    Tools.get_issued_tokens(issuer, Tendermint.RPC, client)
+  end
+
+  @doc """
+  Lists `limit` (at most 100) tokens issued by a particular address, most recent first, skipping `offset` of them
+  """
+  @spec tokens_issued_by_page(issuer :: binary, offset :: non_neg_integer, limit :: pos_integer)
+    :: {:ok, [binary]} | {:error, map}
+  def tokens_issued_by_page(issuer, offset, limit)
+  when is_binary(issuer) and
+       is_integer(offset) and offset >= 0 and
+       is_integer(limit) and limit > 0 do
+    client = Tendermint.RPC.client()
+    Tools.get_and_decode(client, "/issuers/#{issuer}/#{offset}/#{limit}")
   end
 
   @doc """
@@ -225,6 +308,16 @@ defmodule HonteD.API do
          do: {:ok, %{token: token, issuer: issuer, total_supply: total_supply}}
   end
 
+  @doc """
+  Metrics of the ABCI app of the node: latency histograms (`check_tx`, `deliver_tx`, `end_block`, `commit`
+  and `state_hash`, in microseconds) and gauges of the size of its state, see `HonteD.ABCI.Metrics`
+  """
+  @spec metrics() :: {:ok, %{histograms: map, gauges: map}} | {:error, map}
+  def metrics do
+    client = Tendermint.RPC.client()
+    Tools.get_and_decode(client, "/metrics")
+  end
+
   @doc """
   Queries for detailed data on a particular submitted transaction with hash `hash`.
   Appends a convenience field `decoded_tx` to the details supplied by Tendermint
@@ -20,7 +20,7 @@ defmodule HonteD.API.Application do
   def start(_type, _args) do
     children = [
       {HonteD.API.Events.Eventer, name: HonteD.API.Events.Eventer},
-      {HonteD.API.Tendermint.RPC.Websocket, name: HonteD.API.Tendermint.RPC.Websocket}
+      {HonteD.API.Tendermint.RPC.Pool, name: HonteD.API.Tendermint.RPC.Pool}
     ]
 
     opts = [strategy: :one_for_one, name: HonteD.API.Supervisor]
@@ -31,6 +31,7 @@ defmodule HonteD.API.Events.Eventer do
     """
     defstruct [subs: BiMultiMap.new(),
                filters: BiMultiMap.new(),
+               index: Map.new(),
                pending_filters: [],
                monitors: Map.new(),
                committed: Map.new(),
@@ -46,12 +47,18 @@ defmodule HonteD.API.Events.Eventer do
     BiMultiMap is used instead of pair of maps because of convenience.
     """
     @type filters :: BiMultiMap.t(HonteD.filter_id, {[topic], pid})
+    @typedoc """
+    Index of the active filters by their topics, which is what an event is matched against.
+    Redundant with `filters`, but lets an event find its recipients in a single lookup.
+    """
+    @type index :: %{optional([topic]) => %{HonteD.filter_id => pid}}
     @typep topic :: HonteD.address
     @typep token :: HonteD.token
 
     @type t :: %State{
       subs: subs,
       filters: filters,
+      index: index,
       # New filter sends transaction from block boundary. Before the next block is mined, filter is
       # being kept in this list.
       pending_filters: [{HonteD.filter_id, pid, [topic]}],
@@ -60,7 +67,7 @@ defmodule HonteD.API.Events.Eventer do
       # Events that are waiting to be finalized.
       # Assumes one source of finality for each of the tokens.
       # Works ONLY for Send transactions
-      committed: %{optional(token) => Transaction.Finality.event_queue},
+      committed: %{optional(token) => Transaction.Finality.event_buckets},
       height: HonteD.block_height,
       tendermint: module(),
     }
@@ -91,9 +98,8 @@ defmodule HonteD.API.Events.Eventer do
 
   for transactions, the Eventer-internal event representation is the signed transaction itself
   """
-  @spec do_notify(:finalized | :committed, HonteD.Transaction.SignedTx.t, pos_integer, State.subs, State.filters)
-    :: :ok
-  def do_notify(finality_status, %HonteD.Transaction.SignedTx{raw_tx: tx} = signed, event_height, subs, filters) do
+  @spec do_notify(:finalized | :committed, HonteD.Transaction.SignedTx.t, pos_integer, State.index) :: :ok
+  def do_notify(finality_status, %HonteD.Transaction.SignedTx{raw_tx: tx} = signed, event_height, index) do
     # NOTE: we need to enrich the event with a Tendermint-specific hash here for reference
     #       albeit not perfect, this seems like the best place to do it
     event_content = %EventContentTx{tx: tx, hash: signed
@@ -102,11 +108,11 @@ defmodule HonteD.API.Events.Eventer do
     }
 
     event_topics = event_topics_for(tx)
-    pids = subscribed(event_topics, subs, filters)
+    recipients = Map.get(index, event_topics, %{})
 
     _ = Logger.debug(fn -> "do_notify: #{inspect event_topics} #{inspect finality_status}, " <>
-                           "#{inspect event_content}, pid: #{inspect pids}" end)
-    for {filter_id, pid} <- pids do
+                           "#{inspect event_content}, recipients: #{inspect recipients}" end)
+    for {filter_id, pid} <- recipients do
       msg = message(finality_status, event_height, filter_id, event_content)
       send(pid, {:event, msg})
     end
@@ -131,7 +137,7 @@ defmodule HonteD.API.Events.Eventer do
 
   def handle_cast({:event, %HonteD.Transaction.SignedTx{raw_tx: %HonteD.Transaction.Send{}} = signed}, state) do
     state = insert_committed(signed, state)
-    do_notify(:committed, signed, state.height, state.subs, state.filters)
+    do_notify(:committed, signed, state.height, state.index)
     {:noreply, state}
   end
 
@@ -213,16 +219,14 @@ defmodule HonteD.API.Events.Eventer do
     {:stop, {:unhandled_call, from, msg}, state}
   end
 
-  def handle_info({:DOWN, _monref, :process, pid, _reason},
-                  %{subs: subs, monitors: mons} = state) do
-    mons = Map.delete(mons, pid)
-    topics = BiMultiMap.get_keys(subs, pid)
-    subs = BiMultiMap.delete_value(subs, pid)
-    drop_filter_ids = fn(topics_group, acc) ->
-      BiMultiMap.delete_value(acc, {topics_group, pid})
+  def handle_info({:DOWN, _monref, :process, pid, _reason}, state) do
+    pid_filters = for {filter_id, {topics, ^pid}} <- state.filters, do: {filter_id, topics}
+    drop_filter_id = fn({filter_id, topics}, {filters, index}) ->
+      {BiMultiMap.delete(filters, filter_id, {topics, pid}), unindex(index, topics, [filter_id])}
     end
-    filters = Enum.reduce(topics, state.filters, drop_filter_ids)
-    {:noreply, %{state | subs: subs, monitors: mons, filters: filters}}
+    {filters, index} = Enum.reduce(pid_filters, {state.filters, state.index}, drop_filter_id)
+    {:noreply, %{state | subs: BiMultiMap.delete_value(state.subs, pid), monitors: Map.delete(state.monitors, pid),
+                         filters: filters, index: index}}
   end
 
   def handle_info(msg, state) do
@@ -243,20 +247,34 @@ defmodule HonteD.API.Events.Eventer do
     mons = Map.put_new_lazy(state.monitors, pid, fn -> Process.monitor(pid) end)
     filters = BiMultiMap.put(state.filters, filter_id, {topics, pid})
     subs = BiMultiMap.put(state.subs, topics, pid)
-    %{state | subs: subs, monitors: mons, filters: filters}
+    index = Map.update(state.index, topics, %{filter_id => pid}, &Map.put(&1, filter_id, pid))
+    %{state | subs: subs, monitors: mons, filters: filters, index: index}
   end
 
   defp drop_filter(filter_id, topics, pid, state) do
     filters = BiMultiMap.delete(state.filters, filter_id, {topics, pid})
-    subs = BiMultiMap.delete(state.subs, topics, pid)
+    # the subscriber's other filters on the same topics keep it subscribed
+    subs =
+      if BiMultiMap.has_value?(filters, {topics, pid}),
+        do: state.subs,
+        else: BiMultiMap.delete(state.subs, topics, pid)
+    # a subscriber with filters left stays monitored
     mons = case BiMultiMap.has_value?(subs, pid) do
-             false ->
-               state.monitors
              true ->
+               state.monitors
+             false ->
                Process.demonitor(state.monitors[pid], [:flush])
                Map.delete(state.monitors, pid)
            end
-    %{state | subs: subs, monitors: mons, filters: filters}
+    index = unindex(state.index, topics, [filter_id])
+    %{state | subs: subs, monitors: mons, filters: filters, index: index}
+  end
+
+  defp unindex(index, topics, filter_ids) do
+    case Map.drop(Map.get(index, topics, %{}), filter_ids) do
+      empty when map_size(empty) == 0 -> Map.delete(index, topics)
+      filters -> Map.put(index, topics, filters)
+    end
   end
 
   defp finalize_events(tokens, signoff_height, state) do
@@ -264,7 +282,7 @@ defmodule HonteD.API.Events.Eventer do
       # for a given token will process the queue with events and emit :finalized events to subscribers
       {events, acc_committed} = pop_finalized(token, signoff_height, acc_committed)
       _ = for {height, event} <- events,
-        do: do_notify(:finalized, event, height, state.subs, state.filters)
+        do: do_notify(:finalized, event, height, state.index)
       acc_committed
     end
     %{state | committed: Enum.reduce(tokens, state.committed, notify_token)}
@@ -272,19 +290,18 @@ defmodule HonteD.API.Events.Eventer do
 
   defp insert_committed(event, state) do
     token = get_token(event)
-    enqueue = fn(queue) -> Qex.push(queue, {state.height, event}) end
-    committed = Map.update(state.committed, token, Qex.new([{state.height, event}]), enqueue)
-    %{state | committed: committed}
+    buckets = Transaction.Finality.add_event(state.committed[token], state.height, event)
+    %{state | committed: Map.put(state.committed, token, buckets)}
   end
 
   defp pop_finalized(token, signed_off_height, committed) do
-    split_queue_by_finalized_status = fn
-      # should take a queue and split it into a list of finalized events and
-      # a queue with the rest of {height, event}'s
+    split_buckets_by_finalized_status = fn
+      # should take the buckets and split them into a list of finalized events and
+      # buckets with the rest of the events
       (nil) -> {[], nil}
-      (queue) -> Transaction.Finality.split_finalized_events(queue, signed_off_height)
+      (buckets) -> Transaction.Finality.split_finalized_events(buckets, signed_off_height)
     end
-    Map.get_and_update(committed, token, split_queue_by_finalized_status)
+    Map.get_and_update(committed, token, split_buckets_by_finalized_status)
   end
 
   def check_valid_signoff?(%HonteD.Transaction.SignOff{} = event, tendermint_module) do
@@ -297,16 +314,12 @@ defmodule HonteD.API.Events.Eventer do
     event.asset
   end
 
-  defp event_topics_for(%HonteD.Transaction.Send{to: dest}), do: [dest]
-  defp event_topics_for(_), do: []
-
-  defp subscribed(topics, subs, filters) do
-    pids = BiMultiMap.get(subs, topics)
-    for pid <- pids do
-      [filter_id] = BiMultiMap.get_keys(filters, {topics, pid})
-      {filter_id, pid}
-    end
-  end
+  @doc """
+  Topics a transaction is delivered to subscribers for
+  """
+  @spec event_topics_for(HonteD.Transaction.t) :: [HonteD.address]
+  def event_topics_for(%HonteD.Transaction.Send{to: dest}), do: [dest]
+  def event_topics_for(_), do: []
 
   defp make_filter_id do
     make_ref()
@@ -17,45 +17,66 @@ defmodule HonteD.API.Events.Replay do
   Gets historical transactions from Tendermint, filters them and sends them to subscriber.
   Only :committed transactions are replayed. To check if transaction was finalized
   subscriber should use `HonteD.API.tx`.
+
+  Blocks are fetched concurrently, a bounded number of blocks ahead of the one being replayed, and replayed in order.
+  Results of a block are only fetched if it has transactions the subscriber watches.
+  If fetching a block fails, the replay stops there. The end of the stream is sent to the subscriber either way
   """
 
   require Logger
   alias HonteD.API.Events.Eventer, as: Eventer
 
-  defp iterate_block({block, results}, subscription, filters) do
-    height = get_in(block, ["block", "header", "height"])
+  @prefetched_blocks 16 # how many blocks are being fetched at once
 
-    block
-    |> get_in(["block", "data", "txs"])
-    |> Stream.map(&HonteD.TxCodec.decode!/1)
-    |> drop_failed_txs(results)
-    |> Stream.map(&(Eventer.do_notify(:committed, &1, height, subscription, filters)))
+  defp notify_block({height, txs}, index) do
+    txs
+    |> Enum.map(&(Eventer.do_notify(:committed, &1, height, index)))
     |> Enum.each(fn :ok -> true end)
   end
 
-  defp get_block_with_results!(tendermint, client, height) do
+  defp get_watched_txs!(tendermint, client, height, topics) do
     {:ok, block} = tendermint.block(client, height)
-    {:ok, results} = tendermint.block_results(client, height)
-    {block, results}
+
+    watched_txs =
+      block
+      |> get_in(["block", "data", "txs"])
+      |> Enum.map(&HonteD.TxCodec.decode!/1)
+      |> Enum.with_index()
+      |> Enum.filter(fn {tx, _index} -> Eventer.event_topics_for(tx.raw_tx) == topics end)
+
+    {get_in(block, ["block", "header", "height"]), drop_failed_txs(tendermint, client, height, watched_txs)}
   end
 
   # uses the block_results from tendermint rpc to only act on successfully executed transactions
-  defp drop_failed_txs(txs, results) do
-    txs
-    |> Stream.zip(get_in(results, ["results", "DeliverTx"]))
-    |> Stream.filter(fn {_tx, result} -> result["code"] == 0 end)
-    |> Stream.map(fn {tx, _result} -> tx end)
+  defp drop_failed_txs(_tendermint, _client, _height, []), do: []
+  defp drop_failed_txs(tendermint, client, height, txs_with_indices) do
+    {:ok, results} = tendermint.block_results(client, height)
+    deliver_tx_results = results |> get_in(["results", "DeliverTx"]) |> List.to_tuple()
+
+    for {tx, index} <- txs_with_indices, elem(deliver_tx_results, index)["code"] == 0, do: tx
+  end
+
+  defp replay_block({:ok, block_txs}, :ok, index) do
+    notify_block(block_txs, index)
+    {:cont, :ok}
+  end
+  defp replay_block({:exit, reason}, :ok, _index) do
+    # later blocks aren't replayed, not to skip any of the subscriber's transactions
+    _ = Logger.error(fn -> "Replay stopped, fetching a block failed: #{inspect reason}" end)
+    {:halt, :ok}
   end
 
   def spawn(filter_id, tendermint, block_range, topics, pid) do
     client = tendermint.client()
-    ad_hoc_subscription = BiMultiMap.new([{topics, pid}])
-    ad_hoc_filters = BiMultiMap.new([{filter_id, {topics, pid}}])
+    ad_hoc_index = %{topics => %{filter_id => pid}}
     {:ok, _} = Task.start(fn() ->
+      # fetching a block can fail, the workers fetching them mustn't take the replay down before it's ended
+      Process.flag(:trap_exit, true)
       try do
         block_range
-        |> Stream.map(fn height -> get_block_with_results!(tendermint, client, height) end)
-        |> Enum.map(fn {block, results} -> iterate_block({block, results}, ad_hoc_subscription, ad_hoc_filters) end)
+        |> Task.async_stream(&get_watched_txs!(tendermint, client, &1, topics),
+                             max_concurrency: @prefetched_blocks, timeout: :infinity)
+        |> Enum.reduce_while(:ok, &replay_block(&1, &2, ad_hoc_index))
       after
         msg = Eventer.stream_end_msg(filter_id)
         send(pid, {:event, msg})
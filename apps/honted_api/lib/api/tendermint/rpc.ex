@@ -22,7 +22,7 @@ defmodule HonteD.API.Tendermint.RPC do
   The sequence of every call to the RPC is:
     - incoming request from Elixir
     - encode the query using `encode` for their respective types
-    - send request to json rpc via Websocket
+    - send request to json rpc via one of the pooled Websocket connections
     - decode jsonrpc response via `decode_jsonrpc`
     - additional decoding depending on the particular request/response (the `case do`)
   """
@@ -31,47 +31,119 @@ defmodule HonteD.API.Tendermint.RPC do
 
   defmodule Websocket do
     @moduledoc """
-    Genserver implementing application-wide reused connection to the Tendermint RPC via JSONRPC over Websocket
+    Genserver implementing a reused connection to the Tendermint RPC via JSONRPC over Websocket
+
+    Requests are pipelined: each is sent with its own id as soon as it comes and the caller is replied to when
+    the responses to all of its requests arrive, in whatever order Tendermint responds.
+    Responses are received and decoded by a process linked to the connection, so the Genserver only sends requests
+    and matches responses to callers.
+
+    When the socket closes or the receiving process dies, every pending request is answered with
+    `%{"error" => reason}` and the connection stops, to be restarted by the `Pool` and reconnected on the next request
     """
     use GenServer
     @rpc_timeout 100_000
 
+    alias HonteD.API.Tendermint.RPC.Pool
+
     def start_link(opts) do
       GenServer.start_link(__MODULE__, :ok, opts)
     end
 
     def init(:ok) do
-      {:ok, nil}
+      # the receiving process is linked, its crash must fail the pending requests rather than take them down unreplied
+      Process.flag(:trap_exit, true)
+      {:ok, %{websocket: nil, receiver: nil, next_id: 0, pending: %{}, callers: %{}}}
     end
 
     @spec call_method(atom, [{atom, binary | integer | boolean}]) :: map
     def call_method(method, params) do
-      GenServer.call(__MODULE__, {:call_method, method, params}, @rpc_timeout)
+      [response] = call_methods([{method, params}])
+      response
+    end
+
+    @doc """
+    Sends all the calls back to back on one connection and returns their responses in the same order.
+
+    Tendermint's JSONRPC takes no batch (array) requests, so this is the closest to one: a single round trip
+    for the whole list
+    """
+    @spec call_methods([{atom, [{atom, binary | integer | boolean}]}]) :: [map]
+    def call_methods([]), do: []
+    def call_methods(calls) do
+      GenServer.call(Pool.connection(), {:call_methods, calls}, @rpc_timeout)
     end
 
-    def handle_call({:call_method, method, params}, _from, websocket) do
+    def handle_call({:call_methods, calls}, from, state) do
       # connect on very first request
-      websocket = if websocket == nil, do: connect!(), else: websocket
+      state = if state.websocket == nil, do: connect!(state), else: state
 
-      # do request
-      case sendrecv!(websocket, method, params) do
-        {:ok, response} -> {:reply, Poison.decode!(response), websocket}
-        {:error, error} -> {:stop, %{reason: error}, websocket}
+      ids = for index <- state.next_id..(state.next_id + length(calls) - 1), do: Integer.to_string(index)
+      for {id, {method, params}} <- Enum.zip(ids, calls), do: :ok = send!(state.websocket, id, method, params)
+      pending = Enum.reduce(ids, state.pending, &Map.put(&2, &1, from))
+      caller = %{ids: ids, responses: %{}, missing: length(ids)}
+      {:noreply,
+       %{state | next_id: state.next_id + length(ids), pending: pending, callers: Map.put(state.callers, from, caller)}}
+    end
+
+    def handle_info({:response, id, response}, state) do
+      case Map.pop(state.pending, id) do
+        {nil, _} -> {:noreply, state}
+        {from, pending} ->
+          caller = state.callers[from]
+          caller = %{caller | responses: Map.put(caller.responses, id, response), missing: caller.missing - 1}
+          {:noreply, %{state | pending: pending, callers: reply_if_done(from, caller, state.callers)}}
       end
     end
+    def handle_info({:error, error}, state), do: fail_pending(error, state)
+    def handle_info({:EXIT, receiver, reason}, %{receiver: receiver} = state),
+      do: fail_pending({:receiver_down, reason}, state)
+    # the socket's port going down is seen by the receiving process
+    def handle_info({:EXIT, _port, _reason}, state), do: {:noreply, state}
 
-    defp connect!() do
+    defp reply_if_done(from, %{missing: 0} = caller, callers) do
+      GenServer.reply(from, Enum.map(caller.ids, &caller.responses[&1]))
+      Map.delete(callers, from)
+    end
+    defp reply_if_done(from, caller, callers), do: Map.put(callers, from, caller)
+
+    defp fail_pending(error, state) do
+      for {from, caller} <- state.callers do
+        GenServer.reply(from, Enum.map(caller.ids, &Map.get(caller.responses, &1, %{"error" => error})))
+      end
+      {:stop, %{reason: error}, %{state | pending: %{}, callers: %{}}}
+    end
+
+    defp connect!(state) do
       rpc_port = Application.get_env(:honted_api, :tendermint_rpc_port)
-      Socket.Web.connect!("localhost", rpc_port, path: "/websocket")
+      websocket = Socket.Web.connect!("localhost", rpc_port, path: "/websocket")
+      connection = self()
+      receiver = spawn_link(fn -> receive_loop(websocket, connection) end)
+      %{state | websocket: websocket, receiver: receiver}
     end
 
-    defp send!(websocket, method, params) when is_atom(method) and is_map(params) do
-      encoded_message = Poison.encode!(%{jsonrpc: "2.0", id: "0", method: method, params: params})
-      websocket
-      |> Socket.Web.send!({
-        :text,
-        encoded_message
-      })
+    defp send!(websocket, id, method, params) when is_atom(method) and is_list(params) do
+      Socket.Web.send!(websocket, {:text, encode_request(id, method, params)})
+    end
+
+    # the envelope is the same for every request, so only params are run through the generic encoder
+    defp encode_request(id, method, params) do
+      IO.iodata_to_binary([
+        ~s({"jsonrpc":"2.0","id":"), id, ~s(","method":"), Atom.to_string(method), ~s(","params":),
+        params |> Map.new() |> Poison.encode_to_iodata!(),
+        ?}
+      ])
+    end
+
+    defp receive_loop(websocket, connection) do
+      case recv!(websocket) do
+        {:ok, response} ->
+          %{"id" => id} = decoded = Poison.decode!(response)
+          send(connection, {:response, id, decoded})
+          receive_loop(websocket, connection)
+        {:error, error} ->
+          send(connection, {:error, error})
+      end
     end
 
     defp recv!(websocket) do
@@ -83,11 +155,45 @@ defmodule HonteD.API.Tendermint.RPC do
           recv!(websocket)
       end
     end
+  end
+
+  defmodule Pool do
+    @moduledoc """
+    Supervises a pool of `Websocket` connections to the Tendermint RPC, so that concurrent callers aren't queued
+    behind a single connection.
+
+    The size of the pool is `:tendermint_rpc_connections`, by default one connection per scheduler
+    """
+    use Supervisor
 
-    defp sendrecv!(websocket, method, params) when is_atom(method) and is_list(params) do
-      :ok = send!(websocket, method, Map.new(params))
-      recv!(websocket)
+    alias HonteD.API.Tendermint.RPC.Websocket
+
+    def start_link(opts) do
+      Supervisor.start_link(__MODULE__, :ok, opts)
+    end
+
+    def init(:ok) do
+      children =
+        for index <- 0..(size() - 1) do
+          Supervisor.child_spec({Websocket, name: connection_name(index)}, id: {Websocket, index})
+        end
+      Supervisor.init(children, strategy: :one_for_one)
     end
+
+    @doc """
+    Name of the connection to be used by the calling process.
+    Callers running on different schedulers use different connections
+    """
+    @spec connection() :: atom
+    def connection do
+      connection_name(rem(:erlang.system_info(:scheduler_id) - 1, size()))
+    end
+
+    defp size do
+      Application.get_env(:honted_api, :tendermint_rpc_connections) || System.schedulers_online()
+    end
+
+    defp connection_name(index), do: :"#{Websocket}.#{index}"
   end
 
   @impl true
@@ -107,6 +213,14 @@ defmodule HonteD.API.Tendermint.RPC do
     |> decode_jsonrpc
   end
 
+  @impl true
+  def broadcast_tx_sync_batch(nil, txs) do
+    txs
+    |> Enum.map(&{:broadcast_tx_sync, [tx: Base.encode64(&1)]})
+    |> Websocket.call_methods()
+    |> Enum.map(&decode_jsonrpc/1)
+  end
+
   @impl true
   def broadcast_tx_commit(nil, tx) do
     :broadcast_tx_commit
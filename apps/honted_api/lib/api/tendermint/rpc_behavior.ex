@@ -27,6 +27,7 @@ defmodule HonteD.API.Tendermint.RPCBehavior do
   @callback client() :: client_ref
   @callback broadcast_tx_async(client_ref, tx) :: result
   @callback broadcast_tx_sync(client_ref, tx) :: result
+  @callback broadcast_tx_sync_batch(client_ref, [tx]) :: [result]
   @callback broadcast_tx_commit(client_ref, tx) :: result
   @callback abci_query(client_ref, data, path) :: result
   @callback tx(client_ref, hash) :: result
@@ -19,6 +19,8 @@ defmodule HonteD.API.Tools do
 
   alias HonteD.API.{Tendermint, Transaction}
 
+  @issued_tokens_page 100 # most tokens given by a single `/issuers` query
+
   @doc """
   Uses a Tendermint.RPC `client` to get the current nonce for the `from` address. Returns raw Tendermint response
   in case of any failure
@@ -38,11 +40,38 @@ defmodule HonteD.API.Tools do
   Uses a Tendermint.RPC `client` to query anything from the abci and decode to map
   """
   def get_and_decode(client, key) do
-    rpc_response = Tendermint.RPC.abci_query(client, "", key)
+    get_and_decode(key, Tendermint.RPC, client)
+  end
+
+  defp get_and_decode(key, tendermint_module, client) do
+    rpc_response = tendermint_module.abci_query(client, "", key)
     with {:ok, %{"response" => %{"code" => 0, "value" => encoded}}} <- rpc_response,
          do: Poison.decode(encoded)
   end
 
+  @doc """
+  Reads every page of the tokens issued by `issuer`, newest first.
+
+  Every page is queried from the then latest state, so a token issued while reading shifts the following pages
+  by one. Tokens read twice this way are dropped, tokens issued after the first page aren't included
+  """
+  def get_issued_tokens(issuer, tendermint_module, client) do
+    with {:ok, pages} <- get_issued_tokens_pages(issuer, 0, tendermint_module, client),
+         do: {:ok, pages |> Enum.concat() |> Enum.uniq()}
+  end
+
+  defp get_issued_tokens_pages(issuer, offset, tendermint_module, client) do
+    key = "/issuers/#{issuer}/#{offset}/#{@issued_tokens_page}"
+    with {:ok, page} <- get_and_decode(key, tendermint_module, client) do
+      if length(page) < @issued_tokens_page do
+        {:ok, [page]}
+      else
+        with {:ok, pages} <- get_issued_tokens_pages(issuer, offset + @issued_tokens_page, tendermint_module, client),
+             do: {:ok, [page | pages]}
+      end
+    end
+  end
+
   @doc """
   Enriches the standards Tendermint tx information with a HonteD-specific status flag
     :failed, :committed, :finalized, :committed_unknown
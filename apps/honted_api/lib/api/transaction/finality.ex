@@ -18,8 +18,12 @@ defmodule HonteD.API.Transaction.Finality do
   """
 
   @type event_height_pair :: {HonteD.block_height, HonteD.API.Events.event}
-  @type event_queue :: Qex.t(event_height_pair) | Qex.t # not sure why empty Qex is needed here
   @type event_list :: [event_height_pair]
+  @typedoc """
+  Events waiting to be finalized, bucketed by height: a queue of the heights, in order, and a map from every height
+  to its events, most recent first. Finalizing touches only the buckets that get finalized
+  """
+  @type event_buckets :: {:queue.queue(HonteD.block_height), %{HonteD.block_height => [HonteD.API.Events.event]}}
 
   @spec status(tx_height :: HonteD.block_height, HonteD.block_height, binary, binary)
     :: :finalized | :committed | :committed_unknown
@@ -32,17 +36,35 @@ defmodule HonteD.API.Transaction.Finality do
     end
   end
 
-  @spec split_finalized_events(event_queue, HonteD.block_height)
-    :: {event_list, event_queue}
-  def split_finalized_events(queue, signed_off_height) do
-    # for a given token will pop the events committed earlier, that are before the signed_off_height
-    is_older = fn({h, _event}) -> height_signed_off?(h, signed_off_height) end
+  @doc """
+  Adds an event committed at `height` to the buckets (`nil` for no buckets yet).
+  Heights of the events must be added in non-decreasing order
+  """
+  @spec add_event(event_buckets | nil, HonteD.block_height, HonteD.API.Events.event) :: event_buckets
+  def add_event(nil, height, event), do: {:queue.from_list([height]), %{height => [event]}}
+  def add_event({heights, buckets}, height, event) do
+    case buckets do
+      %{^height => events} -> {heights, %{buckets | height => [event | events]}}
+      _ -> {:queue.in(height, heights), Map.put(buckets, height, [event])}
+    end
+  end
 
-    {finalized_tuples, rest} =
-      queue
-      |> Enum.split_while(is_older)
+  @spec split_finalized_events(event_buckets, HonteD.block_height)
+    :: {event_list, event_buckets}
+  def split_finalized_events(event_buckets, signed_off_height) do
+    # for a given token will pop the events committed earlier, that are before the signed_off_height
+    split_finalized_events(event_buckets, signed_off_height, [])
+  end
 
-    {finalized_tuples, Qex.new(rest)}
+  defp split_finalized_events({heights, buckets} = event_buckets, signed_off_height, finalized) do
+    with {:value, height} <- :queue.peek(heights),
+         true <- height_signed_off?(height, signed_off_height) do
+      {events, buckets} = Map.pop(buckets, height)
+      finalized_tuples = for event <- Enum.reverse(events), do: {height, event}
+      split_finalized_events({:queue.drop(heights), buckets}, signed_off_height, [finalized_tuples | finalized])
+    else
+      _ -> {finalized |> Enum.reverse() |> Enum.concat(), event_buckets}
+    end
   end
 
   @spec valid_signoff?(HonteD.block_hash, HonteD.block_hash) :: boolean
@@ -44,8 +44,8 @@ defmodule HonteD.API.Mixfile do
     [
       {:plug, "~> 1.3"},
       {:poison, "~> 3.1"},
+      {:socket, "~> 0.3"},
       {:bimap, "~> 0.1.1"},
-      {:qex, "~> 0.3.4"},
       {:ex_unit_fixtures, "~> 0.3.1", only: [:test]},
       #
       {:honted_lib, in_umbrella: true},
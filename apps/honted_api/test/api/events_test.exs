@@ -106,6 +106,18 @@ defmodule HonteD.API.EventsTest do
       join()
     end
 
+    @tag fixtures: [:server]
+    test "Many filters of one subscriber on the same topic all receive the event", %{server: server} do
+      {e1, {:event, receivable}} = event_send(address1(), 0, "asset", 1)
+      {:ok, fid1, _} = nsfilter(server, self(), address1())
+      {:ok, fid2, _} = nsfilter(server, self(), address1())
+      notify_woc(server, %HonteD.API.Events.NewBlock{height: 1})
+      notify_woc(server, e1)
+
+      assert_received_from_source(receivable, fid1)
+      assert_received_from_source(receivable, fid2)
+    end
+
     @tag fixtures: [:server]
     test "empty subscriptions still work", %{server: server} do
       {e1, _} = event_send(address1(), nil)
@@ -333,6 +345,35 @@ defmodule HonteD.API.EventsTest do
       send(pid2, :stop2)
       join()
     end
+
+    @tag fixtures: [:server]
+    test "Cleanup after dropping one of many filters on the same topic.", %{server: server} do
+      addr1 = address1()
+      parent = self()
+      pid = client(fn() ->
+        {:ok, filter_id1, _} = nsfilter(server, self(), addr1)
+        {:ok, filter_id2, _} = nsfilter(server, self(), addr1)
+        send(parent, {:filters, filter_id1, filter_id2})
+        assert_receive(:drop_filter, @timeout)
+        :ok = drop_filter(server, filter_id1)
+        send(parent, :filter_dropped)
+        assert_receive(:stop, @timeout)
+      end)
+
+      {filter_id1, filter_id2} = receive do {:filters, filter_id1, filter_id2} -> {filter_id1, filter_id2} end
+      notify_woc(server, %HonteD.API.Events.NewBlock{height: 0})
+      send(pid, :drop_filter)
+      receive do :filter_dropped -> :ok end
+      assert {:error, :notfound} = status_filter(server, filter_id1)
+      assert {:ok, [^addr1]} = status_filter(server, filter_id2)
+
+      send(pid, :stop)
+      join()
+      assert {:error, :notfound} = status_filter(server, filter_id2)
+      assert %{index: index, subs: subs} = :sys.get_state(server)
+      assert index == %{}
+      assert BiMultiMap.get_keys(subs, pid) == []
+    end
   end
 
   describe "Topics are handled." do
@@ -418,6 +459,47 @@ defmodule HonteD.API.EventsTest do
     end
   end
 
+  describe "Many subscribers are handled." do
+    @tag :benchmark
+    @tag fixtures: [:server]
+    test "Events are delivered to and finalized for 10k subscribers", %{server: server} do
+      mock_for_signoff(server, 1)
+      subscribers = 10_000
+      blocks = 100
+      sends =
+        for index <- 1..subscribers do
+          {signed, _} = event_send("address#{index}", nil)
+          signed
+        end
+      for index <- 1..subscribers, do: {:ok, _, 1} = nsfilter(server, self(), "address#{index}")
+      {sign_off, _} = event_sign_off([], blocks)
+
+      {committed_time, :ok} = :timer.tc(fn ->
+        sends
+        |> Enum.chunk_every(div(subscribers, blocks))
+        |> Enum.with_index(1)
+        |> Enum.each(fn {block_sends, height} ->
+          notify_woc(server, %HonteD.API.Events.NewBlock{height: height})
+          Enum.each(block_sends, &notify_woc(server, &1))
+        end)
+        receive_events(:committed, subscribers)
+      end)
+      {finalized_time, :ok} = :timer.tc(fn ->
+        notify(server, sign_off, ["asset"])
+        receive_events(:finalized, subscribers)
+      end)
+
+      IO.puts "\nEventer, #{subscribers} subscribers: #{div(subscribers * 1_000_000, committed_time)} " <>
+        "committed events/s, #{div(subscribers * 1_000_000, finalized_time)} finalized events/s"
+    end
+  end
+
+  defp receive_events(_finality, 0), do: :ok
+  defp receive_events(finality, count) do
+    assert_receive({:event, %{finality: ^finality}}, 10_000)
+    receive_events(finality, count - 1)
+  end
+
   defp assert_received_from_source(message, filter_id) do
     expected = {:event, %{message | source: filter_id}}
     assert_receive(^expected, @timeout)
@@ -123,6 +123,45 @@ defmodule HonteD.API.ReplayTest do
       join()
     end
 
+    @tag fixtures: [:server]
+    test "Events are delivered in order of blocks.", %{server: server} do
+      mock_block_transactions(server, 20)
+      client(fn() ->
+        {:ok, %{history_filter: filter_id}} = new_send_filter_history(server, self(), address1(), 5, 24)
+        for height <- 5..24 do
+          {_, receivable} = event_send(address1(), filter_id, "asset", height)
+          assert_receive(^receivable)
+          # nothing from the blocks that follow came before
+          refute_received({:event, %{height: later_height}} when later_height > height)
+        end
+        endmsg = {:event, HonteD.API.Events.Eventer.stream_end_msg(filter_id)}
+        assert_receive(^endmsg)
+      end)
+      join()
+    end
+
+    @tag fixtures: [:server]
+    test "Results of blocks without watched transactions aren't fetched.", %{server: server} do
+      set_mox_global()
+      test_pid = self()
+      HonteD.API.TestTendermint
+      |> expect(:block, 2, &block_transactions_mock/2)
+      |> stub(:block_results, fn client, height ->
+        send(test_pid, {:results_fetched, height})
+        block_results_transactions_mock(client, height)
+      end)
+      |> expect(:client, 1, fn() -> nil end)
+
+      client(fn() ->
+        {:ok, %{history_filter: filter_id}} = new_send_filter_history(server, self(), address2(), 1, 2)
+        endmsg = {:event, HonteD.API.Events.Eventer.stream_end_msg(filter_id)}
+        assert_receive(^endmsg)
+        refute_receive(_)
+      end)
+      join()
+      refute_received({:results_fetched, _})
+    end
+
     @tag fixtures: [:server]
     test "Event about end of the stream is always delivered.", %{server: server} do
       mock_block_transactions(server, 1)
@@ -134,5 +173,27 @@ defmodule HonteD.API.ReplayTest do
       end)
       join()
     end
+
+    @tag fixtures: [:server]
+    test "Event about end of the stream is delivered when fetching a block fails.", %{server: server} do
+      set_mox_global()
+      HonteD.API.TestTendermint
+      |> expect(:block, 2, fn
+        _client, 2 -> raise "block not available"
+        client, height -> block_transactions_mock(client, height)
+      end)
+      |> expect(:block_results, 1, &block_results_transactions_mock/2)
+      |> expect(:client, 1, fn() -> nil end)
+
+      client(fn() ->
+        {:ok, %{history_filter: filter_id}} = new_send_filter_history(server, self(), address1(), 1, 2)
+        {_, receivable1} = event_send(address1(), filter_id, "asset", 1)
+        endmsg = {:event, HonteD.API.Events.Eventer.stream_end_msg(filter_id)}
+        assert_receive(^receivable1, 1000)
+        assert_receive(^endmsg, 1000)
+        refute_receive(_)
+      end)
+      join()
+    end
   end
 end
@@ -14,7 +14,170 @@
 
 defmodule HonteD.API.Tendermint.RPCTest do
   @moduledoc """
-  This file is not tested and skipped in `coveralls.json`. Reason: this is tendermint-specific stuff, thin
-  encode/decode layer. Tested via integration tests in `honted_integration`
+  Tests the pipelined connections to the Tendermint RPC against a fake Tendermint websocket.
+
+  The tendermint-specific encode/decode layer is skipped in `coveralls.json` and tested via integration tests in
+  `honted_integration`
   """
+
+  use ExUnit.Case, async: false
+
+  alias HonteD.API.Tendermint.RPC
+  alias HonteD.API.Tendermint.RPC.{Pool, Websocket}
+
+  # connections which fail log their crash
+  @moduletag :capture_log
+
+  setup do
+    # the application's own pool would take the names of this test's connections
+    running? = :honted_api in Enum.map(Application.started_applications(), &elem(&1, 0))
+    Application.stop(:honted_api)
+
+    server = Socket.Web.listen!(0)
+    {:ok, {_, port}} = :inet.sockname(server.socket)
+    rpc_port = Application.get_env(:honted_api, :tendermint_rpc_port)
+    Application.put_env(:honted_api, :tendermint_rpc_port, port)
+    Application.put_env(:honted_api, :tendermint_rpc_connections, 1)
+    {:ok, pool} = start_supervised({Pool, []})
+
+    on_exit fn ->
+      Application.put_env(:honted_api, :tendermint_rpc_port, rpc_port)
+      Application.put_env(:honted_api, :tendermint_rpc_connections, nil)
+      if running?, do: {:ok, _} = Application.ensure_all_started(:honted_api)
+    end
+    {:ok, %{server: server, pool: pool}}
+  end
+
+  defp call(n), do: Task.async(fn -> Websocket.call_method(:echo, n: n) end)
+
+  defp accept(server) do
+    client = Socket.Web.accept!(server)
+    Socket.Web.accept!(client)
+    client
+  end
+
+  defp receive_requests(client, count) do
+    for _ <- 1..count do
+      {:text, request} = Socket.Web.recv!(client)
+      Poison.decode!(request)
+    end
+  end
+
+  defp respond(client, %{"id" => id, "params" => params}) do
+    Socket.Web.send!(client, {:text, Poison.encode!(%{jsonrpc: "2.0", id: id, result: params})})
+  end
+
+  defp restarted(pid) do
+    case Process.whereis(Pool.connection()) do
+      new_pid when new_pid not in [nil, pid] -> new_pid
+      _ ->
+        Process.sleep(10)
+        restarted(pid)
+    end
+  end
+
+  test "concurrent requests are all sent before any response and answered by id, in any order",
+    %{server: server} do
+    tasks = for n <- 1..10, do: call(n)
+    client = accept(server)
+
+    # every request gets to Tendermint while none is answered yet
+    requests = receive_requests(client, 10)
+    assert requests |> Enum.map(& &1["id"]) |> Enum.uniq() |> length() == 10
+
+    requests |> Enum.reverse() |> Enum.each(&respond(client, &1))
+
+    for {task, n} <- Enum.zip(tasks, 1..10) do
+      assert %{"result" => %{"n" => ^n}} = Task.await(task)
+    end
+  end
+
+  test "a batch is sent in one go and its responses come back in the order of the calls", %{server: server} do
+    task = Task.async(fn -> Websocket.call_methods(for n <- 1..5, do: {:echo, [n: n]}) end)
+    client = accept(server)
+
+    client |> receive_requests(5) |> Enum.reverse() |> Enum.each(&respond(client, &1))
+
+    assert for(%{"result" => %{"n" => n}} <- Task.await(task), do: n) == [1, 2, 3, 4, 5]
+  end
+
+  test "the part of a batch not answered when the socket closes gets errors", %{server: server} do
+    task = Task.async(fn -> RPC.broadcast_tx_sync_batch(nil, ["tx 1", "tx 2", "tx 3"]) end)
+    client = accept(server)
+    [_, answered, _] = receive_requests(client, 3)
+    respond(client, answered)
+    Socket.Web.close(client, :normal, wait: false)
+
+    assert [{:error, {:socket_closed, _}}, {:ok, _}, {:error, {:socket_closed, _}}] = Task.await(task)
+  end
+
+  test "responses to ids nobody waits for are dropped", %{server: server} do
+    task = call(1)
+    client = accept(server)
+    [request] = receive_requests(client, 1)
+
+    respond(client, %{"id" => "unknown", "params" => %{"n" => 0}})
+    respond(client, request)
+
+    assert %{"result" => %{"n" => 1}} = Task.await(task)
+  end
+
+  test "callers pending when the socket closes get an error and the connection reconnects", %{server: server} do
+    pid = Process.whereis(Pool.connection())
+    tasks = for n <- 1..3, do: Task.async(fn -> RPC.broadcast_tx_sync(nil, "tx #{n}") end)
+    client = accept(server)
+    [answered | _] = receive_requests(client, 3)
+    respond(client, answered)
+    Socket.Web.close(client, :normal, wait: false)
+
+    results = Enum.map(tasks, &Task.await/1)
+    assert Enum.count(results, &match?({:ok, _}, &1)) == 1
+    assert Enum.count(results, &match?({:error, {:socket_closed, _}}, &1)) == 2
+
+    # the pool restarts the connection, which connects again on the next request
+    restarted(pid)
+    task = call(4)
+    client = accept(server)
+    [request] = receive_requests(client, 1)
+    respond(client, request)
+    assert %{"result" => %{"n" => 4}} = Task.await(task)
+  end
+
+  test "callers pending when the connection drops get an error", %{server: server} do
+    tasks = for n <- 1..3, do: call(n)
+    client = accept(server)
+    receive_requests(client, 3)
+    :gen_tcp.close(client.socket)
+
+    for task <- tasks do
+      assert %{"error" => {:receiver_down, _}} = Task.await(task)
+    end
+  end
+
+  test "callers pending when the receiving process crashes get an error", %{server: server} do
+    pid = Process.whereis(Pool.connection())
+    tasks = for n <- 1..3, do: call(n)
+    client = accept(server)
+    receive_requests(client, 3)
+    Socket.Web.send!(client, {:text, "not json"})
+
+    for task <- tasks do
+      assert %{"error" => {:receiver_down, _}} = Task.await(task)
+    end
+    # the pool restarts the connection
+    restarted(pid)
+  end
+
+  test "pool supervises the configured number of connections", %{pool: pool} do
+    assert [{{Websocket, 0}, pid, :worker, [Websocket]}] = Supervisor.which_children(pool)
+    assert Process.whereis(Pool.connection()) == pid
+
+    stop_supervised(Pool)
+    Application.put_env(:honted_api, :tendermint_rpc_connections, 3)
+    {:ok, pool} = start_supervised({Pool, []})
+
+    children = Supervisor.which_children(pool)
+    assert length(children) == 3
+    assert Process.whereis(Pool.connection()) in Enum.map(children, &elem(&1, 1))
+  end
 end
@@ -0,0 +1,83 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.API.ToolsTest do
+  @moduledoc """
+  Tests reading the paginated queries of the ABCI app through a mock of Tendermint
+  """
+
+  use ExUnit.Case, async: true
+  import Mox
+
+  alias HonteD.API.Tools
+
+  setup_all do
+    start_supervised Mox.Server
+    %{}
+  end
+
+  # answers `/issuers/<issuer>/<offset>/<limit>` like the ABCI app, for tokens issued in `issued` order
+  defp mock_issuers_query(issued, queries) do
+    newest_first = Enum.reverse(issued)
+    expect(HonteD.API.TestTendermint, :abci_query, queries, fn nil, "", path ->
+      ["", "issuers", "issuer", offset, limit] = String.split(path, "/")
+      page = Enum.slice(newest_first, String.to_integer(offset), String.to_integer(limit))
+      {:ok, %{"response" => %{"code" => 0, "value" => Poison.encode!(page)}}}
+    end)
+  end
+
+  test "all issued tokens are read, page by page" do
+    issued = for index <- 1..250, do: "token #{index}"
+    mock_issuers_query(issued, 3)
+
+    assert {:ok, tokens} = Tools.get_issued_tokens("issuer", HonteD.API.TestTendermint, nil)
+    assert tokens == Enum.reverse(issued)
+    verify!()
+  end
+
+  test "a full last page is followed by an empty one" do
+    issued = for index <- 1..200, do: "token #{index}"
+    mock_issuers_query(issued, 3)
+
+    assert {:ok, tokens} = Tools.get_issued_tokens("issuer", HonteD.API.TestTendermint, nil)
+    assert length(tokens) == 200
+    verify!()
+  end
+
+  test "tokens shifted to the next page by a token issued while reading are listed once" do
+    issued = for index <- 1..150, do: "token #{index}"
+    HonteD.API.TestTendermint
+    |> expect(:abci_query, fn nil, "", "/issuers/issuer/0/100" ->
+      {:ok, %{"response" => %{"code" => 0, "value" => issued |> Enum.reverse() |> Enum.take(100) |> Poison.encode!}}}
+    end)
+    |> expect(:abci_query, fn nil, "", "/issuers/issuer/100/100" ->
+      page = (issued ++ ["token 151"]) |> Enum.reverse() |> Enum.drop(100)
+      {:ok, %{"response" => %{"code" => 0, "value" => Poison.encode!(page)}}}
+    end)
+
+    assert {:ok, tokens} = Tools.get_issued_tokens("issuer", HonteD.API.TestTendermint, nil)
+    assert tokens == Enum.reverse(issued)
+  end
+
+  test "an error of any page is returned" do
+    HonteD.API.TestTendermint
+    |> expect(:abci_query, fn nil, "", "/issuers/issuer/0/100" ->
+      page = for index <- 1..100, do: "token #{index}"
+      {:ok, %{"response" => %{"code" => 0, "value" => Poison.encode!(page)}}}
+    end)
+    |> expect(:abci_query, fn nil, "", "/issuers/issuer/100/100" -> {:error, :socket_closed} end)
+
+    assert {:error, :socket_closed} = Tools.get_issued_tokens("issuer", HonteD.API.TestTendermint, nil)
+  end
+end
@@ -29,6 +29,8 @@ defmodule HonteD.Eth do
              api: HonteD.Eth.Contract,
              refresh_period: 1000,
              sync_check_period: 1000,
+             validators: %{}, # validator sets of the latest epochs locked in so far, these never change
+             validators_lookback: 10, # epochs before the newest one whose validator sets are kept
             ]
 
   def contract_state do
@@ -70,7 +72,7 @@ defmodule HonteD.Eth do
   end
 
   def handle_call(:contract_state, _from, state) do
-    contract_state = get_contract_state(state)
+    {contract_state, state} = get_contract_state(state)
     {:reply, {:ok, contract_state}, state}
   end
   def handle_call(_, _from, state) do
@@ -89,7 +91,7 @@ defmodule HonteD.Eth do
 
   def handle_info(:fetch_validators, state) do
     Process.send_after(self(), :fetch_validators, state.refresh_period)
-    contract_state = get_contract_state(state)
+    {contract_state, state} = get_contract_state(state)
     case contract_state.synced do
       false ->
         {:stop, :honted_requires_geth_to_be_synchronized, state}
@@ -110,11 +112,23 @@ defmodule HonteD.Eth do
     {:ok, epoch_length} = api.epoch_length(staking)
     {:ok, maturity_margin} = api.maturity_margin(staking)
     synced = state.failed_sync_checks < state.failed_sync_checks_max
-    %HonteD.Staking{ethereum_block_height: api.block_height(),
-                    start_block: start_block,
-                    epoch_length: epoch_length,
-                    maturity_margin: maturity_margin,
-                    validators: api.read_validators(staking),
-                    synced: synced}
+    validators = staking |> api.read_validators(state.validators) |> drop_old_epochs(state.validators_lookback)
+    contract_state = %HonteD.Staking{ethereum_block_height: api.block_height(),
+                                     start_block: start_block,
+                                     epoch_length: epoch_length,
+                                     maturity_margin: maturity_margin,
+                                     validators: validators,
+                                     synced: synced}
+    {contract_state, %{state | validators: validators}}
+  end
+
+  # ABCI only needs the validator sets of its current and next epochs, at most a few behind the newest locked in one
+  defp drop_old_epochs(validators, lookback) do
+    case Map.keys(validators) do
+      [] -> validators
+      epochs ->
+        oldest_kept = Enum.max(epochs) - lookback
+        for {epoch, validator_set} <- validators, epoch >= oldest_kept, into: %{}, do: {epoch, validator_set}
+    end
   end
 end
@@ -51,7 +51,17 @@ defmodule HonteD.Eth.Contract do
     end
   end
 
-  def read_validators(staking) do
+  # bounds the gas an `eth_call` reading validator sets of a range of epochs may consume
+  @epochs_per_read 100
+
+  @doc """
+  Reads validator sets of all the epochs, which can't be joined anymore, i.e. ones that started already and the next
+  one, if the maturity margin has been reached.
+
+  Validator sets of such epochs never change, so `cached` (a result of a previous call, possibly without its oldest
+  epochs) is only extended with the epochs which got locked in since, instead of reading every epoch anew.
+  """
+  def read_validators(staking, cached \\ %{}) do
     {:ok, current} = get_current_epoch(staking)
     {:ok, neh} = get_next_epoch_block_number(staking)
     {:ok, mm} = maturity_margin(staking)
@@ -60,28 +70,24 @@ defmodule HonteD.Eth.Contract do
                   true -> current + 1
                   false -> current
                 end
-    {:ok, max_vals} = max_number_of_validators(staking)
-    read_validators(staking, max_epoch, max_vals)
-  end
-
-  defp read_validators(staking, max_epoch, max_vals) when max_epoch > 0 do
     # Validators will be there since epoch 1; for epoch 0 we get set of validators from genesis file.
-    kv = for epoch <- 1..max_epoch do
-      get_while = fn(index, acc) -> wrap_while(acc, get_validator(staking, epoch, index)) end
-      {epoch, Enum.reduce_while(0..max_vals, [], get_while)}
-    end
-    Map.new(kv)
-  end
-  defp read_validators(_staking, _current_epoch, _max_vals) do
-    %{}
+    first_epoch = case Map.keys(cached) do
+                    [] -> 1
+                    epochs -> Enum.max(epochs) + 1
+                  end
+    read_validators(staking, first_epoch, max_epoch, cached)
   end
 
-  defp wrap_while(acc, {:ok, [{0, _tm_pubkey, _eth_addr} = _value]}) do
-    {:halt, acc}
+  defp read_validators(staking, first_epoch, max_epoch, cached) when max_epoch >= first_epoch do
+    first_epoch..max_epoch
+    |> Enum.chunk_every(@epochs_per_read)
+    |> Enum.reduce(cached, fn epochs, acc ->
+      {:ok, validator_sets} = get_validator_sets(staking, List.first(epochs), List.last(epochs))
+      Map.merge(acc, validator_sets)
+    end)
   end
-  defp wrap_while(acc, {:ok, [{stake, tm_pubkey_raw, _} = _value]}) do
-    tm_pubkey = tm_pubkey_raw |> Base.encode16(case: :upper)
-    {:cont, [%HonteD.Validator{:stake => stake, :tendermint_address => tm_pubkey} | acc]}
+  defp read_validators(_staking, _first_epoch, _max_epoch, cached) do
+    cached
   end
 
   def get_validator(staking, epoch, index) do
@@ -89,6 +95,28 @@ defmodule HonteD.Eth.Contract do
     call_contract(staking, "getValidator(uint256,uint256)", [epoch, index], return_types)
   end
 
+  @doc """
+  Reads validator sets of all epochs from `first_epoch` to `last_epoch` (inclusive) in a single call
+  """
+  def get_validator_sets(staking, first_epoch, last_epoch) do
+    signature = "getValidatorSets(uint256,uint256)"
+    item_types = [{:uint, 256}, {:uint, 256}, :bytes32, :address]
+    {:ok, [epochs, stakes, tm_pubkeys, _owners]} =
+      call_contract_arrays(staking, signature, [first_epoch, last_epoch], item_types)
+
+    empty_sets = Map.new(first_epoch..last_epoch, &({&1, []}))
+    validator_sets =
+      [epochs, stakes, tm_pubkeys]
+      |> Enum.zip
+      |> Enum.group_by(fn {epoch, _, _} -> epoch end, &to_validator/1)
+    {:ok, Map.merge(empty_sets, validator_sets)}
+  end
+
+  defp to_validator({_epoch, stake, tm_pubkey_raw}) do
+    tm_pubkey = tm_pubkey_raw |> Base.encode16(case: :upper)
+    %HonteD.Validator{:stake => stake, :tendermint_address => tm_pubkey}
+  end
+
   def balance_of(token, address) do
     signature = "balanceOf(address)"
     {:ok, [value]} = call_contract(token, signature, [cleanup(address)], [{:uint, 256}])
@@ -139,6 +167,28 @@ defmodule HonteD.Eth.Contract do
     decode_answer(enc_return, return_types)
   end
 
+  # for functions returning a tuple of dynamic arrays, `item_types` are the types of the arrays' items
+  defp call_contract_arrays(contract, signature, args, item_types) do
+    data = signature |> ABI.encode(args) |> Base.encode16
+    {:ok, "0x" <> enc_return} =
+      Ethereumex.HttpClient.eth_call(%{to: contract, data: "0x#{data}"})
+    encoded = Base.decode16!(enc_return, case: :lower)
+    arrays =
+      item_types
+      |> Enum.with_index
+      |> Enum.map(fn {item_type, head_index} -> decode_array(encoded, head_index, item_type) end)
+    {:ok, arrays}
+  end
+
+  # ABI puts an offset of every dynamic array in the head, which points at array's length followed by its items
+  defp decode_array(encoded, head_index, item_type) do
+    <<offset :: size(256)>> = binary_part(encoded, head_index * 32, 32)
+    <<length :: size(256)>> = binary_part(encoded, offset, 32)
+    encoded
+    |> binary_part(offset + 32, length * 32)
+    |> ABI.TypeDecoder.decode_raw(List.duplicate(item_type, length))
+  end
+
   defp decode_answer(enc_return, return_types) do
     return =
       enc_return
@@ -23,10 +23,13 @@ defmodule HonteD.Eth.ContractBehavior do
   @type index :: non_neg_integer
   @type stake :: pos_integer
 
+  @type validator_sets :: %{epoch => [%HonteD.Validator{}]}
+
   @callback block_height() :: non_neg_integer()
   @callback syncing?() :: boolean()
-  @callback read_validators(address) :: %{pos_integer() => [%HonteD.Validator{}]}
+  @callback read_validators(address, cached :: validator_sets) :: validator_sets
   @callback get_validator(address, epoch, index) :: {:ok, [{stake, bytes32, address}]}
+  @callback get_validator_sets(address, epoch, epoch) :: {:ok, validator_sets}
   @callback balance_of(address, address) :: {:ok, non_neg_integer}
   @callback get_current_epoch(address) :: {:ok, epoch}
   @callback get_next_epoch_block_number(address) :: {:ok, pos_integer}
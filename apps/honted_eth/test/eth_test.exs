@@ -47,7 +47,7 @@ defmodule HonteD.EthTest do
     |> expect(:epoch_length, 10, fn(_) -> {:ok, 10} end)
     |> expect(:maturity_margin, 10, fn(_) -> {:ok, 2} end)
     |> expect(:get_current_epoch, 10, fn(_) -> {:ok, 0} end)
-    |> expect(:read_validators, 10, fn(_) -> vals() end)
+    |> expect(:read_validators, 10, fn(_, _) -> vals() end)
     |> expect(:block_height, 10, fn() -> 9 end)
   end
 
@@ -91,6 +91,60 @@ defmodule HonteD.EthTest do
       Process.unregister(HonteD.ABCI)
     end
 
+    test "Eth passes validator sets read so far when reading them again" do
+      test_pid = self()
+      mock =
+        get_mock()
+        |> mock_synced_geth()
+        |> expect(:start_block, 10, fn(_) -> {:ok, 1} end)
+        |> expect(:epoch_length, 10, fn(_) -> {:ok, 10} end)
+        |> expect(:maturity_margin, 10, fn(_) -> {:ok, 2} end)
+        |> expect(:block_height, 10, fn() -> 9 end)
+        |> expect(:read_validators, 10, fn(_, cached) ->
+          send(test_pid, {:cached, cached})
+          vals()
+        end)
+      state = %HonteD.Eth{enabled: true,
+                          api: mock,
+                          refresh_period: 10_000}
+      assert {:ok, _} = GenServer.start_link(HonteD.Eth, state, [name: HonteD.Eth])
+      {:ok, _} = HonteD.Eth.contract_state()
+      {:ok, %HonteD.Staking{validators: validators}} = HonteD.Eth.contract_state()
+      assert validators == vals()
+      assert_receive({:cached, cached} when cached == %{})
+      expected_cache = vals()
+      assert_receive({:cached, ^expected_cache})
+    end
+
+    test "Eth keeps only the validator sets of the latest epochs" do
+      test_pid = self()
+      mock =
+        get_mock()
+        |> mock_synced_geth()
+        |> expect(:start_block, 10, fn(_) -> {:ok, 1} end)
+        |> expect(:epoch_length, 10, fn(_) -> {:ok, 10} end)
+        |> expect(:maturity_margin, 10, fn(_) -> {:ok, 2} end)
+        |> expect(:block_height, 10, fn() -> 9 end)
+        # every read locks in 10 more epochs
+        |> expect(:read_validators, 10, fn(_, cached) ->
+          send(test_pid, {:cached, cached})
+          newest = cached |> Map.keys() |> Enum.max(fn -> 0 end)
+          Map.merge(cached, Map.new((newest + 1)..(newest + 10), &{&1, [%HonteD.Validator{}]}))
+        end)
+      state = %HonteD.Eth{enabled: true,
+                          api: mock,
+                          refresh_period: 10_000,
+                          validators_lookback: 4}
+      assert {:ok, _} = GenServer.start_link(HonteD.Eth, state, [name: HonteD.Eth])
+      {:ok, _} = HonteD.Eth.contract_state()
+      {:ok, %HonteD.Staking{validators: validators}} = HonteD.Eth.contract_state()
+      assert validators |> Map.keys() |> Enum.sort() == Enum.to_list(26..30)
+
+      # reads on start and on both calls, every one extending the kept epochs of the previous one
+      cached_epochs = for _ <- 1..3, do: receive(do: ({:cached, cached} -> cached |> Map.keys() |> Enum.sort()))
+      assert cached_epochs == [[], Enum.to_list(6..10), Enum.to_list(16..20)]
+    end
+
     test "Eth detects geth changes in geth sync status." do
       mock =
         get_mock()
@@ -17,7 +17,7 @@ defmodule HonteD.Integration.Performance do
   Tooling to run HonteD performance tests - orchestration and running tests
   """
 
-  alias HonteD.Integration.Performance.{Scenario, TMBench}
+  alias HonteD.Integration.Performance.{Corpus, Scenario, TMBench}
 
   require Logger
   alias HonteD.{API}
@@ -28,6 +28,12 @@ defmodule HonteD.Integration.Performance do
    - fill_in: number of transactions to pre-fill the state prior to performance test
    - duration: time to run performance test under tm-bench [seconds]
    - opts: options
+     - profiling: `:fprof` or `:eep` to profile the measured part of the test
+     - samples: ETS table (public, `:duplicate_bag`) where the latency of every submit in the measured part of the test
+       is put, as `{:submit, microseconds}`
+     - before_measured: function called right before the measured part of the test starts
+     - corpus: directory of a `HonteD.Integration.Performance.Corpus` of the scenario, to read the transactions from
+       instead of generating them during the test
   """
   def run(nstreams, fill_in, duration, opts \\ %{}) do
 
@@ -41,7 +47,7 @@ defmodule HonteD.Integration.Performance do
     for task <- setup_tasks, do: Task.await(task, 100_000)
     _ = Logger.info("Setup completed")
 
-    txs_source = Scenario.get_send_txs(scenario)
+    txs_source = Corpus.send_txs(scenario, opts[:corpus], skip_per_stream: 0)
 
     fill_in_per_stream = if nstreams != 0, do: div(fill_in, nstreams), else: 0
 
@@ -50,12 +56,14 @@ defmodule HonteD.Integration.Performance do
     |> fill_in(fill_in_per_stream)
     _ = Logger.info("Fill_in done")
 
-    txs_source_without_fill_in = Scenario.get_send_txs(scenario, skip_per_stream: fill_in_per_stream)
+    txs_source_without_fill_in = Corpus.send_txs(scenario, opts[:corpus], skip_per_stream: fill_in_per_stream)
+
+    _ = if opts[:before_measured], do: opts[:before_measured].()
 
     _ = Logger.info("starting tm-bench")
     {tm_bench_proc, tm_bench_out} = TMBench.start_for(duration)
 
-    fn -> profilable_section(txs_source_without_fill_in, tm_bench_proc, duration) end
+    fn -> profilable_section(txs_source_without_fill_in, tm_bench_proc, duration, opts[:samples]) end
     |> profile_and_run(opts[:profiling])
 
     tm_bench_out
@@ -100,10 +108,10 @@ defmodule HonteD.Integration.Performance do
     |> IO.puts
   end
 
-  defp profilable_section(txs_source_without_fill_in, tm_bench_proc, duration) do
+  defp profilable_section(txs_source_without_fill_in, tm_bench_proc, duration, samples) do
     test_tasks =
       txs_source_without_fill_in
-      |> run_performance_test_tasks()
+      |> run_performance_test_tasks(samples)
 
     # wait till end of test
     # NOTE: absolutely no clue why we match like that, tm_bench_proc should run here
@@ -116,27 +124,32 @@ defmodule HonteD.Integration.Performance do
 
   # Runs the actual perf test scenario under tm-bench.
   # Assumes tm-bench is started. This is the portion of the test that should be measured/profiled etc
-  defp run_performance_test_tasks(txs_source) do
+  defp run_performance_test_tasks(txs_source, samples) do
     # begin test by starting asynchronous transaction senders
     for stream <- txs_source, do: Task.async(fn ->
       stream
-      |> submit_stream()
+      |> submit_stream(samples)
     end)
   end
 
   # will submit a stream of transactions to HonteD.API, checking expected result
-  defp submit_stream(stream) do
+  defp submit_stream(stream, samples \\ nil) do
     stream
     |> Enum.each(fn {expected, tx} ->
-      submit_one(expected, tx)
+      submit_one(expected, tx, samples)
     end)
   end
 
-  defp submit_one(expected, tx) do
+  defp submit_one(expected, tx, nil) do
     tx
     |> HonteD.API.submit_sync()
     |> check_result(expected)
   end
+  defp submit_one(expected, tx, samples) do
+    {time, result} = :timer.tc(HonteD.API, :submit_sync, [tx])
+    true = :ets.insert(samples, {:submit, time})
+    check_result(result, expected)
+  end
 
   defp check_result({:ok, _}, true), do: :ok
   defp check_result({:error, _}, false), do: :ok
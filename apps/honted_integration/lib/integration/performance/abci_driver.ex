@@ -0,0 +1,101 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.Integration.Performance.ABCIDriver do
+  @moduledoc """
+  Drives `HonteD.ABCI` with the transactions of a `Scenario` the way Tendermint would, but without Tendermint:
+  requests go straight to `HonteD.ABCI.handle_request/1`. Every transaction of a block is checked, then the block
+  is begun, its transactions delivered, and it's ended and committed.
+
+  Needs only the HonteD apps started, so it measures the ABCI app alone and doesn't touch the network
+  """
+
+  import HonteD.ABCI.Records
+
+  alias HonteD.Integration.Performance.{Corpus, Scenario}
+
+  @doc """
+  Mines the setup of the scenario and `fill_in_per_stream` transactions of every stream, then keeps mining blocks of
+  `txs_per_block` transactions for `duration` seconds. Only these are measured: the time of every ABCI callback goes
+  to the `samples` ETS table, as `{callback, microseconds}`.
+
+  Send transactions are read from `corpus`, if given, see `HonteD.Integration.Performance.Corpus`.
+  Returns the measured blocks, in the form of `HonteD.Integration.Performance.Report.new/3`
+  """
+  def run(scenario, fill_in_per_stream, duration, samples, txs_per_block: txs_per_block, corpus: corpus) do
+    setup_txs = scenario |> Scenario.get_setup() |> Enum.concat()
+    fill_in_txs =
+      scenario
+      |> Corpus.send_txs(corpus, skip_per_stream: 0)
+      |> Enum.map(&Stream.take(&1, fill_in_per_stream))
+    measured_txs = Corpus.send_txs(scenario, corpus, skip_per_stream: fill_in_per_stream)
+
+    {_, next_height} = mine(setup_txs, txs_per_block, 1, nil, :infinity)
+    {_, next_height} = mine(interleave(fill_in_txs), txs_per_block, next_height, nil, :infinity)
+    deadline = System.monotonic_time(:millisecond) + duration * 1000
+    {blocks, _} = mine(interleave(measured_txs), txs_per_block, next_height, samples, deadline)
+    blocks
+  end
+
+  # takes transactions from the streams in turns, like concurrent senders would submit them
+  defp interleave(streams) do
+    streams
+    |> Stream.zip()
+    |> Stream.flat_map(&Tuple.to_list/1)
+  end
+
+  defp mine(txs, txs_per_block, first_height, samples, deadline) do
+    {blocks, height} =
+      txs
+      |> Stream.map(fn {expected, tx} -> {expected, Base.decode16!(tx)} end)
+      |> Stream.chunk_every(txs_per_block)
+      |> Enum.reduce_while({[], first_height}, fn block_txs, {blocks, height} ->
+        blocks = [block(block_txs, height, samples) | blocks]
+        if before?(deadline), do: {:cont, {blocks, height + 1}}, else: {:halt, {blocks, height + 1}}
+      end)
+    {Enum.reverse(blocks), height}
+  end
+
+  defp before?(:infinity), do: true
+  defp before?(deadline), do: System.monotonic_time(:millisecond) < deadline
+
+  defp block(txs, height, samples) do
+    {time, :ok} = :timer.tc(fn ->
+      for {expected, tx} <- txs do
+        response_check_tx(code: code) = timed(samples, :check_tx, request_check_tx(tx: tx))
+        :ok = check_result(code, expected)
+      end
+      response_begin_block() = timed(samples, :begin_block, request_begin_block(header: header(height: height)))
+      for {expected, tx} <- txs do
+        response_deliver_tx(code: code) = timed(samples, :deliver_tx, request_deliver_tx(tx: tx))
+        :ok = check_result(code, expected)
+      end
+      response_end_block() = timed(samples, :end_block, request_end_block(height: height))
+      response_commit() = timed(samples, :commit, request_commit())
+      :ok
+    end)
+    %{"height" => height, "txs" => length(txs), "interval_ms" => div(time, 1000)}
+  end
+
+  defp timed(nil, _callback, request), do: HonteD.ABCI.handle_request(request)
+  defp timed(samples, callback, request) do
+    {time, response} = :timer.tc(HonteD.ABCI, :handle_request, [request])
+    true = :ets.insert(samples, {callback, time})
+    response
+  end
+
+  defp check_result(0, true), do: :ok
+  defp check_result(code, false) when code != 0, do: :ok
+
+end
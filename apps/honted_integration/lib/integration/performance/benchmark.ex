@@ -0,0 +1,163 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.Integration.Performance.Benchmark do
+  @moduledoc """
+  Runs a performance test and collects its results into a `HonteD.Integration.Performance.Report`:
+  per-block throughput, latencies of submitting transactions and of ABCI callbacks, and the size of the state.
+
+  Drivers:
+   - `:tendermint` - `HonteD.Integration.Performance.run/4`, against a local Tendermint (needs the same setup)
+   - `:abci` - the same `Scenario` delivered straight to `HonteD.ABCI` in blocks, see
+     `HonteD.Integration.Performance.ABCIDriver` (needs only the HonteD apps started)
+
+  Under Tendermint, submit latency is the one of `HonteD.API.submit_sync/1` and only the overall time of
+  `HonteD.ABCI.handle_call/3` is known (from call time tracing). The `:abci` driver measures every callback
+  """
+
+  require Logger
+
+  alias HonteD.API.Tendermint
+  alias HonteD.Integration.Performance
+  alias HonteD.Integration.Performance.{ABCIDriver, Report, Scenario}
+
+  @abci_callbacks [:check_tx, :begin_block, :deliver_tx, :end_block, :commit]
+  @traced_abci_call {HonteD.ABCI, :handle_call, 3}
+
+  @doc """
+  Runs the benchmark, arguments are the ones of `HonteD.Integration.Performance.run/4`. Options:
+   - report: path to write the report to (`.json` or `.csv`)
+   - baseline: path of a JSON report to compare with
+   - threshold: by how much (a fraction) a metric can be worse than the baseline, 0.1 by default
+   - homedir: directory with the data of the node, its size is reported
+   - txs_per_block: size of the blocks mined by the `:abci` driver, 1000 by default
+   - corpus: directory of a `HonteD.Integration.Performance.Corpus` to read the transactions from
+
+  Returns the report and the result of the comparison with the baseline (`:no_baseline` if there's none)
+  """
+  @spec run(:tendermint | :abci, non_neg_integer, non_neg_integer, pos_integer, map)
+    :: {Report.t, :ok | :no_baseline | {:regressions, [Report.regression]}}
+  def run(driver, nstreams, fill_in, duration, opts \\ %{}) do
+    samples = :ets.new(:benchmark_samples, [:public, :duplicate_bag, write_concurrency: true])
+    {blocks, metrics} = run_driver(driver, nstreams, fill_in, duration, opts, samples)
+    :ets.delete(samples)
+
+    parameters = %{"driver" => to_string(driver), "nstreams" => nstreams, "fill_in" => fill_in, "duration" => duration}
+    metrics =
+      metrics
+      |> Map.merge(%{"abci_memory_bytes" => abci_memory()})
+      |> Map.merge(homedir_size(opts[:homedir]))
+    report = Report.new(parameters, blocks, metrics)
+
+    _ = if opts[:report], do: Report.write!(report, opts[:report])
+    {report, compare(report, opts[:baseline], Map.get(opts, :threshold, 0.1))}
+  end
+
+  defp run_driver(:tendermint, nstreams, fill_in, duration, opts, samples) do
+    # blocks are counted from the start of the measured part of the test
+    parent = self()
+    before_measured = fn ->
+      {:ok, %{"latest_block_height" => height}} = Tendermint.RPC.status(nil)
+      send(parent, {:measured_from, height})
+      trace_abci_calls()
+    end
+    _ = Performance.run(nstreams, fill_in, duration, Map.merge(opts, %{samples: samples,
+                                                                      before_measured: before_measured}))
+    first_height = receive do {:measured_from, height} -> height end
+    {:ok, %{"latest_block_height" => last_height}} = Tendermint.RPC.status(nil)
+
+    metrics = Map.merge(Report.summary("submit_latency_us", lookup(samples, :submit)), abci_call_times())
+    {tendermint_blocks(first_height, last_height), metrics}
+  end
+
+  defp run_driver(:abci, nstreams, fill_in, duration, opts, samples) do
+    scenario = Scenario.new(nstreams, 10_000_000_000_000_000_000) # huge number of receivers
+    fill_in_per_stream = if nstreams != 0, do: div(fill_in, nstreams), else: 0
+    blocks = ABCIDriver.run(scenario, fill_in_per_stream, duration, samples,
+                            txs_per_block: Map.get(opts, :txs_per_block, 1000), corpus: opts[:corpus])
+
+    metrics =
+      @abci_callbacks
+      |> Enum.map(&Report.summary("abci_us.#{&1}", lookup(samples, &1)))
+      |> Enum.reduce(%{}, &Map.merge/2)
+    {blocks, metrics}
+  end
+
+  defp lookup(samples, key), do: for {^key, time} <- :ets.lookup(samples, key), do: time
+
+  defp tendermint_blocks(first_height, last_height) when last_height <= first_height, do: []
+  defp tendermint_blocks(first_height, last_height) do
+    {:ok, first_block} = Tendermint.RPC.block(nil, first_height)
+    {blocks, _} =
+      Enum.map_reduce((first_height + 1)..last_height, block_time(first_block), fn height, previous_time ->
+        {:ok, block} = Tendermint.RPC.block(nil, height)
+        time = block_time(block)
+        {%{"height" => height,
+           "txs" => length(get_in(block, ["block", "data", "txs"])),
+           "interval_ms" => DateTime.diff(time, previous_time, :millisecond)},
+         time}
+      end)
+    blocks
+  end
+
+  defp block_time(block) do
+    {:ok, time, _} = DateTime.from_iso8601(get_in(block, ["block", "header", "time"]))
+    time
+  end
+
+  defp trace_abci_calls do
+    1 = :erlang.trace(Process.whereis(HonteD.ABCI), true, [:call])
+    1 = :erlang.trace_pattern(@traced_abci_call, true, [:call_time])
+    :ok
+  end
+
+  defp abci_call_times do
+    {:call_time, times} = :erlang.trace_info(@traced_abci_call, :call_time)
+    _ = :erlang.trace_pattern(@traced_abci_call, false, [:call_time])
+    _ = :erlang.trace(Process.whereis(HonteD.ABCI), false, [:call])
+    case Enum.reduce(times || [], {0, 0}, fn {_pid, count, s, us}, {acc_count, acc_us} ->
+           {acc_count + count, acc_us + s * 1_000_000 + us}
+         end) do
+      {0, _} -> %{}
+      {count, us} -> %{"abci_us.handle_call.count" => count, "abci_us.handle_call.mean" => div(us, count)}
+    end
+  end
+
+  defp abci_memory do
+    {:memory, memory} = Process.info(Process.whereis(HonteD.ABCI), :memory)
+    memory
+  end
+
+  defp homedir_size(nil), do: %{}
+  defp homedir_size(homedir) do
+    size =
+      [homedir, "**"]
+      |> Path.join()
+      |> Path.wildcard(match_dot: true)
+      |> Enum.map(&File.stat!/1)
+      |> Enum.filter(&(&1.type == :regular))
+      |> Enum.map(&(&1.size))
+      |> Enum.sum()
+    %{"homedir_bytes" => size}
+  end
+
+  defp compare(_report, nil, _threshold), do: :no_baseline
+  defp compare(report, baseline, threshold) do
+    result = Report.compare(report, Report.read!(baseline), threshold)
+    _ = with {:regressions, regressions} <- result,
+      do: for regression <- regressions, do: Logger.warn("Regression: #{inspect regression}")
+    result
+  end
+
+end
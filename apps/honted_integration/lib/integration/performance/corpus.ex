@@ -0,0 +1,99 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.Integration.Performance.Corpus do
+  @moduledoc """
+  Signed send transactions of a `Scenario`, generated once and stored on disk, so that a performance test doesn't
+  spend time creating and signing transactions next to the node under test.
+
+  A corpus is a directory with a file for every stream of the scenario. Files hold the raw (not hex-encoded)
+  transactions, each prefixed with whether it's expected to succeed and with its length.
+  Streams read back from a corpus are the same as the ones of `Scenario.get_send_txs/2`, but finite
+  """
+
+  alias HonteD.Integration.Performance.Scenario
+
+  @chunk_size 65_536
+
+  @doc """
+  Writes the first `txs_per_stream` transactions of every stream of the scenario to a corpus in `dir`.
+  Streams are generated concurrently
+  """
+  @spec write!(%Scenario{}, Path.t, non_neg_integer) :: :ok
+  def write!(scenario, dir, txs_per_stream) do
+    File.mkdir_p!(dir)
+    for old_stream <- stream_paths(dir), do: File.rm!(old_stream)
+
+    scenario
+    |> Scenario.get_send_txs()
+    |> Enum.with_index()
+    |> Task.async_stream(fn {stream, index} -> write_stream!(stream_path(dir, index), stream, txs_per_stream) end,
+                         timeout: :infinity)
+    |> Stream.run()
+  end
+
+  @doc """
+  Streams of transactions stored in the corpus in `dir`, like `Scenario.get_send_txs/2`
+  """
+  @spec get_send_txs(Path.t, [skip_per_stream: non_neg_integer]) :: [Enumerable.t]
+  def get_send_txs(dir, [skip_per_stream: skip_per_stream]) do
+    for path <- stream_paths(dir), do: path |> read_stream() |> Stream.drop(skip_per_stream)
+  end
+
+  @doc """
+  Send transactions of the scenario, read from `corpus` if there is one, generated otherwise
+  """
+  @spec send_txs(%Scenario{}, Path.t | nil, [skip_per_stream: non_neg_integer]) :: [Enumerable.t]
+  def send_txs(scenario, nil, opts), do: Scenario.get_send_txs(scenario, opts)
+  def send_txs(_scenario, corpus, opts), do: get_send_txs(corpus, opts)
+
+  defp write_stream!(path, stream, txs_per_stream) do
+    File.open!(path, [:write, :binary, :delayed_write], fn file ->
+      stream
+      |> Stream.take(txs_per_stream)
+      |> Enum.each(fn {expected, tx} -> IO.binwrite(file, encode(expected, Base.decode16!(tx))) end)
+    end)
+  end
+
+  defp encode(expected, tx), do: <<if(expected, do: 1, else: 0)::8, byte_size(tx)::16, tx::binary>>
+
+  defp read_stream(path) do
+    path
+    |> File.stream!([:read_ahead], @chunk_size)
+    |> Stream.transform(<<>>, fn chunk, rest -> decode(rest <> chunk, []) end)
+  end
+
+  defp decode(<<expected::8, size::16, tx::binary-size(size), rest::binary>>, txs) do
+    decode(rest, [{expected == 1, Base.encode16(tx)} | txs])
+  end
+  defp decode(rest, txs), do: {Enum.reverse(txs), rest}
+
+  defp stream_paths(dir) do
+    # in the order of the streams of the scenario
+    [dir, "stream-*.txs"]
+    |> Path.join()
+    |> Path.wildcard()
+    |> Enum.sort_by(&stream_index/1)
+  end
+
+  defp stream_index(path) do
+    path
+    |> Path.basename(".txs")
+    |> String.trim_leading("stream-")
+    |> String.to_integer()
+  end
+
+  defp stream_path(dir, index), do: Path.join(dir, "stream-#{index}.txs")
+
+end
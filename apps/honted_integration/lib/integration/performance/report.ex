@@ -0,0 +1,123 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.Integration.Performance.Report do
+  @moduledoc """
+  Machine-readable results of a benchmark, see `HonteD.Integration.Performance.Benchmark`.
+
+  A report holds the parameters of the run, the per-block throughput and a flat map of metrics, like
+  `"submit_latency_us.p99"`, which is what gets compared against a baseline.
+  Reports are written as JSON (which can be read back as a baseline) or CSV (metrics only)
+  """
+
+  # metrics not listed here are better when lower
+  @higher_is_better ["txs_per_sec"]
+  # metrics describing the size of the run rather than its performance, not compared
+  @not_compared ["blocks", "txs"]
+
+  @type block :: %{String.t => number}
+  @type t :: %{String.t => any}
+  @type regression :: %{metric: String.t, baseline: number, value: number, change: float}
+
+  @doc """
+  Builds a report. `blocks` are the blocks mined during the measured part of the run, in order, as
+  `%{"height" => height, "txs" => number of transactions, "interval_ms" => time since the previous block}`
+  """
+  @spec new(map, [block], %{String.t => number}) :: t
+  def new(parameters, blocks, metrics) do
+    %{"parameters" => parameters,
+      "blocks" => blocks,
+      "metrics" => Map.merge(throughput(blocks), metrics)}
+  end
+
+  @doc """
+  Summary of samples (e.g. latencies), as metrics prefixed with `name`
+  """
+  @spec summary(String.t, [number]) :: %{String.t => number}
+  def summary(_name, []), do: %{}
+  def summary(name, samples) do
+    sorted = samples |> Enum.sort() |> List.to_tuple()
+    count = tuple_size(sorted)
+    percentile = fn p -> elem(sorted, max(0, round(Float.ceil(p * count)) - 1)) end
+    %{"#{name}.count" => count,
+      "#{name}.mean" => div(Enum.sum(samples), count),
+      "#{name}.p50" => percentile.(0.5),
+      "#{name}.p90" => percentile.(0.9),
+      "#{name}.p99" => percentile.(0.99),
+      "#{name}.max" => elem(sorted, count - 1)}
+  end
+
+  defp throughput([]), do: %{}
+  defp throughput(blocks) do
+    txs = blocks |> Enum.map(&(&1["txs"])) |> Enum.sum()
+    duration_ms = blocks |> Enum.map(&(&1["interval_ms"])) |> Enum.sum()
+    %{"blocks" => length(blocks),
+      "txs" => txs,
+      "txs_per_sec" => if(duration_ms > 0, do: div(txs * 1000, duration_ms), else: 0)}
+  end
+
+  @doc """
+  Writes the report to `path`, as CSV if it ends with `.csv`, as JSON otherwise
+  """
+  @spec write!(t, Path.t) :: :ok
+  def write!(report, path) do
+    content = if Path.extname(path) == ".csv", do: to_csv(report), else: Poison.encode!(report, pretty: true)
+    File.write!(path, content)
+  end
+
+  @spec read!(Path.t) :: t
+  def read!(path) do
+    path
+    |> File.read!()
+    |> Poison.decode!()
+  end
+
+  @spec to_csv(t) :: iodata
+  def to_csv(%{"metrics" => metrics}) do
+    rows = for {metric, value} <- Enum.sort(metrics), do: [metric, ",", to_string(value), "\n"]
+    ["metric,value\n" | rows]
+  end
+
+  @doc """
+  Compares the metrics of a report with the ones of a baseline report, present in both.
+  A metric regressed if it is worse than in the baseline by more than `threshold` (a fraction, 0.1 for 10%)
+  """
+  @spec compare(t, t, float) :: :ok | {:regressions, [regression]}
+  def compare(%{"metrics" => metrics}, %{"metrics" => baseline}, threshold) do
+    regressions =
+      for {metric, baseline_value} <- Enum.sort(baseline),
+          Map.has_key?(metrics, metric),
+          compared?(metric),
+          regressed?(metric, metrics[metric], baseline_value, threshold) do
+        %{metric: metric, baseline: baseline_value, value: metrics[metric],
+          change: change(metrics[metric], baseline_value)}
+      end
+    if regressions == [], do: :ok, else: {:regressions, regressions}
+  end
+
+  defp regressed?(_metric, _value, 0, _threshold), do: false
+  defp regressed?(metric, value, baseline_value, threshold) do
+    case {higher_is_better?(metric), change(value, baseline_value)} do
+      {true, change} -> change < -threshold
+      {false, change} -> change > threshold
+    end
+  end
+
+  defp compared?(metric), do: metric not in @not_compared and not String.ends_with?(metric, ".count")
+
+  defp higher_is_better?(metric), do: metric in @higher_is_better
+
+  defp change(value, baseline_value), do: (value - baseline_value) / baseline_value
+
+end
@@ -23,6 +23,18 @@ defmodule HonteD.PerftestScript do
   mix run --no-start -e 'HonteD.PerftestScript.setup_and_run(5, 0, 100, %{homedir_size: true})'
   ```
 
+  Benchmarks, writing a report and failing on regressions against a baseline:
+  ```
+  mix run --no-start -e 'HonteD.PerftestScript.benchmark(:abci, 5, 10_000, 60, %{report: "report.json"})'
+  mix run --no-start -e 'HonteD.PerftestScript.benchmark(:tendermint, 5, 0, 100, %{baseline: "report.json"})'
+  ```
+
+  Transactions can be generated upfront, so that signing them doesn't compete with the node for the CPU:
+  ```
+  mix run --no-start -e 'HonteD.PerftestScript.make_corpus(5, 100_000, "corpus")'
+  mix run --no-start -e 'HonteD.PerftestScript.setup_and_run(5, 0, 100, %{corpus: "corpus"})'
+  ```
+
   Available profilers: `:fprof`, `:eep`
 
   NOTE: keep this as thin as reasonably possible, this is not tested (excluded in coveralls.json)
@@ -54,4 +66,38 @@ defmodule HonteD.PerftestScript do
 
     IO.puts(result)
   end
+
+  @doc """
+  Generates the first `txs_per_stream` send transactions of every stream of the performance test scenario into
+  a corpus in `dir`. The number of streams must match the one of the test run with the corpus
+  """
+  def make_corpus(nstreams, txs_per_stream, dir) do
+    nstreams
+    |> Integration.Performance.Scenario.new(10_000_000_000_000_000_000) # same as in HonteD.Integration.Performance
+    |> Integration.Performance.Corpus.write!(dir, txs_per_stream)
+  end
+
+  @doc """
+  Runs full HonteD node (and Tendermint for the `:tendermint` driver) and benchmarks it,
+  see `HonteD.Integration.Performance.Benchmark.run/5`. Exits with 1 if there are regressions against the baseline
+  """
+  def benchmark(driver, nstreams, fill_in, duration, opts \\ %{}) do
+    [:porcelain, :hackney]
+    |> Enum.each(&Application.ensure_all_started/1)
+
+    homedir = Integration.homedir()
+    # the state of the ABCI app is kept with Tendermint's, so that it's measured and doesn't outlive the run
+    Application.put_env(:honted_abci, :state_dir, Path.join(homedir, "honted_state"))
+    {:ok, _exit_fn_honted} = Integration.honted()
+    _ = if driver == :tendermint, do: {:ok, _exit_fn_tendermint} = Integration.tendermint(homedir)
+
+    {report, comparison} =
+      Integration.Performance.Benchmark.run(driver, nstreams, fill_in, duration, Map.put(opts, :homedir, homedir))
+
+    Temp.cleanup()
+
+    IO.puts(Integration.Performance.Report.to_csv(report))
+    IO.puts("Comparison with baseline: #{inspect comparison}")
+    with {:regressions, _} <- comparison, do: exit({:shutdown, 1})
+  end
 end
@@ -0,0 +1,53 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.Integration.Performance.CorpusTest do
+  @moduledoc """
+  Unit test for the on-disk corpus of performance test transactions
+  """
+
+  alias HonteD.Integration.Performance.{Corpus, Scenario}
+
+  use ExUnit.Case, async: true
+
+  setup do
+    {:ok, dir} = Temp.mkdir()
+    on_exit fn -> File.rm_rf!(dir) end
+    %{dir: dir, scenario: Scenario.new(3, 10)}
+  end
+
+  defp take(streams, n), do: Enum.map(streams, &Enum.take(&1, n))
+
+  test "corpus streams back the transactions of the scenario", %{dir: dir, scenario: scenario} do
+    :ok = Corpus.write!(scenario, dir, 20)
+
+    assert take(Scenario.get_send_txs(scenario), 20) == take(Corpus.get_send_txs(dir, skip_per_stream: 0), 100)
+    assert take(Scenario.get_send_txs(scenario, skip_per_stream: 5), 15) ==
+      take(Corpus.get_send_txs(dir, skip_per_stream: 5), 100)
+  end
+
+  test "corpus is rewritten", %{dir: dir, scenario: scenario} do
+    :ok = Corpus.write!(Scenario.new(12, 10), dir, 1)
+    :ok = Corpus.write!(scenario, dir, 2)
+
+    assert take(Scenario.get_send_txs(scenario), 2) == take(Corpus.get_send_txs(dir, skip_per_stream: 0), 100)
+  end
+
+  test "send transactions are generated without corpus", %{dir: dir, scenario: scenario} do
+    :ok = Corpus.write!(scenario, dir, 10)
+
+    assert take(Corpus.send_txs(scenario, nil, skip_per_stream: 2), 8) ==
+      take(Corpus.send_txs(scenario, dir, skip_per_stream: 2), 100)
+  end
+end
@@ -0,0 +1,68 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.Integration.Performance.ReportTest do
+  @moduledoc """
+  Unit test for benchmark reports - metrics and comparing with a baseline
+  """
+
+  alias HonteD.Integration.Performance.Report
+
+  use ExUnit.Case, async: true
+
+  defp report(metrics) do
+    Report.new(%{}, [%{"height" => 2, "txs" => 100, "interval_ms" => 1000},
+                     %{"height" => 3, "txs" => 300, "interval_ms" => 1000}], metrics)
+  end
+
+  test "throughput is counted from the blocks" do
+    assert %{"blocks" => 2, "txs" => 400, "txs_per_sec" => 200} = report(%{})["metrics"]
+  end
+
+  test "summary of samples" do
+    assert %{"latency.count" => 100, "latency.mean" => 50, "latency.p50" => 50, "latency.p90" => 90,
+             "latency.p99" => 99, "latency.max" => 100} == Report.summary("latency", Enum.shuffle(1..100))
+    assert %{"latency.p50" => 7, "latency.p99" => 7} = Report.summary("latency", [7])
+    assert %{} == Report.summary("latency", [])
+  end
+
+  test "regressions are metrics worse than baseline by more than the threshold" do
+    baseline = report(%{"latency.p99" => 100, "latency.count" => 100})
+
+    assert :ok == Report.compare(report(%{"latency.p99" => 109, "latency.count" => 1}), baseline, 0.1)
+    assert {:regressions, [%{metric: "latency.p99", baseline: 100, value: 120}]} =
+      Report.compare(report(%{"latency.p99" => 120}), baseline, 0.1)
+  end
+
+  test "lower throughput is a regression" do
+    slower = Report.new(%{}, [%{"height" => 2, "txs" => 100, "interval_ms" => 1000}], %{})
+
+    assert {:regressions, [%{metric: "txs_per_sec", baseline: 200, value: 100}]} =
+      Report.compare(slower, report(%{}), 0.1)
+    assert :ok == Report.compare(report(%{}), slower, 0.1)
+  end
+
+  test "reports are written as JSON, which is read back as baseline, or as CSV" do
+    {:ok, dir} = Temp.mkdir()
+    report = report(%{"latency.p99" => 100})
+
+    :ok = Report.write!(report, Path.join(dir, "report.json"))
+    assert report == Report.read!(Path.join(dir, "report.json"))
+
+    :ok = Report.write!(report, Path.join(dir, "report.csv"))
+    assert "metric,value\nblocks,2\nlatency.p99,100\ntxs,400\ntxs_per_sec,200\n" ==
+      File.read!(Path.join(dir, "report.csv"))
+    File.rm_rf!(dir)
+  end
+end
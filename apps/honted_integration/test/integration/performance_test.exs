@@ -25,6 +25,7 @@ defmodule HonteD.Integration.PerformanceTest do
   import ExUnit.CaptureIO
 
   alias HonteD.Integration.Performance
+  alias HonteD.Integration.Performance.{Benchmark, Report}
 
   @moduletag :integration
 
@@ -73,6 +74,30 @@ defmodule HonteD.Integration.PerformanceTest do
     |> assert
   end
 
+  @tag fixtures: [:honted, :homedir]
+  test "benchmark driving the ABCI app writes a report and compares with baseline", %{homedir: homedir} do
+    report_path = Path.join(homedir, "report.json")
+    baseline_path = Path.join(homedir, "baseline.json")
+    :ok = Report.write!(Report.new(%{}, [], %{"abci_us.commit.mean" => 1}), baseline_path)
+
+    {report, comparison} = Benchmark.run(:abci, @nstreams, @fill_in, 1, %{report: report_path, baseline: baseline_path,
+                                                                           txs_per_block: 10, homedir: homedir})
+
+    assert %{"blocks" => blocks, "metrics" => %{"txs_per_sec" => _, "abci_us.deliver_tx.p99" => _,
+                                                 "abci_us.commit.mean" => _, "homedir_bytes" => _}} = report
+    assert [%{"txs" => 10} | _] = blocks
+    assert report == Report.read!(report_path)
+    # no commit takes a microsecond
+    assert {:regressions, [%{metric: "abci_us.commit.mean"}]} = comparison
+  end
+
+  @tag fixtures: [:tendermint, :homedir]
+  test "benchmark under tendermint collects blocks and submit latencies", %{homedir: homedir} do
+    {report, :no_baseline} = Benchmark.run(:tendermint, @nstreams, @fill_in, @duration, %{homedir: homedir})
+
+    assert %{"metrics" => %{"submit_latency_us.p50" => _, "abci_us.handle_call.mean" => _}} = report
+  end
+
   defp check_if_tm_bench_printed(result) do
     result
     |> String.contains?("Txs/sec")
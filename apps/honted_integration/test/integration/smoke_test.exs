@@ -156,6 +156,12 @@ defmodule HonteD.Integration.SmokeTest do
     Process.sleep(2000)
     assert {:ok, _} = API.tx(hash)
 
+    # submit_batch does checkTx for every transaction and returns their results in order
+    assert {:ok, [%{tx_hash: _}, %{error: %{reason: :submit_failed}}, %{error: %{reason: :malformed_transaction}}]} =
+      API.submit_batch([token_creation.(), no_signature_tx, "not a transaction"])
+    assert {:ok, [_, _]} = apis_caller.(:submit_batch, %{transactions: [no_signature_tx, no_signature_tx]})
+    Process.sleep(2000)
+
     # CREATING TOKENS
     {:ok, raw_tx} = API.create_create_token_transaction(issuer)
 
@@ -196,6 +202,8 @@ defmodule HonteD.Integration.SmokeTest do
 
     # check consistency of api exposers
     assert {:ok, [asset]} == apis_caller.(:tokens_issued_by, %{issuer: issuer})
+    assert {:ok, [asset]} == apis_caller.(:tokens_issued_by_page, %{issuer: issuer, offset: 0, limit: 10})
+    assert {:ok, []} == apis_caller.(:tokens_issued_by_page, %{issuer: issuer, offset: 1, limit: 10})
 
     # ISSUEING
     {:ok, raw_tx} = API.create_issue_transaction(asset, @supply, alice, issuer)
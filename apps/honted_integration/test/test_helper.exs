@@ -16,6 +16,9 @@
 [:porcelain, :hackney]
 |> Enum.map(&Application.ensure_all_started/1)
 
+# honted is started for every test, against a fresh chain, so there's no point in persisting its state
+Application.put_env(:honted_abci, :state_dir, nil)
+
 ExUnit.configure(exclude: [integration: true])
 ExUnitFixtures.start()
 ExUnitFixtures.load_fixture_files() # need to do this in umbrella apps
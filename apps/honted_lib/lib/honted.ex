@@ -24,5 +24,6 @@ defmodule HonteD do
   @type block_height :: pos_integer
   @type epoch_number :: pos_integer
   @type privilege :: String.t
+  @type side :: String.t # "buy" or "sell", see `HonteD.Transaction.Order`
   @type filter_id :: reference
 end
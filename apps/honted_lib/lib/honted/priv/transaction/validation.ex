@@ -17,7 +17,9 @@ defmodule HonteD.Transaction.Validation do
   Private plumbing of the Transaction module wrt. transaction validation
   """
 
-  alias HonteD.Transaction.{CreateToken, Issue, Unissue, Send, SignOff, Allow, EpochChange, SignedTx}
+  alias HonteD.Transaction.{CreateToken, Issue, Unissue, Send, SignOff, Allow, EpochChange, Order, SignedTx}
+
+  @max_amount round(:math.pow(2, 256))  # keeps the prices of orders comparable exactly, see `HonteD.ABCI.OrderBook`
 
   def valid?(%CreateToken{}), do: :ok
 
@@ -45,6 +47,17 @@ defmodule HonteD.Transaction.Validation do
     positive?(epoch_number)
   end
 
+  def valid?(%Order{} = order) do
+    with :ok <- known_side?(order.side),
+         :ok <- positive?(order.amount),
+         :ok <- positive?(order.limit),
+         :ok <- not_too_much?(order.amount),
+         :ok <- not_too_much?(order.limit),
+         :ok <- positive?(order.time_in),
+         :ok <- time_out_after_time_in?(order.time_in, order.time_out),
+         do: different_assets?(order.asset, order.base_asset)
+  end
+
   @spec valid_signed?(HonteD.Transaction.t) :: :ok | {:error, atom}
   def valid_signed?(%SignedTx{raw_tx: raw_tx, signature: signature}) do
     with :ok <- valid?(raw_tx),
@@ -62,6 +75,7 @@ defmodule HonteD.Transaction.Validation do
   def sender(%Issue{issuer: sender}), do: sender
   def sender(%Unissue{issuer: sender}), do: sender
   def sender(%CreateToken{issuer: sender}), do: sender
+  def sender(%Order{sender: sender}), do: sender
 
   defp positive?(amount) when amount > 0, do: :ok
   defp positive?(_), do: {:error, :positive_amount_required}
@@ -69,6 +83,18 @@ defmodule HonteD.Transaction.Validation do
   defp known?(privilege) when privilege in ["signoff"], do: :ok
   defp known?(_), do: {:error, :unknown_privilege}
 
+  defp known_side?(side) when side in ["buy", "sell"], do: :ok
+  defp known_side?(_), do: {:error, :unknown_side}
+
+  defp not_too_much?(amount) when amount < @max_amount, do: :ok
+  defp not_too_much?(_), do: {:error, :amount_way_too_large}
+
+  defp time_out_after_time_in?(time_in, time_out) when time_out > time_in, do: :ok
+  defp time_out_after_time_in?(_, _), do: {:error, :time_out_not_after_time_in}
+
+  defp different_assets?(asset, asset), do: {:error, :same_assets}
+  defp different_assets?(_, _), do: :ok
+
   defp signed?(raw_tx, signature) do
     raw_tx
     |> HonteD.TxCodec.encode
@@ -37,6 +37,7 @@ defmodule HonteD.TxCodec do
   @signoff <<5>>
   @allow <<6>>
   @epoch_change <<7>>
+  @order <<8>>
 
   @doc """
   Encodes internal representation of transaction into a Tendermint transaction
@@ -78,6 +79,7 @@ defmodule HonteD.TxCodec do
   def tx_tag(Transaction.SignOff), do: @signoff
   def tx_tag(Transaction.Allow), do: @allow
   def tx_tag(Transaction.EpochChange), do: @epoch_change
+  def tx_tag(Transaction.Order), do: @order
   def tx_tag(true), do: @byte_true
   def tx_tag(false), do: @byte_false
 
@@ -90,6 +92,8 @@ defmodule HonteD.TxCodec do
   defp fields(Transaction.SignOff), do: [:nonce, :height, :hash, :sender, :signoffer]
   defp fields(Transaction.Allow), do: [:nonce, :allower, :allowee, :privilege, :allow]
   defp fields(Transaction.EpochChange), do: [:nonce, :sender, :epoch_number]
+  defp fields(Transaction.Order),
+    do: [:nonce, :sender, :side, :asset, :amount, :base_asset, :limit, :time_in, :time_out]
   defp fields(Transaction.SignedTx), do: [:raw_tx, :signature]
 
   defp maybe_sig(tx, []), do: {:ok, tx}
@@ -186,6 +190,20 @@ defmodule HonteD.TxCodec do
            epoch_number: int_parse(epoch_number)
          }, tail}
 
+      [@order, nonce, sender, side, asset, amount, base_asset, limit, time_in, time_out | tail] ->
+        {:ok,
+         %Transaction.Order{
+           nonce: int_parse(nonce),
+           sender: sender,
+           side: side,
+           asset: asset,
+           amount: int_parse(amount),
+           base_asset: base_asset,
+           limit: int_parse(limit),
+           time_in: int_parse(time_in),
+           time_out: int_parse(time_out)
+         }, tail}
+
       _tx ->
         {:error, :malformed_transaction}
     end
@@ -106,6 +106,23 @@ defmodule HonteD.Transaction do
     }
   end
 
+  defmodule Order do
+    @moduledoc false
+    defstruct [:nonce, :sender, :side, :asset, :amount, :base_asset, :limit, :time_in, :time_out]
+
+    @type t :: %Order{
+      nonce: HonteD.nonce,
+      sender: HonteD.address,
+      side: HonteD.side,
+      asset: HonteD.token,
+      amount: pos_integer,
+      base_asset: HonteD.token,
+      limit: pos_integer,
+      time_in: HonteD.block_height,
+      time_out: HonteD.block_height,
+    }
+  end
+
   defmodule SignedTx do
     @moduledoc false
     defstruct [:raw_tx, :signature]
@@ -116,7 +133,8 @@ defmodule HonteD.Transaction do
     }
   end
 
-  @type t :: CreateToken.t | Issue.t | Unissue.t | Send.t | SignOff.t | Allow.t | EpochChange.t | SignedTx.t
+  @type t :: CreateToken.t | Issue.t | Unissue.t | Send.t | SignOff.t | Allow.t | EpochChange.t | Order.t
+           | SignedTx.t
 
   @doc """
   Creates a CreateToken transaction, ensures state-less validity and encodes
@@ -257,6 +275,44 @@ defmodule HonteD.Transaction do
     create(EpochChange, args)
   end
 
+  @doc """
+  Creates an Order transaction, ensures state-less validity and encodes.
+
+  A "buy" order buys `amount` of `asset` for at most `limit` of `base_asset`, a "sell" order sells `amount` of
+  `asset` for at least `limit` of `base_asset`. The order can be matched in blocks from `time_in` up to,
+  but excluding, `time_out`
+  """
+  @spec create_order([nonce: HonteD.nonce,
+                      sender: HonteD.address,
+                      side: HonteD.side,
+                      asset: HonteD.token,
+                      amount: pos_integer,
+                      base_asset: HonteD.token,
+                      limit: pos_integer,
+                      time_in: HonteD.block_height,
+                      time_out: HonteD.block_height]) ::
+    {:ok, Order.t} | {:error, atom}
+  def create_order([nonce: nonce,
+                    sender: sender,
+                    side: side,
+                    asset: asset,
+                    amount: amount,
+                    base_asset: base_asset,
+                    limit: limit,
+                    time_in: time_in,
+                    time_out: time_out] = args)
+  when is_integer(nonce) and
+       is_binary(sender) and
+       is_binary(side) and
+       is_binary(asset) and
+       is_integer(amount) and
+       is_binary(base_asset) and
+       is_integer(limit) and
+       is_integer(time_in) and
+       is_integer(time_out) do
+    create(Order, args)
+  end
+
   defp create(type, args) do
     with tx <- struct(type, args),
          :ok <- Validation.valid?(tx),
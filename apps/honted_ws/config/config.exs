@@ -15,4 +15,7 @@
 use Mix.Config
 
 config :honted_ws,
-  honted_api_ws_port: 4004
+  honted_api_ws_port: 4004,
+  event_buffer_size: 10_000,
+  event_buffer_overflow: :drop_oldest,
+  event_batch_size: 100
@@ -19,6 +19,7 @@ defmodule HonteD.WS.Application do
 
   def start(_type, _args) do
     children = [
+      {Registry, keys: :duplicate, name: HonteD.WS.Outbox.Registry},
       HonteD.WS.Server,
     ]
 
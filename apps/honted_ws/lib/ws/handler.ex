@@ -15,10 +15,13 @@
 defmodule HonteD.WS.Handler do
   @moduledoc """
   Translates requests flowing from the websocket connection to the auto-exposed API
+
+  Events are subscribed for on behalf of the connection's `HonteD.WS.Outbox`, which passes them on in batches
   """
   require Logger
 
   alias HonteD.API.ExposeSpec.RPCTranslate
+  alias HonteD.WS.Outbox
 
   @behaviour :cowboy_websocket_handler
 
@@ -29,7 +32,8 @@ defmodule HonteD.WS.Handler do
   end
 
   def websocket_init(_transport_name, req, _opts) do
-    {:ok, req, %{api: HonteD.API}}
+    {:ok, outbox} = Outbox.start_link(self())
+    {:ok, req, %{api: HonteD.API, outbox: outbox}}
   end
 
   def websocket_terminate(_reason, _req, _state) do
@@ -57,9 +61,16 @@ defmodule HonteD.WS.Handler do
     {:shutdown, req, state}
   end
 
-  def websocket_info({:event, event}, req, state) do
-    {:ok, encoded} = Poison.encode(event)
-    {:reply, {:text, encoded}, req, state}
+  def websocket_info({:events, events}, req, %{outbox: outbox} = state) do
+    # the frames of a whole batch are written at once, the next batch is being prepared meanwhile
+    :ok = Outbox.demand(outbox)
+    frames = for event <- events, do: {:text, Poison.encode!(event)}
+    {:reply, frames, req, state}
+  end
+
+  def websocket_info({:outbox_overflow, buffer_size}, req, state) do
+    _ = Logger.warn("websocket subscriber didn't keep up with #{inspect buffer_size} events, closing")
+    {:shutdown, req, state}
   end
 
   def websocket_info(info, req, state) do
@@ -128,13 +139,17 @@ defmodule HonteD.WS.Handler do
 
   # translation and execution logic
 
-  defp substitute_pid_with_self(_, :pid, _), do: self()
-  defp substitute_pid_with_self(_, _, value), do: value
+  defp substitute_pid_with(subscriber) do
+    fn
+      _, :pid, _ -> subscriber
+      _, _, value -> value
+    end
+  end
 
-  defp process_request(decoded_rq, %{api: target}) do
+  defp process_request(decoded_rq, %{api: target, outbox: outbox}) do
     with {:rpc, {method, params}} <- parse(decoded_rq),
          {:ok, fname, args} <- RPCTranslate.to_fa(method, params, target.get_specs(),
-                                                  &substitute_pid_with_self/3),
+                                                  substitute_pid_with(outbox)),
       do: apply_call(target, fname, args)
   end
 
@@ -0,0 +1,158 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.WS.Outbox do
+  @moduledoc """
+  Bounded buffer of events on their way to a websocket subscriber.
+
+  Events are subscribed for with the outbox's pid instead of the websocket handler's, so that a slow client
+  doesn't grow the mailbox of its handler without limit. The outbox hands the events to the handler in batches of
+  at most `:event_batch_size`, the next batch only after the handler asked for it with `demand/1`.
+
+  At most `:event_buffer_size` events are buffered, what happens to the ones above that is `:event_buffer_overflow`:
+    - `:drop_oldest` - the oldest buffered event is dropped
+    - `:coalesce` - a `:finalized` event replaces the buffered `:committed` event of the same transaction,
+      otherwise the oldest buffered event is dropped
+    - `:disconnect` - the handler is sent `{:outbox_overflow, buffer_size}` and no more events are buffered
+
+  Every outbox publishes its queue depth in `HonteD.WS.Outbox.Registry`, see `stats/0`
+  """
+  use GenServer
+  require Logger
+
+  @registry HonteD.WS.Outbox.Registry
+
+  defstruct [:handler,
+             :buffer_size,
+             :overflow,
+             :batch_size,
+             queue: :queue.new(),
+             depth: 0, # length of the queue
+             demand: true, # whether the handler waits for a batch
+             dropped: 0,
+             overflowed: false,
+            ]
+
+  @type overflow :: :drop_oldest | :coalesce | :disconnect
+  @type stats :: %{subscribers: non_neg_integer, queued: non_neg_integer, max_queued: non_neg_integer,
+                   dropped: non_neg_integer}
+
+  @doc """
+  Starts an outbox of the calling websocket handler, which gets the events as `{:events, [event]}`
+  """
+  def start_link(handler, opts \\ []) do
+    GenServer.start_link(__MODULE__, {handler, opts})
+  end
+
+  @doc """
+  Asks for the next batch of events, to be called by the handler when it's done with the previous one
+  """
+  @spec demand(pid) :: :ok
+  def demand(outbox) do
+    GenServer.cast(outbox, :demand)
+  end
+
+  @doc """
+  Queue depths of all the outboxes. `dropped` counts events dropped by the outboxes still running
+  """
+  @spec stats() :: stats
+  def stats do
+    outboxes = Registry.lookup(@registry, :outboxes)
+    %{subscribers: length(outboxes),
+      queued: outboxes |> Enum.map(fn {_pid, {depth, _dropped}} -> depth end) |> Enum.sum(),
+      max_queued: outboxes |> Enum.map(fn {_pid, {depth, _dropped}} -> depth end) |> Enum.max(fn -> 0 end),
+      dropped: outboxes |> Enum.map(fn {_pid, {_depth, dropped}} -> dropped end) |> Enum.sum(),
+    }
+  end
+
+  ## callbacks
+
+  def init({handler, opts}) do
+    Process.monitor(handler)
+    {:ok, _} = Registry.register(@registry, :outboxes, {0, 0})
+    state = %__MODULE__{handler: handler,
+                        buffer_size: option(opts, :event_buffer_size),
+                        overflow: option(opts, :event_buffer_overflow),
+                        batch_size: option(opts, :event_batch_size)}
+    {:ok, state}
+  end
+
+  def handle_info({:event, _event}, %__MODULE__{overflowed: true} = state) do
+    {:noreply, state}
+  end
+
+  def handle_info({:event, event}, state) do
+    state =
+      %{state | queue: :queue.in(event, state.queue), depth: state.depth + 1}
+      |> bound()
+      |> send_batch()
+    {:noreply, publish(state)}
+  end
+
+  def handle_info({:DOWN, _ref, :process, handler, _reason}, %__MODULE__{handler: handler} = state) do
+    {:stop, :normal, state}
+  end
+
+  def handle_cast(:demand, state) do
+    state = send_batch(%{state | demand: true})
+    {:noreply, publish(state)}
+  end
+
+  ## internals
+
+  defp option(opts, key), do: Keyword.get_lazy(opts, key, fn -> Application.get_env(:honted_ws, key) end)
+
+  defp bound(%__MODULE__{depth: depth, buffer_size: buffer_size} = state) when depth <= buffer_size, do: state
+  defp bound(%__MODULE__{overflow: :disconnect} = state) do
+    _ = Logger.warn(fn -> "Websocket subscriber #{inspect state.handler} overflowed #{state.buffer_size} events" end)
+    send(state.handler, {:outbox_overflow, state.buffer_size})
+    %{state | queue: :queue.new(), depth: 0, dropped: state.dropped + state.depth, overflowed: true}
+  end
+  defp bound(%__MODULE__{overflow: :coalesce} = state) do
+    {{:value, event}, _} = :queue.out_r(state.queue)
+    case superseded_by(event) do
+      nil ->
+        drop_oldest(state)
+      superseded ->
+        queue = :queue.filter(&(&1 != superseded), state.queue)
+        case :queue.len(queue) do
+          depth when depth == state.depth -> drop_oldest(state)
+          depth -> %{state | queue: queue, depth: depth, dropped: state.dropped + state.depth - depth}
+        end
+    end
+  end
+  defp bound(%__MODULE__{overflow: :drop_oldest} = state), do: drop_oldest(state)
+
+  defp drop_oldest(state) do
+    %{state | queue: :queue.drop(state.queue), depth: state.depth - 1, dropped: state.dropped + 1}
+  end
+
+  # the committed event, which a finalized one makes redundant
+  defp superseded_by(%{finality: :finalized} = event), do: %{event | finality: :committed}
+  defp superseded_by(_), do: nil
+
+  defp send_batch(%__MODULE__{demand: true, depth: depth} = state) when depth > 0 do
+    batch_size = min(depth, state.batch_size)
+    {batch, queue} = :queue.split(batch_size, state.queue)
+    send(state.handler, {:events, :queue.to_list(batch)})
+    %{state | queue: queue, depth: depth - batch_size, demand: false}
+  end
+  defp send_batch(state), do: state
+
+  defp publish(state) do
+    {_, _} = Registry.update_value(@registry, :outboxes, fn _ -> {state.depth, state.dropped} end)
+    state
+  end
+
+end
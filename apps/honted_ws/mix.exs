@@ -34,6 +34,9 @@ defmodule HonteD.WS.Mixfile do
     [
       env: [
         honted_api_ws_port: 4004, # our own ws port where HonteD.API is exposed
+        event_buffer_size: 10_000, # events buffered for a subscriber, see HonteD.WS.Outbox
+        event_buffer_overflow: :drop_oldest, # :drop_oldest | :coalesce | :disconnect
+        event_batch_size: 100, # events written to the websocket at once
       ],
       extra_applications: [:logger],
       mod: {HonteD.WS.Application, []}
@@ -65,20 +65,28 @@ defmodule HonteD.WS.HandlerTest do
     end
   end
 
+  setup do
+    {:ok, _} = start_supervised({Registry, keys: :duplicate, name: HonteD.WS.Outbox.Registry})
+    {:ok, outbox} = HonteD.WS.Outbox.start_link(self(), event_buffer_size: 10, event_buffer_overflow: :drop_oldest,
+                                                        event_batch_size: 10)
+    Process.put(:state, %{api: ExampleAPI, outbox: outbox})
+    :ok
+  end
+
   def call(x) do
-    state = %{api: ExampleAPI}
-    {:reply, {:text, rep}, nil, _} = websocket_handle({:text, x}, nil, state)
+    {:reply, {:text, rep}, nil, _} = websocket_handle({:text, x}, nil, Process.get(:state))
     {:ok, decoded} = Poison.decode(rep)
     decoded
   end
 
-  def get_event(timeout \\ @timeout) do
-    state = %{api: ExampleAPI}
+  def get_events(timeout \\ @timeout) do
     receive do
       msg ->
-        {:reply, {:text, rep}, nil, _} = websocket_info(msg, nil, state)
-        {:ok, decoded} = Poison.decode(rep)
-        decoded
+        {:reply, frames, nil, _} = websocket_info(msg, nil, Process.get(:state))
+        for {:text, rep} <- frames do
+          {:ok, decoded} = Poison.decode(rep)
+          decoded
+        end
     after
       timeout -> throw :timeouted
     end
@@ -87,7 +95,21 @@ defmodule HonteD.WS.HandlerTest do
   test "processes events" do
     assert %{"result" => "ok"} =
       call(~s({"method": "event_me", "params": {}, "type": "rq", "wsrpc": "1.0"}))
-    assert get_event() == ExampleAPI.test_event_payload
+    assert get_events() == [ExampleAPI.test_event_payload]
+  end
+
+  test "events are written in batches" do
+    for _ <- 1..3 do
+      assert %{"result" => "ok"} =
+        call(~s({"method": "event_me", "params": {}, "type": "rq", "wsrpc": "1.0"}))
+    end
+    # the first event is sent on its own, the next ones wait until it's written
+    assert get_events() == [ExampleAPI.test_event_payload]
+    assert get_events() == [ExampleAPI.test_event_payload, ExampleAPI.test_event_payload]
+  end
+
+  test "closes when the subscriber doesn't keep up" do
+    assert {:shutdown, nil, _} = websocket_info({:outbox_overflow, 10}, nil, Process.get(:state))
   end
 
   test "sane handler" do
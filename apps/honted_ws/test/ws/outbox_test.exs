@@ -0,0 +1,117 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+defmodule HonteD.WS.OutboxTest do
+  @moduledoc """
+  Tests buffering of the events for a slow websocket subscriber, the test process plays the websocket handler
+  """
+  use ExUnit.Case
+
+  alias HonteD.WS.Outbox
+
+  @timeout 100
+
+  setup do
+    {:ok, _} = start_supervised({Registry, keys: :duplicate, name: HonteD.WS.Outbox.Registry})
+    :ok
+  end
+
+  defp outbox(overflow) do
+    {:ok, outbox} = Outbox.start_link(self(), event_buffer_size: 3, event_buffer_overflow: overflow,
+                                              event_batch_size: 2)
+    outbox
+  end
+
+  defp committed(n), do: %{source: "filter", height: 1, finality: :committed, transaction: n}
+  defp finalized(n), do: %{committed(n) | finality: :finalized}
+
+  # events are queued behind the first one, which the handler didn't ask for the next batch after yet
+  defp push(outbox, events) do
+    for event <- events, do: send(outbox, {:event, event})
+    _ = :sys.get_state(outbox)
+    :ok
+  end
+
+  defp stats(outbox) do
+    _ = :sys.get_state(outbox)
+    Outbox.stats()
+  end
+
+  defp next_batch(outbox) do
+    :ok = Outbox.demand(outbox)
+    assert_receive {:events, events}, @timeout
+    events
+  end
+
+  test "events are passed on in batches, when asked for" do
+    outbox = outbox(:drop_oldest)
+    push(outbox, Enum.map(1..4, &committed/1))
+
+    assert_receive {:events, [%{transaction: 1}]}, @timeout
+    refute_receive {:events, _}, @timeout
+    assert [%{transaction: 2}, %{transaction: 3}] = next_batch(outbox)
+    assert [%{transaction: 4}] = next_batch(outbox)
+  end
+
+  test "drop_oldest drops the oldest events" do
+    outbox = outbox(:drop_oldest)
+    push(outbox, Enum.map(1..6, &committed/1))
+
+    assert_receive {:events, [%{transaction: 1}]}, @timeout
+    assert [%{transaction: 4}, %{transaction: 5}] = next_batch(outbox)
+    assert [%{transaction: 6}] = next_batch(outbox)
+    assert %{subscribers: 1, queued: 0, dropped: 2} = stats(outbox)
+  end
+
+  test "coalesce replaces committed events with finalized ones" do
+    outbox = outbox(:coalesce)
+    push(outbox, [committed(0), committed(1), committed(2), committed(3), finalized(2), committed(4)])
+
+    assert_receive {:events, [%{transaction: 0}]}, @timeout
+    assert [committed(3), finalized(2)] == next_batch(outbox)
+    assert [committed(4)] == next_batch(outbox)
+    assert %{dropped: 2} = stats(outbox)
+  end
+
+  test "disconnect tells the handler and stops buffering" do
+    outbox = outbox(:disconnect)
+    push(outbox, Enum.map(1..5, &committed/1))
+
+    assert_receive {:events, [%{transaction: 1}]}, @timeout
+    assert_receive {:outbox_overflow, 3}, @timeout
+    :ok = Outbox.demand(outbox)
+    refute_receive {:events, _}, @timeout
+  end
+
+  test "queue depths are published" do
+    outbox1 = outbox(:drop_oldest)
+    outbox2 = outbox(:drop_oldest)
+    push(outbox1, Enum.map(1..3, &committed/1))
+    push(outbox2, Enum.map(1..2, &committed/1))
+
+    assert %{subscribers: 2, queued: 3, max_queued: 2, dropped: 0} = Outbox.stats()
+  end
+
+  test "stops with its handler" do
+    parent = self()
+    handler = spawn(fn ->
+      send(parent, {:outbox, outbox(:drop_oldest)})
+      receive do :stop -> :ok end
+    end)
+    assert_receive {:outbox, outbox}, @timeout
+    ref = Process.monitor(outbox)
+    send(handler, :stop)
+    assert_receive {:DOWN, ^ref, :process, ^outbox, :normal}, @timeout
+  end
+end
@@ -38,12 +38,23 @@ contract HonteStaking {
     bytes32 tendermintPubkey;
     address owner;
     bool isContinuing;
+    // position of the validator's slot in `stakeHeaps`, packed together with `owner` and `isContinuing`
+    uint8 heapPosition;
   }
 
   // a double mapping staker_address => epoch_number => amount deposited/withdrawable in epoch_number for staker
   mapping (address => mapping(uint256 => uint256)) public deposits;
   mapping (uint256 => mapping(uint256 => validator)) private validatorSets;
 
+  // Indices maintained alongside `validatorSets`, so that `join` doesn't need to scan the validator slots:
+  //   - epoch_number => number of filled validator slots (slots are filled in order and never emptied)
+  //   - epoch_number => validator_address => validator slot; stale for ejected validators, so must be checked
+  //     against the slot's owner
+  //   - epoch_number => binary min-heap of validator slots, ordered by stake, then by slot
+  mapping (uint256 => uint256) private validatorSetSizes;
+  mapping (uint256 => mapping(address => uint256)) private validatorPositions;
+  mapping (uint256 => mapping(uint256 => uint256)) private stakeHeaps;
+
   ERC20   token;
 
   uint256 public epochLength;
@@ -54,6 +65,7 @@ contract HonteStaking {
   uint256 public unbondingPeriod;
 
   // imposed to steer cleer of validators overloading tendermint or too gas-costly joins
+  // NOTE: must stay below 256, see `validator.heapPosition`
   uint256 constant safetyLimitForValidators = 100;
 
   /*
@@ -126,19 +138,29 @@ contract HonteStaking {
 
     // Creates/updates new validator from a joiner
     //
-    if (validatorSets[nextEpoch][newValidatorPosition].owner == msg.sender) {
+    validator storage modifiedValidatorEntry = validatorSets[nextEpoch][newValidatorPosition];
+    if (modifiedValidatorEntry.owner == msg.sender) {
       // this isn't ejecting - joiner is already present in the next epoch's validator set
       // we just update the stake
-      validatorSets[nextEpoch][newValidatorPosition].stake = validatorSets[nextEpoch][newValidatorPosition].stake.add(deposits[msg.sender][0]);
+      modifiedValidatorEntry.stake = modifiedValidatorEntry.stake.add(deposits[msg.sender][0]);
+      siftDownStakeHeap(nextEpoch, modifiedValidatorEntry.heapPosition);
     } else {
       // ejecting (possibly an empty slot)
+      bool joinsEmptySlot = modifiedValidatorEntry.owner == 0x0;
 
-      // ejecting validator has already staked this much...
-      uint256 currentStake = currentStakeOfJoiner(currentEpoch);
-      // ejected validator will be...
-      validator storage modifiedValidatorEntry = validatorSets[nextEpoch][newValidatorPosition];
+      // ejecting validator has already staked this much (bonded until the end of the current epoch)...
+      // NOTE: counts in a fresh deposit it might have joined with and been ejected with in this epoch, as
+      //       that's bonded together with the current stake and moved to `unbondingEpoch` below
+      uint256 currentStake = deposits[msg.sender][unbondingEpoch - 1];
       // do it!
       ejectAndJoin(modifiedValidatorEntry, currentStake, unbondingEpoch);
+
+      validatorPositions[nextEpoch][msg.sender] = newValidatorPosition;
+      if (joinsEmptySlot) {
+        pushToStakeHeap(nextEpoch, newValidatorPosition);
+      } else {
+        siftDownStakeHeap(nextEpoch, modifiedValidatorEntry.heapPosition);
+      }
     }
 
     // want to give the possibility of updating the tendermint address regardless
@@ -193,6 +215,47 @@ contract HonteStaking {
      owner = queriedValidator.owner;
    }
 
+   /** @dev Bulk version of `getValidator` - reads validator sets of a range of epochs in one call.
+     *       Validators are listed epoch by epoch, in the order of their slots, empty slots are skipped
+     * @param firstEpoch the first validating epoch queried
+     * @param lastEpoch the last validating epoch queried (inclusive)
+     * @return epochs for every listed validator, the epoch it validates in
+     * @return stakes for every listed validator, its stake in smallest token denomination
+     * @return tendermintPubkeys for every listed validator, its public address of the tendermint validator
+     * @return owners for every listed validator, its address on ethereum
+     */
+   function getValidatorSets(uint256 firstEpoch, uint256 lastEpoch)
+     public
+     view
+     returns (uint256[] epochs, uint256[] stakes, bytes32[] tendermintPubkeys, address[] owners)
+   {
+     require(firstEpoch <= lastEpoch);
+
+     uint256 count = 0;
+     uint256 epoch;
+     for (epoch = firstEpoch; epoch <= lastEpoch; epoch++) {
+       count = count.add(validatorSetSizes[epoch]);
+     }
+
+     epochs = new uint256[](count);
+     stakes = new uint256[](count);
+     tendermintPubkeys = new bytes32[](count);
+     owners = new address[](count);
+
+     uint256 position = 0;
+     for (epoch = firstEpoch; epoch <= lastEpoch; epoch++) {
+       uint256 size = validatorSetSizes[epoch];
+       for (uint256 i = 0; i < size; i++) {
+         validator storage listedValidator = validatorSets[epoch][i];
+         epochs[position] = epoch;
+         stakes[position] = listedValidator.stake;
+         tendermintPubkeys[position] = listedValidator.tendermintPubkey;
+         owners[position] = listedValidator.owner;
+         position++;
+       }
+     }
+   }
+
   /** @dev Gets current epoch based on current mined block number and parameters of the staking contract
     * @return 0-based Index of the current epoch
     */
@@ -234,55 +297,110 @@ contract HonteStaking {
     view
     returns (uint256)
   {
-    uint256 lowestValidatorAmount   = 2**255;
-    uint256 lowestValidatorPosition = 0;
-
-    for(uint256 i = 0; i < maxNumberOfValidators; i++) {
-      // If a validator spot is empty exit the loop and join at that position or
-      // if the joiner is already an existing validator in the set
-      //
-      if (validatorSets[epoch][i].owner == 0x0 || validatorSets[epoch][i].owner == msg.sender) {
-        return i;
+    // If the joiner is already an existing validator in the set join at that position
+    //
+    uint256 joinerPosition = validatorPositions[epoch][msg.sender];
+    if (validatorSets[epoch][joinerPosition].owner == msg.sender) {
+      return joinerPosition;
+    }
+
+    // If a validator spot is empty join at the first one
+    //
+    uint256 size = validatorSetSizes[epoch];
+    if (size < maxNumberOfValidators) {
+      return size;
+    }
+
+    // Otherwise take the position of the lowest stake (the first one, if there are many)
+    //
+    return stakeHeaps[epoch][0];
+  }
+
+  function pushToStakeHeap(uint256 epoch, uint256 position)
+    private
+  {
+    uint256 heapPosition = validatorSetSizes[epoch];
+    validatorSetSizes[epoch] = heapPosition.add(1);
+
+    // moving higher parents down to the free heap position until `position` fits in
+    while (heapPosition > 0) {
+      uint256 parentHeapPosition = (heapPosition - 1) / 2;
+      uint256 parentPosition = stakeHeaps[epoch][parentHeapPosition];
+      if (!isLowerInStakeHeap(epoch, position, parentPosition)) {
+        break;
       }
+      placeInStakeHeap(epoch, heapPosition, parentPosition);
+      heapPosition = parentHeapPosition;
+    }
+    placeInStakeHeap(epoch, heapPosition, position);
+  }
 
-      // Tracks the minimum stake and save its position
-      //
-      else if (validatorSets[epoch][i].stake < lowestValidatorAmount) {
-        lowestValidatorPosition = i;
-        lowestValidatorAmount = validatorSets[epoch][lowestValidatorPosition].stake;
+  // stakes in the validator slots only ever increase, so this is the only way a slot needs to be moved in the heap
+  function siftDownStakeHeap(uint256 epoch, uint256 heapPosition)
+    private
+  {
+    uint256 size = validatorSetSizes[epoch];
+    uint256 position = stakeHeaps[epoch][heapPosition];
+    uint256 initialHeapPosition = heapPosition;
+
+    // moving lower children up to the free heap position until `position` fits in
+    while (true) {
+      uint256 childHeapPosition = heapPosition.mul(2).add(1);
+      if (childHeapPosition >= size) {
+        break;
       }
+      uint256 childPosition = stakeHeaps[epoch][childHeapPosition];
+      if (childHeapPosition + 1 < size) {
+        uint256 rightChildPosition = stakeHeaps[epoch][childHeapPosition + 1];
+        if (isLowerInStakeHeap(epoch, rightChildPosition, childPosition)) {
+          childHeapPosition = childHeapPosition + 1;
+          childPosition = rightChildPosition;
+        }
+      }
+      if (!isLowerInStakeHeap(epoch, childPosition, position)) {
+        break;
+      }
+      placeInStakeHeap(epoch, heapPosition, childPosition);
+      heapPosition = childHeapPosition;
     }
 
-    return lowestValidatorPosition;
+    // `if` to prevent an expensive no-op
+    if (heapPosition != initialHeapPosition) {
+      placeInStakeHeap(epoch, heapPosition, position);
+    }
   }
 
-  function registerNewDeposit(uint256 amount)
+  function placeInStakeHeap(uint256 epoch, uint256 heapPosition, uint256 position)
     private
   {
-    deposits[msg.sender][0] = deposits[msg.sender][0].add(amount);
+    stakeHeaps[epoch][heapPosition] = position;
+    validatorSets[epoch][position].heapPosition = uint8(heapPosition);
   }
 
-  function notInMaturityMargin()
+  // ties are resolved by the slot, so the top of the heap is the first slot holding the lowest stake
+  function isLowerInStakeHeap(uint256 epoch, uint256 position, uint256 otherPosition)
     private
     view
     returns (bool)
   {
-    uint256 nextEpochBlockNumber = getNextEpochBlockNumber();
-    return block.number < nextEpochBlockNumber.sub(maturityMargin);
+    uint256 stake = validatorSets[epoch][position].stake;
+    uint256 otherStake = validatorSets[epoch][otherPosition].stake;
+    return stake < otherStake || (stake == otherStake && position < otherPosition);
   }
 
-  function currentStakeOfJoiner(uint256 currentEpoch)
+  function registerNewDeposit(uint256 amount)
+    private
+  {
+    deposits[msg.sender][0] = deposits[msg.sender][0].add(amount);
+  }
+
+  function notInMaturityMargin()
     private
     view
-    returns (uint256 alreadyStaked)
+    returns (bool)
   {
-    alreadyStaked = 0;
-    for (uint256 i = 0; i < maxNumberOfValidators; i++) {
-      if (validatorSets[currentEpoch][i].owner == msg.sender) {
-        alreadyStaked = validatorSets[currentEpoch][i].stake;
-        break;
-      }
-    }
+    uint256 nextEpochBlockNumber = getNextEpochBlockNumber();
+    return block.number < nextEpochBlockNumber.sub(maturityMargin);
   }
 
   function ejectAndJoin(validator storage modifiedValidatorEntry,
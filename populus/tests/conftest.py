@@ -12,11 +12,22 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import json
+import os
+
 import pytest
+from populus.plugin import get_populus_option
+from populus.project import Project
+
+GAS_BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'gas_baseline.json')
+# relative increase of gas usage over the baseline, which is not considered a regression
+GAS_TOLERANCE = 0.02
 
 def pytest_addoption(parser):
     parser.addoption("--runslow", action="store_true",
                      default=False, help="run slow tests")
+    parser.addoption("--update-gas-baseline", action="store_true",
+                     default=False, help="store gas usage measured by gas tests as the new baseline")
 
 def pytest_collection_modifyitems(config, items):
     if config.getoption("--runslow"):
@@ -26,3 +37,144 @@ def pytest_collection_modifyitems(config, items):
     for item in items:
         if "slow" in item.keywords:
             item.add_marker(skip_slow)
+
+
+class ChainSnapshots:
+    """
+    Keeps deployed state of the session-wide tester chain in layers, each one backed by an EVM snapshot.
+
+    A layer is identified by its path - a tuple of keys of all the layers it is built upon, ending with its own key.
+    The snapshots on the tester chain form a stack (reverting pops a snapshot), so only the layers on the path to the
+    currently restored one are kept, others get rebuilt when needed
+    """
+
+    def __init__(self, chain):
+        self.chain = chain
+        # mirrors the stack of snapshots on the tester chain, root layer is the pristine chain
+        self.layers = [((), None)]
+        chain.web3.testing.snapshot()
+
+    def restore(self, path, build=None):
+        """
+        Reverts the chain to the state right after the layer `path` got built and returns the value `build` returned.
+        On first use `build` is called to build the layer on top of its parent layer, which must be restored before
+        """
+        depth = min(len(self.layers) - 1, len(path))
+        while self.layers[depth][0] != path[:depth]:
+            depth -= 1
+
+        self._revert_to(depth)
+        if depth == len(path):
+            return self.layers[depth][1]
+
+        assert depth == len(path) - 1, "parent layer of {} must be restored first".format(path)
+        value = build()
+        self.chain.web3.testing.snapshot()
+        self.layers.append((path, value))
+        return value
+
+    def _revert_to(self, depth):
+        testing = self.chain.web3.testing
+        while len(self.layers) > depth + 1:
+            testing.revert(len(self.layers) - 1)
+            self.layers.pop()
+        # reverting pops the snapshot, so it needs to be retaken for the layer to be reusable
+        testing.revert(depth)
+        testing.snapshot()
+
+
+@pytest.fixture(scope="session")
+def session_project(pytestconfig):
+    # populus' `project` fixture is function-scoped, so can't back the session-wide chain
+    project_dir = get_populus_option(cmdline_option="--populus-project",
+                                     ini_option="populus_project",
+                                     environ_var="PYTEST_POPULUS_PROJECT",
+                                     pytestconfig=pytestconfig,
+                                     default=os.getcwd())
+    return Project(project_dir)
+
+# NOTE: under pytest-xdist every worker is a separate process, with its own in-memory tester chain and accounts
+#       (also the ones created with `personal.newAccount`), so the session-wide chain is per worker
+@pytest.fixture(scope="session")
+def session_chain(session_project):
+    with session_project.get_chain('tester') as chain:
+        yield chain
+
+@pytest.fixture(scope="session")
+def snapshots(session_chain):
+    return ChainSnapshots(session_chain)
+
+@pytest.fixture()
+def chain(session_chain, snapshots, request):
+    # overrides populus' `chain`, so that every test runs on the session-wide chain.
+    # Layers built on top of `token` restore the state themselves, otherwise start from pristine chain
+    if 'token' not in request.fixturenames:
+        snapshots.restore(())
+    return session_chain
+
+
+class GasBaseline:
+    """
+    Compares gas usage measured by tests against the baseline stored in `gas_baseline.json`.
+    Measurements missing from the baseline fail. With `--update-gas-baseline` nothing is compared, the measurements
+    are stored as the new baseline instead
+    """
+
+    def __init__(self, path, update):
+        self.path = path
+        self.update = update
+        self.measured = {}
+        self.baseline = {}
+        if os.path.exists(path):
+            with open(path) as baseline_file:
+                self.baseline = json.load(baseline_file)
+
+    def check(self, name, receipt):
+        gas_used = receipt['gasUsed']
+        self.measured[name] = gas_used
+        if self.update:
+            return
+        if name not in self.baseline:
+            pytest.fail("no gas baseline for {}, measure it with --update-gas-baseline".format(name))
+        allowed = self.baseline[name] * (1 + GAS_TOLERANCE)
+        assert gas_used <= allowed, "gas usage of {} regressed: {} > {} (baseline)".format(
+            name, gas_used, self.baseline[name])
+
+    def save(self):
+        self.baseline.update(self.measured)
+        with open(self.path, 'w') as baseline_file:
+            json.dump(self.baseline, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+
+
+def is_xdist_worker(config):
+    return hasattr(config, 'workerinput')
+
+def pytest_configure(config):
+    config.gas_baseline = GasBaseline(GAS_BASELINE_PATH, config.getoption("--update-gas-baseline"))
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    # on xdist controller - collect the measurements done by a worker
+    node.config.gas_baseline.measured.update(node.workeroutput.get('gas_measured', {}))
+
+def pytest_sessionfinish(session):
+    baseline = session.config.gas_baseline
+    if is_xdist_worker(session.config):
+        # passed to the controller, which is the only one storing and summarizing, see `pytest_testnodedown`
+        session.config.workeroutput['gas_measured'] = baseline.measured
+    elif baseline.update and baseline.measured:
+        baseline.save()
+
+@pytest.fixture(scope="session")
+def gas_baseline(pytestconfig):
+    return pytestconfig.gas_baseline
+
+def pytest_terminal_summary(terminalreporter):
+    baseline = terminalreporter.config.gas_baseline
+    if not baseline.measured:
+        return
+    terminalreporter.section("gas usage")
+    for name, gas_used in sorted(baseline.measured.items()):
+        stored = baseline.baseline.get(name, "missing")
+        terminalreporter.write_line("{:<40} {:>10} (baseline: {})".format(name, gas_used, stored))
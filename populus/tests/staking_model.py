@@ -0,0 +1,193 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Pure-Python reference model of the HonteStaking contract, fast enough to run large numbers of random operation
+sequences, see test_staking_model.py.
+
+Only the state machine is modelled (deposits, validator sets, epochs and the rules of joining and ejecting),
+tokens and events are not. Every transaction is assumed to be mined in its own block, like on the tester chain.
+"""
+
+ZERO_PUBKEY = b'\x00' * 32
+
+
+class Reverted(Exception):
+    """Raised where the contract would fail a `require`, the state of the model is left untouched"""
+
+
+class Validator:
+    __slots__ = ('stake', 'tendermint_pubkey', 'owner', 'is_continuing')
+
+    def __init__(self, stake, tendermint_pubkey, owner, is_continuing):
+        self.stake = stake
+        self.tendermint_pubkey = tendermint_pubkey
+        self.owner = owner
+        self.is_continuing = is_continuing
+
+    def as_tuple(self):
+        # in the form returned by `getValidator`, without the private `isContinuing`
+        return (self.stake, self.tendermint_pubkey, self.owner)
+
+
+class HonteStakingModel:
+
+    def __init__(self, epoch_length, maturity_margin, max_validators, start_block=0, unbonding_period=1):
+        self.epoch_length = epoch_length
+        self.maturity_margin = maturity_margin
+        self.max_validators = max_validators
+        self.start_block = start_block
+        self.unbonding_period = unbonding_period
+        # number of the block the next transaction gets mined in
+        self.block_number = start_block + 1
+
+        # (staker, epoch) => amount deposited/withdrawable in epoch, zero amounts are not kept
+        self.deposits = {}
+        # epoch => list of `Validator`s, in the order of slots
+        self.validator_sets = {}
+
+    # Transactions
+
+    def deposit(self, sender, amount):
+        self._move_in(sender, 0, amount)
+        self.mine()
+
+    def join(self, sender, tendermint_pubkey):
+        self._require(tendermint_pubkey != ZERO_PUBKEY)
+
+        current_epoch = self.get_current_epoch()
+        next_epoch = current_epoch + 1
+        unbonding_epoch = next_epoch + 1 + self.unbonding_period
+
+        self._require(self.block_number < self.get_next_epoch_block_number() - self.maturity_margin)
+
+        validators = self.validator_sets.get(next_epoch, [])
+        position = self._get_new_validator_position(sender, validators)
+
+        if position < len(validators) and validators[position].owner == sender:
+            # not ejecting, just updating the stake
+            validators[position].stake += self.get_deposit(sender, 0)
+        else:
+            # bonded until the end of the current epoch, see `HonteStaking.join`
+            current_stake = self.get_deposit(sender, unbonding_epoch - 1)
+            sum_to_stake = self.get_deposit(sender, 0) + current_stake
+            ejected = validators[position] if position < len(validators) else None
+            self._require((ejected.stake if ejected else 0) < sum_to_stake)
+
+            joiner = Validator(sum_to_stake, tendermint_pubkey, sender, current_stake > 0)
+            if ejected is None:
+                validators.append(joiner)
+            else:
+                validators[position] = joiner
+                if ejected.is_continuing:
+                    self._move_deposit(ejected.owner, unbonding_epoch, unbonding_epoch - 1)
+                else:
+                    self._move_deposit(ejected.owner, unbonding_epoch, 0)
+            self.validator_sets[next_epoch] = validators
+
+        validators[position].tendermint_pubkey = tendermint_pubkey
+
+        self._move_deposit(sender, 0, unbonding_epoch)
+        self._move_deposit(sender, unbonding_epoch - 1, unbonding_epoch)
+        self.mine()
+
+    def withdraw(self, sender, epoch):
+        self._require(epoch <= self.get_current_epoch())
+        amount = self.get_deposit(sender, epoch)
+        self._require(amount != 0)
+
+        del self.deposits[(sender, epoch)]
+        self.mine()
+        return amount
+
+    def mine(self, blocks=1):
+        self.block_number += blocks
+
+    # Constant functions
+
+    def get_deposit(self, staker, epoch):
+        return self.deposits.get((staker, epoch), 0)
+
+    def get_validators(self, epoch):
+        return [validator.as_tuple() for validator in self.validator_sets.get(epoch, [])]
+
+    def get_current_epoch(self):
+        return (self.block_number - self.start_block) // self.epoch_length
+
+    def get_next_epoch_block_number(self):
+        return self.start_block + (self.get_current_epoch() + 1) * self.epoch_length
+
+    def get_state(self):
+        # a comparable copy of the whole state
+        validator_sets = {epoch: [validator.as_tuple() + (validator.is_continuing,) for validator in validators]
+                          for epoch, validators in self.validator_sets.items()}
+        return (self.block_number, dict(self.deposits), validator_sets)
+
+    # Internals
+
+    def _require(self, condition):
+        if not condition:
+            raise Reverted()
+
+    def _get_new_validator_position(self, sender, validators):
+        for position, validator in enumerate(validators):
+            if validator.owner == sender:
+                return position
+        if len(validators) < self.max_validators:
+            return len(validators)
+        # the first of the lowest stakes
+        return min(range(len(validators)), key=lambda position: validators[position].stake)
+
+    def _move_in(self, owner, epoch, amount):
+        if amount > 0:
+            self.deposits[(owner, epoch)] = self.get_deposit(owner, epoch) + amount
+
+    def _move_deposit(self, owner, from_epoch, to_epoch):
+        assert from_epoch != to_epoch
+        self._move_in(owner, to_epoch, self.deposits.pop((owner, from_epoch), 0))
+
+
+def random_operation(rng, model, stakers, amounts):
+    """
+    Draws an operation on `model` by one of the `stakers`: ('deposit', staker, amount), ('join', staker),
+    ('withdraw', staker, epoch) or ('mine', blocks). Draws from few `amounts`, so that ties in stakes are frequent
+    """
+    kind = rng.random()
+    staker = rng.choice(stakers)
+    if kind < 0.3:
+        return ('deposit', staker, rng.choice(amounts))
+    if kind < 0.65:
+        return ('join', staker)
+    if kind < 0.8:
+        return ('withdraw', staker, rng.randint(0, model.get_current_epoch() + 1))
+    return ('mine', rng.randint(1, model.epoch_length))
+
+def apply_operation(model, operation, tendermint_pubkey):
+    """
+    Applies an operation drawn by `random_operation` to `model`, `tendermint_pubkey(staker)` gives the joiners' keys.
+    Returns whether it succeeded
+    """
+    kind, args = operation[0], operation[1:]
+    try:
+        if kind == 'deposit':
+            model.deposit(*args)
+        elif kind == 'join':
+            model.join(args[0], tendermint_pubkey(args[0]))
+        elif kind == 'withdraw':
+            model.withdraw(*args)
+        else:
+            model.mine(*args)
+    except Reverted:
+        return False
+    return True
@@ -13,6 +13,7 @@
 #   limitations under the License.
 
 import json
+import random
 import sys
 
 from ethereum import utils
@@ -20,8 +21,10 @@ from ethereum.tester import TransactionFailed
 import pytest
 import web3
 from populus.wait import Wait
+from testrpc.utils import input_transaction_formatter
 
 from omg_contract_codes import OMGTOKEN_CONTRACT_ABI, OMGTOKEN_CONTRACT_BYTECODE
+from staking_model import HonteStakingModel, apply_operation, random_operation
 
 HUGE_AMOUNT = 10**36
 LARGE_AMOUNT = utils.denoms.ether
@@ -39,19 +42,42 @@ def deploy(web3, ContractClass):
     deploy_receipt = web3.eth.getTransactionReceipt(deploy_tx)
     return ContractClass(address=deploy_receipt['contractAddress'])
 
-@pytest.fixture()
-def token(chain, accounts):
+
+# enough for any of the transactions done in bulk, see `send_in_bulk`
+BULK_TRANSACTION_GAS = 100000
+
+def send_in_bulk(chain, transactions):
+    # NOTE: through web3 the tester chain mines a block for every transaction, so setups doing a lot of them are slow.
+    #       Here `transactions` (as taken by `web3.eth.sendTransaction`) are sent to the tester directly
+    #       and packed into as few blocks as the block gas limit allows
+    client = chain.web3.providers[0].rpc_methods.client
+    for transaction in transactions:
+        transaction = dict({'gas': BULK_TRANSACTION_GAS}, **transaction)
+        if client.evm.block.gas_used + transaction['gas'] > client.evm.block.gas_limit:
+            client.mine_block()
+        client._send_transaction(**input_transaction_formatter(transaction))
+    client.mine_block()
+
+def contract_transaction(contract, sender, fn_name, *args):
+    return {'from': sender, 'to': contract.address, 'data': contract.encodeABI(fn_name=fn_name, args=args)}
+
+
+TOKEN_LAYER = ('token',)
+
+def deploy_token(chain, accounts):
     owner = accounts[0]
     contract_class = chain.web3.eth.contract(abi=json.loads(OMGTOKEN_CONTRACT_ABI),
                                              bytecode=OMGTOKEN_CONTRACT_BYTECODE)
     token = deploy(chain.web3, contract_class)
-    for validator in accounts:
-        chain.wait.for_receipt(
-            token.transact({'from': owner}).mint(validator, HUGE_AMOUNT))
-    chain.wait.for_receipt(
-        token.transact({'from': owner}).finishMinting())
+    minting = [contract_transaction(token, owner, 'mint', validator, HUGE_AMOUNT) for validator in accounts]
+    send_in_bulk(chain, minting + [contract_transaction(token, owner, 'finishMinting')])
     return token
 
+# NOTE: fixtures deploying contracts are built once per session and then restored from EVM snapshots, see conftest.py
+@pytest.fixture()
+def token(chain, snapshots, accounts):
+    return snapshots.restore(TOKEN_LAYER, lambda: deploy_token(chain, accounts))
+
 @pytest.fixture()
 def epoch_length():
     return 40
@@ -65,17 +91,25 @@ def max_validators():
     return 4
 
 def deploy_staking(token_address, chain, owner, epoch_length, maturity_margin, max_validators):
-    staking, _ = chain.provider.get_or_deploy_contract('HonteStaking',
-                                                       deploy_transaction={'from': owner},
-                                                       deploy_args=[epoch_length,
-                                                                    maturity_margin,
-                                                                    token_address,
-                                                                    max_validators])
+    # NOTE: always deploys - on the session-wide chain `get_or_deploy_contract` could return a contract
+    #       deployed with different arguments
+    staking, _ = chain.provider.deploy_contract('HonteStaking',
+                                                deploy_transaction={'from': owner},
+                                                deploy_args=[epoch_length,
+                                                             maturity_margin,
+                                                             token_address,
+                                                             max_validators])
     return staking
 
 @pytest.fixture()
-def staking(token, chain, accounts, epoch_length, maturity_margin, max_validators):
-    return deploy_staking(token.address, chain, accounts[0], epoch_length, maturity_margin, max_validators)
+def staking_layer(epoch_length, maturity_margin, max_validators):
+    return TOKEN_LAYER + (('staking', epoch_length, maturity_margin, max_validators),)
+
+@pytest.fixture()
+def staking(token, chain, snapshots, staking_layer, accounts, epoch_length, maturity_margin, max_validators):
+    return snapshots.restore(staking_layer,
+                             lambda: deploy_staking(token.address, chain, accounts[0],
+                                                    epoch_length, maturity_margin, max_validators))
 
 
 def jump_to_block(chain, to_block_no):
@@ -86,18 +120,45 @@ def jump_to_block(chain, to_block_no):
     chain.web3.testing.mine(to_block_no - current_block - 1)
     assert chain.web3.eth.blockNumber == to_block_no - 1
 
+def to_bytes32(value):
+    # NOTE: if anyone knows an easier way, please come forth
+    return web3.Web3.toBytes(hexstr=web3.Web3.fromUtf8(value))
+
+def get_validator_sets(staking, first_epoch, last_epoch):
+    epochs, stakes, tm_pubkeys, owners = staking.call().getValidatorSets(first_epoch, last_epoch)
+    result = {epoch: [] for epoch in range(first_epoch, last_epoch + 1)}
+    for epoch, stake, tm_pubkey, owner in zip(epochs, stakes, tm_pubkeys, owners):
+        result[epoch].append((stake, to_bytes32(tm_pubkey), owner))
+    return result
+
 def get_validators(staking, epoch):
+    return get_validator_sets(staking, epoch, epoch)[epoch]
+
+def get_validators_by_slot(staking, epoch):
     result = []
     for i in range(0, sys.maxsize**10):
         validator = staking.call().getValidator(epoch, i)
-        # NOTE: if anyone knows an easier way, please come forth
-        validator[1] = web3.Web3.toBytes(hexstr=web3.Web3.fromUtf8(validator[1]))
+        validator[1] = to_bytes32(validator[1])
         owner = validator[2]
         if owner == ZERO_ADDRESS:
             break
         result.append(tuple(validator))
     return result
 
+def make_funded_accounts(chain, token, num_accounts):
+    # create accounts missing on the tester chain and credit everyone with some ether and staking token
+    for idx in range(num_accounts - len(chain.web3.eth.accounts)):
+        new_account = chain.web3.personal.newAccount("password")
+        chain.web3.personal.unlockAccount(new_account, "password")
+
+    accounts = chain.web3.eth.accounts[:num_accounts]
+
+    funder = accounts[0]
+    funding = [{'from': funder, 'to': account, 'value': utils.denoms.ether, 'gas': 21000} for account in accounts]
+    transfers = [contract_transaction(token, funder, 'transfer', account, LARGE_AMOUNT) for account in accounts]
+    send_in_bulk(chain, funding + transfers)
+    return accounts
+
 def to_tm_pubkey(address):
     return web3.Web3.toBytes(hexstr=(address + "AAAAAAAAAAAAAAAAAAAAAAAA"))
 
@@ -132,6 +193,7 @@ def do(chain, token, staking):
             # if gas isn't constant in future implementations, perform meticulous gas usage testing
             # see tests of gas usage during joining
             assert receipt['gasUsed'] <= 70000
+            return receipt
 
         # successful withdrawal
         def withdraw(self, address, epoch=0, expected_sum=None):
@@ -156,6 +218,7 @@ def do(chain, token, staking):
 
             # NOTE: see note on gas cost checking for `deposit`
             assert receipt['gasUsed'] <= 30000
+            return receipt
 
         # successful join
         def join(self, address, tendermint_pubkey=None):
@@ -186,12 +249,12 @@ def do(chain, token, staking):
 
             # NOTE: see note on gas cost checking for `deposit`
             assert receipt['gasUsed'] <= 350000
+            return receipt
 
     return Doer()
 
 
-@pytest.fixture
-def lots_of_staking_past(do, chain, staking, accounts):
+def stake_lots_in_the_past(do, chain, staking, accounts):
     max_validators = staking.call().maxNumberOfValidators()
     validators = accounts[0:max_validators]
 
@@ -202,6 +265,11 @@ def lots_of_staking_past(do, chain, staking, accounts):
             do.join(validator)
         jump_to_block(chain, staking.call().getNextEpochBlockNumber())
 
+@pytest.fixture
+def lots_of_staking_past(do, chain, snapshots, staking_layer, staking, accounts):
+    snapshots.restore(staking_layer + ('lots_of_staking_past',),
+                      lambda: stake_lots_in_the_past(do, chain, staking, accounts))
+
 # TESTS
 
 def test_empty_validators(chain, staking):
@@ -306,6 +374,28 @@ def test_ejects_smallest_validators(do, chain, staking, token, accounts):
     assert smallest_validator not in validators_addresses
     assert (new_amount, to_tm_pubkey(new_validator), new_validator) in validators
 
+def test_ejects_first_smallest_validator_after_stake_bumps(do, chain, staking, token, accounts):
+    amounts = [2 * MEDIUM_AMOUNT, MEDIUM_AMOUNT, 2 * MEDIUM_AMOUNT, MEDIUM_AMOUNT]
+    prior_validators = accounts[0:len(amounts)]
+    for validator, amount in zip(prior_validators, amounts):
+        do.deposit(validator, amount)
+        do.join(validator)
+
+    # bumping the first of the smallest validators above the others
+    do.deposit(prior_validators[1], 3 * MEDIUM_AMOUNT)
+    do.join(prior_validators[1])
+
+    # ejecting the smallest validators one by one, ties go to the earlier slot
+    expected_ejections = [prior_validators[3], prior_validators[0], prior_validators[2]]
+    for new_validator, ejected_validator in zip(accounts[len(amounts):], expected_ejections):
+        do.deposit(new_validator, 5 * MEDIUM_AMOUNT)
+        do.join(new_validator)
+
+        validators_addresses = [validator[2] for validator in get_validators(staking, 1)]
+        assert ejected_validator not in validators_addresses
+        assert new_validator in validators_addresses
+        assert prior_validators[1] in validators_addresses
+
 def test_cant_enter_if_too_small_to_eject(do, staking, token, accounts):
     max_validators = staking.call().maxNumberOfValidators()
 
@@ -363,6 +453,15 @@ def test_can_lookup_validators_from_the_past(do, lots_of_staking_past, chain, st
             assert validator[1] == to_tm_pubkey(accounts[idx])
             assert validator[2] == accounts[idx]
 
+def test_can_read_validator_sets_in_bulk(do, lots_of_staking_past, staking):
+    # epoch 0 is empty, epochs 1 through 5 hold full validator sets, epoch 6 is empty again
+    validator_sets = get_validator_sets(staking, 0, 6)
+    assert sorted(validator_sets.keys()) == list(range(7))
+    for epoch, validators in validator_sets.items():
+        assert validators == get_validators_by_slot(staking, epoch)
+    assert validator_sets[0] == []
+    assert validator_sets[6] == []
+
 def test_join_does_continue_in_validating_epoch(do, chain, staking, accounts):
     validator = accounts[0]
     do.deposit(validator, MEDIUM_AMOUNT)
@@ -457,6 +556,29 @@ def test_sequential_ejects_on_continuation(do, chain, staking, accounts):
     jump_to_block(chain, withdraw_block2)
     do.withdraw(validator2, withdraw_epoch2, expected_sum=(4 * MEDIUM_AMOUNT))
 
+@pytest.mark.parametrize("epoch_length,maturity_margin,max_validators", [
+    (20, 1, 1),
+])
+def test_rejoin_after_ejected_in_continuation_stakes_whole_bond(do, chain, staking, accounts):
+    validator1, validator2 = accounts[1:3]
+    do.deposit(validator1, MEDIUM_AMOUNT)
+    do.join(validator1)
+
+    # 1 continues to epoch 2 with a fresh deposit
+    jump_to_block(chain, staking.call().getNextEpochBlockNumber())
+    do.deposit(validator1, SMALL_AMOUNT)
+    do.join(validator1)
+
+    # 2 ejects 1, the fresh deposit stays bonded together with the current stake
+    do.deposit(validator2, MEDIUM_AMOUNT + 2 * SMALL_AMOUNT)
+    do.join(validator2)
+
+    # 1 ejects 2 back, staking everything it bonds (without the first fresh deposit it couldn't)
+    do.deposit(validator1, 2 * SMALL_AMOUNT)
+    do.join(validator1)
+    assert get_validators(staking, 2) == [(MEDIUM_AMOUNT + 3 * SMALL_AMOUNT, to_tm_pubkey(validator1), validator1)]
+    assert staking.call().deposits(validator1, 4) == MEDIUM_AMOUNT + 3 * SMALL_AMOUNT
+
 @pytest.mark.parametrize("epoch_length,maturity_margin,max_validators", [
     (20, 1, 1),
 ])
@@ -577,6 +699,60 @@ def test_cant_join_with_zero_stake(do, chain, staking, accounts):
     with pytest.raises(TransactionFailed):
         staking.transact({'from': validator}).join(to_tm_pubkey(validator))
 
+def apply_operation_to_contract(chain, token, staking, operation):
+    # counterpart of `staking_model.apply_operation`
+    kind, args = operation[0], operation[1:]
+    try:
+        if kind == 'deposit':
+            staker, amount = args
+            chain.wait.for_receipt(
+                token.transact({'from': staker}).approve(staking.address, amount))
+            chain.wait.for_receipt(
+                staking.transact({'from': staker}).deposit(amount))
+        elif kind == 'join':
+            chain.wait.for_receipt(
+                staking.transact({'from': args[0]}).join(to_tm_pubkey(args[0])))
+        elif kind == 'withdraw':
+            chain.wait.for_receipt(
+                staking.transact({'from': args[0]}).withdraw(args[1]))
+        else:
+            chain.web3.testing.mine(args[0])
+    except TransactionFailed:
+        return False
+    return True
+
+# the long run is split into many tests, so that it spreads evenly on `pytest -n`
+@pytest.mark.parametrize("first_seed,num_sequences", [(0, 3)] + [
+    pytest.param(first_seed, 10, marks=pytest.mark.slow()) for first_seed in range(3, 103, 10)
+])
+def test_contract_agrees_with_model(chain, token, staking, snapshots, staking_layer, accounts,
+                                    first_seed, num_sequences):
+    # replays random sequences of operations against the contract and its reference model, see staking_model.py
+    stakers = accounts[1:7]
+    amounts = [SMALL_AMOUNT, MEDIUM_AMOUNT, 2 * MEDIUM_AMOUNT]
+    for seed in range(first_seed, first_seed + num_sequences):
+        staking = snapshots.restore(staking_layer)
+        rng = random.Random(seed)
+        model = HonteStakingModel(staking.call().epochLength(), staking.call().maturityMargin(),
+                                  staking.call().maxNumberOfValidators(), staking.call().startBlock())
+
+        for idx in range(40):
+            # the model follows the block numbers of the chain, wherever failing transactions leave them
+            model.block_number = chain.web3.eth.blockNumber + 1
+            operation = random_operation(rng, model, stakers, amounts)
+            model_succeeded = apply_operation(model, operation, to_tm_pubkey)
+            assert apply_operation_to_contract(chain, token, staking, operation) == model_succeeded, \
+                "seed {}, operation {}: {}".format(seed, idx, operation)
+
+        model.block_number = chain.web3.eth.blockNumber + 1
+        last_epoch = model.get_current_epoch() + 1
+        for epoch in range(last_epoch + 1):
+            assert get_validators(staking, epoch) == model.get_validators(epoch), "seed {}".format(seed)
+        for staker in stakers:
+            for epoch in range(last_epoch + 1 + model.unbonding_period + 1):
+                assert staking.call().deposits(staker, epoch) == model.get_deposit(staker, epoch), \
+                    "seed {}".format(seed)
+
 @pytest.mark.slow()
 @pytest.mark.parametrize("epoch_length,maturity_margin,max_validators", [
     (MAX_REASONABLE_VALIDATORS * 6, 1, MAX_REASONABLE_VALIDATORS),
@@ -587,23 +763,11 @@ def test_max_consumed_gas_on_join_is_safe(do, chain, staking, token):
     max_validators = staking.call().maxNumberOfValidators()
 
     # create a lot of accounts to join and eject a lot
-    num_accounts = max_validators + 1
-    for idx in range(num_accounts - len(chain.web3.eth.accounts)):
-        new_account = chain.web3.personal.newAccount("password")
-        chain.web3.personal.unlockAccount(new_account, "password")
-
-    accounts = chain.web3.eth.accounts
+    accounts = make_funded_accounts(chain, token, max_validators + 1)
 
     # these are going to be the "main" validators
     validators = accounts[:-1]
 
-    # credit everyone with some ether and staking token
-    for validator in accounts:
-        chain.web3.eth.sendTransaction({'to': validator,
-                                        'value': utils.denoms.ether})
-        chain.wait.for_receipt(
-            token.transact({'from': accounts[0]}).transfer(validator, LARGE_AMOUNT))
-
     # first deposits and joins
     for validator in validators:
         do.deposit(validator, SMALL_AMOUNT)
@@ -632,6 +796,83 @@ def test_max_consumed_gas_on_join_is_safe(do, chain, staking, token):
         do.deposit(validator, (idx + 1) * MEDIUM_AMOUNT)
         do.join(validator)
 
+
+GAS_SWEEP_VALIDATORS = [1, 10, 50, MAX_REASONABLE_VALIDATORS]
+
+@pytest.mark.slow()
+@pytest.mark.parametrize("epoch_length,maturity_margin,max_validators", [
+    (10 * max_validators + 20, 1, max_validators) for max_validators in GAS_SWEEP_VALIDATORS
+])
+def test_gas_usage_against_baseline(do, chain, staking, token, gas_baseline, max_validators):
+    # walks through all the paths of `join` (and `deposit`, `withdraw`) for a given size of the validator set,
+    # checking gas usage of the most expensive call of each path against the baseline, see conftest.py
+    def check(name, receipt):
+        gas_baseline.check("{}[{}]".format(name, max_validators), receipt)
+
+    accounts = make_funded_accounts(chain, token, max_validators + 2)
+    validators = accounts[:max_validators]
+    ejecting_validator, stray_validator = accounts[max_validators:]
+
+    # filling the set, the last joiner scans all the slots to find the empty one
+    for validator in validators:
+        deposit_receipt = do.deposit(validator, SMALL_AMOUNT)
+        join_receipt = do.join(validator)
+    check('deposit', deposit_receipt)
+    check('join_empty_slot', join_receipt)
+
+    # joining again just bumps the stake
+    do.deposit(validators[-1], SMALL_AMOUNT)
+    check('join_bump_stake', do.join(validators[-1]))
+
+    # ejecting a non-continuing validator, who can withdraw right after
+    do.deposit(ejecting_validator, MEDIUM_AMOUNT)
+    check('join_eject', do.join(ejecting_validator))
+    check('withdraw', do.withdraw(validators[0]))
+
+    # continuing with the whole set, joiner's current stake is looked up in the validating epoch
+    jump_to_block(chain, staking.call().getNextEpochBlockNumber())
+    for validator in validators[1:] + [ejecting_validator]:
+        join_receipt = do.join(validator)
+    check('join_continuing', join_receipt)
+
+    # ejecting a continuing validator, whose stake gets moved back to the current withdraw slot
+    ejected_validator = validators[1] if max_validators > 1 else ejecting_validator
+    do.deposit(stray_validator, 2 * MEDIUM_AMOUNT)
+    check('join_eject_continuing', do.join(stray_validator))
+
+    # the ejected validator comes back continuing, ejecting in turn
+    do.deposit(ejected_validator, 3 * MEDIUM_AMOUNT)
+    check('join_continuing_eject', do.join(ejected_validator))
+
+def measure_ejecting_join(chain, token, accounts, max_validators):
+    staking = deploy_staking(token.address, chain, accounts[0], 4 * max_validators + 10, 1, max_validators)
+
+    def deposit_and_join(account, amount):
+        chain.wait.for_receipt(
+            token.transact({'from': account}).approve(staking.address, amount))
+        chain.wait.for_receipt(
+            staking.transact({'from': account}).deposit(amount))
+        return chain.wait.for_receipt(
+            staking.transact({'from': account}).join(to_tm_pubkey(account)))
+
+    for validator in accounts[:max_validators]:
+        deposit_and_join(validator, SMALL_AMOUNT)
+
+    # the joiner outstakes everyone, so the ejected slot is moved all the way down the stake heap
+    return deposit_and_join(accounts[max_validators], MEDIUM_AMOUNT)['gasUsed']
+
+@pytest.mark.slow()
+def test_join_gas_grows_sublinearly(chain, token):
+    accounts = make_funded_accounts(chain, token, MAX_REASONABLE_VALIDATORS + 1)
+
+    # 25, 50 and 100 validators, the last being the contract's limit
+    sizes = [MAX_REASONABLE_VALIDATORS // 4, MAX_REASONABLE_VALIDATORS // 2, MAX_REASONABLE_VALIDATORS]
+    gas_used = [measure_ejecting_join(chain, token, accounts, size) for size in sizes]
+
+    # doubling the validator set would double the added cost if the slots were scanned,
+    # while it only adds a level to the stake heap
+    assert gas_used[2] - gas_used[1] <= 1.5 * (gas_used[1] - gas_used[0])
+
 def test_unreasonable_deploy_args(chain, token, accounts):
     with pytest.raises(TransactionFailed):
         deploy_staking(token.address, chain, accounts[0], 10, 0, 4)
@@ -0,0 +1,120 @@
+#   Copyright 2018 OmiseGO Pte Ltd
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import random
+
+import pytest
+
+from staking_model import HonteStakingModel, Reverted, ZERO_PUBKEY, apply_operation, random_operation
+
+STAKERS = ['staker{}'.format(idx) for idx in range(6)]
+AMOUNTS = [10, 10000, 20000]
+SEQUENCE_LENGTH = 60
+
+# HELPERS AND FIXTURES
+
+def tendermint_pubkey(staker):
+    return staker.encode().ljust(32, b'\x00')
+
+def check_invariants(model, total_deposited, total_withdrawn):
+    # nothing is lost or created on the way
+    assert sum(model.deposits.values()) == total_deposited - total_withdrawn
+
+    next_epoch = model.get_current_epoch() + 1
+    for epoch, validators in model.validator_sets.items():
+        owners = [validator.owner for validator in validators]
+        assert 0 < len(validators) <= model.max_validators
+        assert len(set(owners)) == len(owners)
+
+        # the stake of the next validating epoch is exactly what is bonded until its unbonding epoch
+        if epoch == next_epoch:
+            unbonding_epoch = epoch + 1 + model.unbonding_period
+            for validator in validators:
+                assert validator.stake == model.get_deposit(validator.owner, unbonding_epoch)
+
+def run_random_sequence(seed, epoch_length, maturity_margin, max_validators):
+    rng = random.Random(seed)
+    model = HonteStakingModel(epoch_length, maturity_margin, max_validators)
+    total_deposited = 0
+    total_withdrawn = 0
+    for _ in range(SEQUENCE_LENGTH):
+        operation = random_operation(rng, model, STAKERS, AMOUNTS)
+        state_before = model.get_state()
+        withdrawable = model.get_deposit(*operation[1:]) if operation[0] == 'withdraw' else 0
+
+        if not apply_operation(model, operation, tendermint_pubkey):
+            # failing transactions revert everything
+            assert model.get_state() == state_before
+            continue
+
+        if operation[0] == 'deposit':
+            total_deposited += operation[2]
+        elif operation[0] == 'withdraw':
+            total_withdrawn += withdrawable
+        check_invariants(model, total_deposited, total_withdrawn)
+
+# TESTS
+
+@pytest.mark.parametrize("epoch_length,maturity_margin,max_validators", [
+    (40, 5, 4),
+    (20, 1, 1),
+    (10, 9, 2),
+    (30, 3, len(STAKERS)),
+])
+# the long run is split into many tests, so that it spreads evenly on `pytest -n`
+@pytest.mark.parametrize("first_seed,num_sequences", [(0, 1000)] + [
+    pytest.param(first_seed, 10000, marks=pytest.mark.slow()) for first_seed in range(1000, 101000, 10000)
+])
+def test_random_sequences_keep_invariants(epoch_length, maturity_margin, max_validators, first_seed, num_sequences):
+    for seed in range(first_seed, first_seed + num_sequences):
+        run_random_sequence(seed, epoch_length, maturity_margin, max_validators)
+
+def test_ejects_first_of_the_lowest_stakes():
+    model = HonteStakingModel(40, 5, 2)
+    for staker, amount in zip(STAKERS, [10, 10, 20]):
+        model.deposit(staker, amount)
+        model.join(staker, tendermint_pubkey(staker))
+
+    assert [validator[2] for validator in model.get_validators(1)] == [STAKERS[2], STAKERS[1]]
+    assert model.get_deposit(STAKERS[0], 0) == 10
+
+def test_cant_join_in_maturity_margin_or_without_pubkey():
+    model = HonteStakingModel(40, 5, 2)
+    model.deposit(STAKERS[0], 10)
+    with pytest.raises(Reverted):
+        model.join(STAKERS[0], ZERO_PUBKEY)
+
+    model.mine(model.get_next_epoch_block_number() - model.maturity_margin - model.block_number)
+    with pytest.raises(Reverted):
+        model.join(STAKERS[0], tendermint_pubkey(STAKERS[0]))
+
+    model.mine(model.maturity_margin)
+    model.join(STAKERS[0], tendermint_pubkey(STAKERS[0]))
+    assert model.get_validators(2) == [(10, tendermint_pubkey(STAKERS[0]), STAKERS[0])]
+
+def test_rejoin_after_ejected_in_continuation_stakes_whole_bond():
+    model = HonteStakingModel(20, 1, 1)
+    model.deposit(STAKERS[0], 10000)
+    model.join(STAKERS[0], tendermint_pubkey(STAKERS[0]))
+    model.mine(model.get_next_epoch_block_number() - model.block_number)
+    model.deposit(STAKERS[0], 10)
+    model.join(STAKERS[0], tendermint_pubkey(STAKERS[0]))
+
+    model.deposit(STAKERS[1], 10020)
+    model.join(STAKERS[1], tendermint_pubkey(STAKERS[1]))
+    model.deposit(STAKERS[0], 20)
+    model.join(STAKERS[0], tendermint_pubkey(STAKERS[0]))
+
+    assert model.get_validators(2) == [(10030, tendermint_pubkey(STAKERS[0]), STAKERS[0])]
+    assert model.get_deposit(STAKERS[0], 4) == 10030